@@ -1,17 +1,23 @@
 import streamlit as st
+
+# ==========================================
+# 頁面設定 (必須是第一個 st 指令，先送出頁面再載入其他模組)
+# ==========================================
+st.set_page_config(page_title="AIOT 智慧零售系統", layout="wide")
+
 import cv2
-import json
 import numpy as np
 import tempfile
 import os
 import time
 from collections import deque
-from ultralytics import YOLO
-
-# ==========================================
-# 頁面設定
-# ==========================================
-st.set_page_config(page_title="AIOT 智慧零售系統", layout="wide")
+from concurrent.futures import ThreadPoolExecutor
+from buffer_pool import BufferPool
+from detector_backends import load_detector, warmup
+from qos_controller import RENDER_FULL, RENDER_NONE, QosController
+from startup import StartupTimeline
+from zone_config import ConfigWatcher, ZoneConfigError, check_resolution, load_zone_config, zone_membership
+from zone_history import DEFAULT_DB_PATH, ZoneHistoryStore
 
 # ==========================================
 # 共用函式庫
@@ -23,12 +29,34 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 def get_asset_path(filename):
     return os.path.join(BASE_DIR, filename)
 
+@st.cache_data(show_spinner=False)
+def _load_compiled_config(path, mtime_ns):
+    # mtime_ns 作為快取鍵：檔案沒變就不重新解析/驗證
+    return load_zone_config(path)
+
 def load_config(filename='config.json'):
     path = get_asset_path(filename)
-    if os.path.exists(path):
-        with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return None
+    if not os.path.exists(path):
+        return None, None
+    try:
+        return _load_compiled_config(path, os.stat(path).st_mtime_ns), None
+    except ZoneConfigError as e:
+        return None, str(e)
+
+@st.cache_resource(show_spinner=False)
+def _model_loader():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+
+@st.cache_resource(show_spinner=False)
+def preload_model(model_path):
+    # 選好模型就在背景載入 (torch / onnxruntime 匯入 + 權重)，使用者上傳影片時同步進行；
+    # 快取住 Future，之後每次 rerun 都沿用同一個模型，不會重新載入
+    return _model_loader().submit(load_detector, model_path)
+
+@st.cache_resource(show_spinner=False)
+def warm_model(model_path, height, width):
+    # 以實際推論解析度預熱一次，同一解析度之後不再重複
+    return warmup(preload_model(model_path).result(), height, width)
 
 def draw_dashed_rect(img, pt1, pt2, color, thickness=2):
     points = [pt1, (pt2[0], pt1[1]), pt2, (pt1[0], pt2[1])]
@@ -87,6 +115,17 @@ def detect_gaps_in_zone(boxes, zone_coords, gap_factor):
 
     return gaps, avg_width
 
+def list_model_files():
+    models_dir = get_asset_path('models')
+    if not os.path.isdir(models_dir):
+        return []
+    names = sorted(
+        name for name in os.listdir(models_dir)
+        if name.endswith(('.pt', '.onnx')) or name.endswith('_openvino_model')
+    )
+    # 預設仍以 best.pt 為第一選項
+    return sorted(names, key=lambda n: n != 'best.pt')
+
 # ==========================================
 # 主介面開始
 # ==========================================
@@ -94,7 +133,7 @@ def detect_gaps_in_zone(boxes, zone_coords, gap_factor):
 st.title("🥤 AIOT 智慧零售 - 智慧監控")
 st.markdown("依賴既有的 `config.json` 與 `models/best.pt`，僅提供監控執行介面。")
 
-config = load_config('config.json')
+config, config_error = load_config('config.json')
 
 col_setup, col_dashboard = st.columns([1, 4])
 
@@ -102,9 +141,11 @@ with col_setup:
     st.subheader("⚙️ 參數控制")
 
     if config:
-        st.success(f"已載入 {len(config.get('zones', []))} 個區域設定")
+        st.success(f"已載入 {len(config)} 個區域設定")
         with st.expander("查看區域設定"):
-            st.json(config)
+            st.json(config.to_dict())
+    elif config_error:
+        st.error(f"config.json 格式錯誤：{config_error}")
     else:
         st.error("找不到 config.json，請先透過既有工具建立設定檔。")
 
@@ -114,6 +155,14 @@ with col_setup:
     conf_thres = st.slider("YOLO 信心度", 0.1, 1.0, 0.3)
     gap_factor = st.slider("間隙判定係數", 0.5, 1.5, 0.8)
     resize_factor = st.slider("影片縮放比例 (降低可提升速度)", 0.1, 1.0, 0.5, 0.1)
+    auto_quality = st.checkbox("🎚️ 自動畫質", value=False, help="依實測延遲自動降低縮放 / 跳幀 / 繪圖，以維持目標 FPS")
+    target_fps = st.slider("目標 FPS", 5, 30, 15) if auto_quality else None
+    # models/ 內由 export_model.py 匯出的 ONNX / OpenVINO 模型可直接選用
+    model_choices = list_model_files()
+    model_name = st.selectbox("推論模型", model_choices) if model_choices else 'best.pt'
+    model_future = preload_model(get_asset_path(os.path.join('models', model_name)))
+
+    record_history = st.checkbox("🗄️ 記錄區域歷史數據", value=False, help=f"寫入 {DEFAULT_DB_PATH}")
 
     st.markdown("---")
     run_btn = st.checkbox("🚀 啟動推論", value=False)
@@ -136,12 +185,17 @@ if run_btn:
         st.warning("請先選擇監控影片再勾選啟動。")
         st.stop()
 
+    # Streamlit 伺服器是常駐行程，只計算按下啟動之後的時間
+    timeline = StartupTimeline(since_process_start=False)
+    model_path = get_asset_path(os.path.join('models', model_name))
     try:
-        model_path = get_asset_path('models/best.pt')
-        model = YOLO(model_path)
+        with st.spinner("模型載入中..."):
+            model = model_future.result()
     except Exception:
-        st.error(f"❌ 找不到 best.pt 模型檔 (路徑: {get_asset_path('models/best.pt')})。")
+        preload_model.clear()
+        st.error(f"❌ 無法載入模型檔 (路徑: {model_path})。")
         st.stop()
+    timeline.mark("model")
 
     # 處理影片
     tfile_mon = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
@@ -150,91 +204,144 @@ if run_btn:
 
     video_path_mon = tfile_mon.name
     cap = cv2.VideoCapture(video_path_mon)
+    timeline.mark("capture")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    infer_w = int(round(cap.get(cv2.CAP_PROP_FRAME_WIDTH) * resize_factor))
+    infer_h = int(round(cap.get(cv2.CAP_PROP_FRAME_HEIGHT) * resize_factor))
+    if infer_w > 0 and infer_h > 0:
+        with st.spinner("模型預熱中..."):
+            warm_model(model_path, infer_h, infer_w)
+        timeline.mark("warmup")
+    first_frame = True
 
     history_len = 30
-    zone_histories = {zone['id']: deque(maxlen=history_len) for zone in config.get('zones', [])}
-
-    while cap.isOpened() and run_btn:
-        ret, frame = cap.read()
-        if not ret:
-            st.warning("影片播放結束")
-            break
-
-        # 縮放影片
-        if resize_factor != 1.0:
-            frame = cv2.resize(frame, None, fx=resize_factor, fy=resize_factor)
-
-        results = model(frame, conf=conf_thres, verbose=False)
-        detections = results[0].boxes.data.tolist()
-
-        zones = config.get('zones', [])
-        current_stats = {}
-
-        for zone in zones:
-            zid = zone['id']
-            p_name = zone['product']
-            # 依據縮放比例調整區域座標
-            orig_zx1, orig_zy1, orig_zx2, orig_zy2 = zone['coords']
-            zx1 = int(orig_zx1 * resize_factor)
-            zy1 = int(orig_zy1 * resize_factor)
-            zx2 = int(orig_zx2 * resize_factor)
-            zy2 = int(orig_zy2 * resize_factor)
-
-            cv2.rectangle(frame, (zx1, zy1), (zx2, zy2), (0, 255, 255), 1)
-
-            zone_boxes = []
-            for det in detections:
-                x1, y1, x2, y2, conf, cls = det
-                cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
-                if zx1 < cx < zx2 and zy1 < cy < zy2:
-                    zone_boxes.append([x1, y1, x2, y2])
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-
-            current_count = len(zone_boxes)
-            history = zone_histories[zid]
-            avg_count = sum(history) / len(history) if len(history) > 0 else current_count
-
-            is_blocked = False
-            if len(history) > 10 and current_count < avg_count * 0.6:
-                is_blocked = True
-
-            if not is_blocked:
-                history.append(current_count)
-
-            if is_blocked:
-                cv2.putText(frame, "BLOCKED", (zx1, zy1 + 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3)
-                status_text = "⚠️ 視線受阻"
-                gap_count = 0
-            else:
-                gaps, _ = detect_gaps_in_zone(zone_boxes, [zx1, zy1, zx2, zy2], gap_factor)
-                for gx1, gy1, gx2, gy2 in gaps:
-                    draw_dashed_rect(frame, (gx1, gy1), (gx2, gy2), (0, 0, 255), 2)
-                status_text = "🟢 監控中"
-                gap_count = len(gaps)
-
-            current_stats[p_name] = {"stock": current_count, "gap": gap_count, "status": status_text}
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        monitor_placeholder.image(frame_rgb, channels="RGB", use_container_width=True)
-
-        with stats_container.container():
-            if len(current_stats) > 0:
-                cols = st.columns(len(current_stats))
-                for idx, (pname, data) in enumerate(current_stats.items()):
-                    with cols[idx]:
-                        with st.container(border=True):
-                            st.markdown(f"**{pname}**")
-                            c1, c2 = st.columns(2)
-                            c1.metric("現貨", data['stock'])
-                            c2.metric("缺貨", data['gap'], delta_color="inverse")
-                            if data['status'] == "⚠️ 視線受阻":
-                                st.warning(data['status'])
-                            else:
-                                st.caption(data['status'])
-
-        time.sleep(0.01)
-
-    cap.release()
+    # 推論途中修改 config.json 會在下一幀生效，不需重新載入模型
+    watcher = ConfigWatcher(get_asset_path('config.json'))
+    zone_histories = {zid: deque(maxlen=history_len) for zid in watcher.current.ids}
+    resolution_checked = False
+    history_store = ZoneHistoryStore(get_asset_path(str(DEFAULT_DB_PATH))) if record_history else None
+    camera_id = os.path.splitext(monitor_file.name)[0]
+    # 自動畫質以滑桿的縮放比例為上限，再依延遲往下調整
+    # (模型是所有工作階段共用的快取，這裡不改它的 imgsz，只調整縮放 / 跳幀 / 繪圖)
+    qos = QosController(target_fps=target_fps) if auto_quality else None
+    frame_idx = -1
+    # 解碼、縮放、轉 RGB 都寫進重複使用的緩衝區，避免每幀配置新的陣列
+    pool = BufferPool()
+    raw = None
+
+    # Streamlit 重新執行 / 停止會在迴圈中丟出例外：仍要關閉影片與歷史寫入執行緒 (佇列中的樣本會寫完)
+    try:
+        while cap.isOpened() and run_btn:
+            ret, raw = cap.read() if raw is None else cap.read(raw)
+            if not ret:
+                st.warning("影片播放結束")
+                break
+            frame_idx += 1
+            if qos and not qos.should_process(frame_idx):
+                continue
+            frame_started = time.perf_counter()
+            # 歷史數據用影片時間，彙總的分鐘 / 小時不受處理速度影響
+            frame_ts = frame_idx / fps
+            render = qos.level.render if qos else RENDER_FULL
+
+            if not resolution_checked:
+                warning = check_resolution(watcher.current, raw.shape[1], raw.shape[0])
+                if warning:
+                    st.warning(warning)
+                resolution_checked = True
+
+            # 縮放影片
+            scale = resize_factor * (qos.level.scale if qos else 1.0)
+            frame = pool.resize(raw, scale=scale) if scale != 1.0 else raw
+
+            if watcher.poll():
+                zone_histories = {
+                    zid: zone_histories.get(zid, deque(maxlen=history_len)) for zid in watcher.current.ids
+                }
+            zone_config = watcher.current
+
+            detections = model(frame, conf=conf_thres)
+
+            # 依據實際畫面解析度換算區域座標 (結果會被快取)
+            zone_coords = zone_config.scaled_coords(frame.shape[1], frame.shape[0])
+            membership = zone_membership(detections, zone_coords)
+            current_stats = {}
+
+            for zi, (zid, p_name) in enumerate(zip(zone_config.ids, zone_config.names)):
+                zx1, zy1, zx2, zy2 = (int(v) for v in zone_coords[zi])
+
+                if render != RENDER_NONE:
+                    cv2.rectangle(frame, (zx1, zy1), (zx2, zy2), (0, 255, 255), 1)
+
+                zone_boxes = detections[membership[:, zi], :4].tolist()
+                if render == RENDER_FULL:
+                    for x1, y1, x2, y2 in zone_boxes:
+                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+
+                current_count = len(zone_boxes)
+                history = zone_histories[zid]
+                avg_count = sum(history) / len(history) if len(history) > 0 else current_count
+
+                is_blocked = False
+                if len(history) > 10 and current_count < avg_count * 0.6:
+                    is_blocked = True
+
+                if not is_blocked:
+                    history.append(current_count)
+
+                if is_blocked:
+                    if render != RENDER_NONE:
+                        cv2.putText(frame, "BLOCKED", (zx1, zy1 + 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3)
+                    status_text = "⚠️ 視線受阻"
+                    gap_count = 0
+                else:
+                    gaps, _ = detect_gaps_in_zone(zone_boxes, [zx1, zy1, zx2, zy2], gap_factor)
+                    if render != RENDER_NONE:
+                        for gx1, gy1, gx2, gy2 in gaps:
+                            draw_dashed_rect(frame, (gx1, gy1), (gx2, gy2), (0, 0, 255), 2)
+                    status_text = "🟢 監控中"
+                    gap_count = len(gaps)
+
+                current_stats[p_name] = {"stock": current_count, "gap": gap_count, "status": status_text}
+                if history_store:
+                    history_store.record(camera_id, zid, current_count, gap_count, blocked=is_blocked, ts=frame_ts)
+
+            frame_rgb = pool.cvt_color(frame, cv2.COLOR_BGR2RGB)
+            monitor_placeholder.image(frame_rgb, channels="RGB", use_container_width=True)
+            if first_frame:
+                timeline.mark("first frame")
+                with col_setup:
+                    st.caption(f"⏱️ 冷啟動：{timeline.summary()}")
+                first_frame = False
+
+            with stats_container.container():
+                if len(current_stats) > 0:
+                    cols = st.columns(len(current_stats))
+                    for idx, (pname, data) in enumerate(current_stats.items()):
+                        with cols[idx]:
+                            with st.container(border=True):
+                                st.markdown(f"**{pname}**")
+                                c1, c2 = st.columns(2)
+                                c1.metric("現貨", data['stock'])
+                                c2.metric("缺貨", data['gap'], delta_color="inverse")
+                                if data['status'] == "⚠️ 視線受阻":
+                                    st.warning(data['status'])
+                                else:
+                                    st.caption(data['status'])
+
+            if qos:
+                qos.observe(time.perf_counter() - frame_started, frame_idx)
+
+            time.sleep(0.01)
+    finally:
+        cap.release()
+        if history_store:
+            history_store.close()
+    with col_setup:
+        st.caption(f"🧮 影格緩衝區：{pool.summary()}")
+        if qos:
+            st.caption(f"🎚️ 自動畫質：{qos.summary()}")
 
     try:
         os.unlink(video_path_mon)
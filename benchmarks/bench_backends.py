@@ -0,0 +1,129 @@
+"""Accuracy-vs-speed comparison of detector backends on our recorded shelf videos.
+
+The first model is the reference (normally ``models/best.pt``); every other
+model is matched against its boxes frame by frame (IoU >= 0.5, same class).
+Run from the repository root after ``export_model.py``::
+
+    python benchmarks/bench_backends.py \\
+        --models models/best.pt models/best.onnx models/best_int8.onnx models/best_openvino_model \\
+        --videos test2.mp4 test3.mp4 --report benchmarks/backend_report.md
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from detector_backends import load_detector  # noqa: E402
+from zone_creator import iter_keyframes  # noqa: E402
+
+IOU_MATCH = 0.5
+CONFIDENCE = 0.3
+WARMUP_RUNS = 3
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)))
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(br - tl, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_counts(reference: np.ndarray, candidate: np.ndarray) -> tuple[int, int, int]:
+    """Greedy one-to-one matching; returns (true positives, reference boxes, candidate boxes)."""
+    iou = box_iou(reference, candidate)
+    if iou.size:
+        iou[reference[:, 5][:, None] != candidate[:, 5][None, :]] = 0
+    matched = 0
+    while iou.size and iou.max() >= IOU_MATCH:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        iou[i, :] = 0
+        iou[:, j] = 0
+        matched += 1
+    return matched, len(reference), len(candidate)
+
+
+def run_model(path: str, frames: list[np.ndarray]) -> tuple[list[np.ndarray], np.ndarray, str]:
+    detector = load_detector(path)
+    for frame in frames[:WARMUP_RUNS]:
+        detector(frame, conf=CONFIDENCE)
+    outputs, latencies = [], []
+    for frame in frames:
+        started = time.perf_counter()
+        outputs.append(detector(frame, conf=CONFIDENCE))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return outputs, np.array(latencies), detector.backend
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", required=True, help="reference model first")
+    parser.add_argument("--videos", nargs="+", default=["test2.mp4", "test3.mp4"])
+    parser.add_argument("--frames", type=int, default=100, help="frames sampled per video")
+    parser.add_argument("--report", type=str, default="benchmarks/backend_report.md")
+    args = parser.parse_args()
+
+    frames = [f for video in args.videos for f in iter_keyframes(video, args.frames)]
+    if not frames:
+        print("[bench] No frames could be read from the videos")
+        sys.exit(1)
+    height, width = frames[0].shape[:2]
+    print(f"[bench] {len(frames)} frames at {width}x{height} from {', '.join(args.videos)}")
+
+    results = []
+    reference = None
+    for model_path in args.models:
+        print(f"[bench] Running {model_path}")
+        outputs, latencies, backend = run_model(model_path, frames)
+        if reference is None:
+            reference = outputs
+        tp = ref_total = cand_total = 0
+        count_err = []
+        for ref, cand in zip(reference, outputs):
+            m, r, c = match_counts(ref, cand)
+            tp, ref_total, cand_total = tp + m, ref_total + r, cand_total + c
+            count_err.append(abs(r - c))
+        results.append({
+            "model": model_path,
+            "backend": backend,
+            "mean_ms": latencies.mean(),
+            "p95_ms": np.percentile(latencies, 95),
+            "fps": 1000 / latencies.mean(),
+            "recall": tp / ref_total if ref_total else 1.0,
+            "precision": tp / cand_total if cand_total else 1.0,
+            "count_mae": float(np.mean(count_err)),
+        })
+
+    base_ms = results[0]["mean_ms"]
+    lines = [
+        "# Detector backend comparison",
+        "",
+        f"{len(frames)} frames ({width}x{height}) from {', '.join(args.videos)}, conf={CONFIDENCE}, "
+        f"matched against `{args.models[0]}` at IoU>={IOU_MATCH}.",
+        "",
+        "| model | backend | mean ms | p95 ms | fps | speedup | recall | precision | count MAE |",
+        "|---|---|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for row in results:
+        lines.append(
+            f"| `{row['model']}` | {row['backend']} | {row['mean_ms']:.1f} | {row['p95_ms']:.1f} | "
+            f"{row['fps']:.1f} | x{base_ms / row['mean_ms']:.2f} | {row['recall']:.3f} | "
+            f"{row['precision']:.3f} | {row['count_mae']:.2f} |"
+        )
+    report = "\n".join(lines) + "\n"
+    print(report)
+    Path(args.report).write_text(report, encoding="utf-8")
+    print(f"[bench] Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Per-frame resize / colour conversion / overlay: fresh arrays vs. BufferPool at stream resolution.
+
+Mirrors the preview path of ``app.py`` (resize, BGR->RGB) and the ignore
+zone shading of ``inference_yolo10``. Run from the repository root::
+
+    python benchmarks/bench_buffer_pool.py --width 1080 --height 1920 --frames 300
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from buffer_pool import BufferPool, peak_rss_mb  # noqa: E402
+
+IGNORE_BAND = (310, 360)
+ALPHA = 0.15
+
+
+def allocating(frame: np.ndarray, scale: float) -> np.ndarray:
+    shaded = frame.copy()
+    overlay = shaded.copy()
+    cv2.rectangle(overlay, (IGNORE_BAND[0], 0), (IGNORE_BAND[1], shaded.shape[0]), (80, 80, 80), -1)
+    cv2.addWeighted(overlay, ALPHA, shaded, 1 - ALPHA, 0, shaded)
+    small = cv2.resize(shaded, None, fx=scale, fy=scale)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+
+def pooled(frame: np.ndarray, scale: float, pool: BufferPool) -> np.ndarray:
+    shaded = pool.copy(frame, name="frame")  # stands in for decoding into a reused array
+    band = shaded[:, IGNORE_BAND[0] : IGNORE_BAND[1] + 1]
+    cv2.addWeighted(band, 1 - ALPHA, band, 0, ALPHA * 80, dst=band)
+    small = pool.resize(shaded, scale=scale)
+    return pool.cvt_color(small, cv2.COLOR_BGR2RGB)
+
+
+def measure(name: str, step, frames: list[np.ndarray]) -> None:
+    tracemalloc.start()
+    for frame in frames[:3]:
+        step(frame)
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    for frame in frames:
+        step(frame)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"[bench] {name:<10} {elapsed / len(frames) * 1000:6.2f} ms/frame, peak traced {peak / 2**20:6.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=1920)
+    parser.add_argument("--scale", type=float, default=0.5)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 255, (args.height, args.width, 3), dtype=np.uint8) for _ in range(4)]
+    stream = [frames[i % len(frames)] for i in range(args.frames)]
+
+    expected = allocating(frames[0], args.scale)
+    pool = BufferPool()
+    if not np.array_equal(expected, pooled(frames[0], args.scale, pool)):
+        print("[bench] warning: pooled output differs from the allocating path")
+
+    measure("allocating", lambda frame: allocating(frame, args.scale), stream)
+    pool = BufferPool()
+    measure("pooled", lambda frame: pooled(frame, args.scale, pool), stream)
+    print(f"[bench] pool: {pool.summary()}")
+    print(f"[bench] process peak RSS {peak_rss_mb() or 0:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
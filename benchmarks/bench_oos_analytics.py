@@ -0,0 +1,62 @@
+"""Throughput and memory of oos_analytics over synthetic zone results, by chunk size.
+
+Writes ``--frames`` lines of synthetic ground truth in the ``zone_monitor
+--results`` format, then analyses the file at several chunk sizes. Peak
+traced memory should follow the chunk size, not the file length. Tracing
+itself slows the run several times, so frames/s here is a lower bound.
+Run from the repository root::
+
+    python benchmarks/bench_oos_analytics.py --frames 100000 --zones 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from oos_analytics import analyze_files  # noqa: E402
+from synthetic_shelf import ShelfSpec, SyntheticShelf  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=100_000)
+    parser.add_argument("--zones", type=int, default=50)
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1_000, 20_000])
+    args = parser.parse_args()
+
+    spec = ShelfSpec(products=args.products, zones=args.zones, occluders=2)
+    shelf = SyntheticShelf(spec)
+    zone_ids = list(shelf.config().ids)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cam_synthetic.jsonl"
+        started = time.perf_counter()
+        with open(path, "w", encoding="utf-8") as out:
+            for _ in range(args.frames):
+                out.write(json.dumps(shelf.truth_record(shelf.step(), zone_ids)) + "\n")
+        size_mb = path.stat().st_size / 2**20
+        print(f"[bench] {args.frames} frames x {len(zone_ids)} zones ({size_mb:.0f} MiB) "
+              f"written in {time.perf_counter() - started:.1f}s")
+
+        for chunk in args.chunks:
+            tracemalloc.start()
+            started = time.perf_counter()
+            stats = analyze_files([path], chunk=chunk)
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            episodes = sum(row.episodes for row in stats)
+            oos = sum(row.oos_s for row in stats) / max(sum(row.observed_s for row in stats), 1e-9)
+            print(f"[bench] chunk {chunk:>7}: {args.frames / elapsed:8.0f} frames/s, peak traced {peak / 2**20:6.1f} MiB, "
+                  f"{episodes} episodes, {oos * 100:.1f}% out of stock")
+
+
+if __name__ == "__main__":
+    main()
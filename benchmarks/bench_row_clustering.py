@@ -0,0 +1,102 @@
+"""Benchmark row clustering: legacy per-box scan vs. NumPy gap splitting vs. warm-started tracker.
+
+Run from the repository root::
+
+    python benchmarks/bench_row_clustering.py --rows 8 --per-row 60 --frames 300
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from row_clustering import RowTracker, cluster_rows  # noqa: E402
+
+Y_THRESHOLD = 50.0
+
+
+def legacy_cluster_rows(boxes, y_threshold):
+    """The original ``inference_yolo10.cluster_rows`` (O(N*R) running-mean scan)."""
+    rows = []
+    centers = []
+    for box in sorted(boxes, key=lambda b: (b[1] + b[3]) / 2):
+        center_y = (box[1] + box[3]) / 2
+        for idx, current_center in enumerate(centers):
+            if abs(center_y - current_center) <= y_threshold:
+                rows[idx].append(box)
+                centers[idx] = (current_center * (len(rows[idx]) - 1) + center_y) / len(rows[idx])
+                break
+        else:
+            rows.append([box])
+            centers.append(center_y)
+    return rows
+
+
+def dense_shelf_frames(rows: int, per_row: int, frames: int, seed: int = 0) -> list[list[tuple]]:
+    """Synthesize frames of a dense shelf with jitter, random gaps and a few stray boxes."""
+    rng = np.random.default_rng(seed)
+    row_pitch = 160.0
+    box_w, box_h = 14.0, 110.0
+    out = []
+    for _ in range(frames):
+        ys = (np.arange(rows) * row_pitch + 80.0)[:, None] + rng.normal(0, 6, (rows, per_row))
+        xs = np.arange(per_row) * (box_w + 4.0) + rng.normal(0, 1.5, (rows, per_row))
+        present = rng.random((rows, per_row)) > 0.1
+        x1 = xs[present]
+        y1 = ys[present] - box_h / 2
+        conf = rng.uniform(0.3, 0.95, x1.size)
+        boxes = np.stack([x1, y1, x1 + box_w, y1 + box_h, conf], axis=1)
+        rng.shuffle(boxes)
+        out.append([tuple(b) for b in boxes.tolist()])
+    return out
+
+
+def row_signature(rows) -> list[int]:
+    return sorted(len(r) for r in rows)
+
+
+def bench(name, fn, frames) -> tuple[float, list]:
+    started = time.perf_counter()
+    results = [fn(boxes) for boxes in frames]
+    elapsed = time.perf_counter() - started
+    per_frame_ms = elapsed / len(frames) * 1000
+    print(f"{name:<22} {per_frame_ms:8.3f} ms/frame  {len(frames) / elapsed:9.1f} fps")
+    return per_frame_ms, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=8)
+    parser.add_argument("--per-row", type=int, default=60)
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    frames = dense_shelf_frames(args.rows, args.per_row, args.frames)
+    avg_boxes = sum(len(f) for f in frames) / len(frames)
+    print(f"{args.frames} frames, {args.rows} rows, ~{avg_boxes:.0f} boxes/frame, y_threshold={Y_THRESHOLD}")
+
+    legacy_ms, legacy = bench("legacy cluster_rows", lambda b: legacy_cluster_rows(b, Y_THRESHOLD), frames)
+    numpy_ms, stateless = bench("numpy cluster_rows", lambda b: cluster_rows(b, Y_THRESHOLD), frames)
+    tracker = RowTracker(Y_THRESHOLD)
+    tracker_ms, tracked = bench("RowTracker.update", tracker.update, frames)
+
+    def row_counts(results):
+        return np.array([len(r) for r in results])
+
+    for name, results in (("legacy", legacy), ("numpy", stateless), ("tracker", tracked)):
+        counts = row_counts(results)
+        stable = np.mean(counts == args.rows) * 100
+        print(f"{name:<8} rows/frame min={counts.min()} max={counts.max()}  frames with {args.rows} rows: {stable:.1f}%")
+
+    agree = np.mean([row_signature(a) == row_signature(b) for a, b in zip(legacy, tracked)]) * 100
+    print(f"tracker vs legacy identical row sizes: {agree:.1f}% of frames")
+    print(f"speedup: numpy x{legacy_ms / numpy_ms:.1f}, tracker x{legacy_ms / tracker_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Two-stage detection: a cheap low-resolution pass over the whole frame, high-resolution crops where it is unsure.
+
+A tall 1080x1920 shelf frame forces one detector resolution to choose
+between speed and small products. ``DetectionCascade`` runs the detector
+once on a downscaled frame (and a small ``imgsz`` on backends that accept
+one). It then re-infers only the zones whose coarse result is doubtful, on
+crops at native resolution:
+
+- ``low_conf``: the zone holds a box below ``refine_confidence``;
+- ``count``: the zone count disagrees with its history mean by more than
+  ``count_tolerance``. Drops steep enough to be an occlusion are left to
+  the occlusion logic;
+- ``gap``: the zone shows fewer products than its last result, i.e. a
+  gap that just appeared.
+
+Refined zones take the crop detections, all other zones keep the coarse
+ones, and the merged array feeds the usual zone logic. A refined result is
+remembered with the coarse count it corrected. While the zone's coarse boxes
+stay the same in count and covered width (up to ``CONFIRM_FRAMES``), the
+refined boxes are reused
+instead of re-running the crop, so a zone the coarse pass systematically
+undercounts costs one refine, not one per frame::
+
+    cascade = DetectionCascade()
+    detections = cascade(model, frame, zone_coords, histories, previous_stock)
+    ...
+    print(cascade.summary())
+
+The first ``CALIBRATION_FRAMES`` frames run one full-resolution pass
+instead. Their timing is the baseline for the speedup in ``summary()``.
+"""
+from __future__ import annotations
+
+import math
+import time
+
+import cv2
+import numpy as np
+
+from change_gate import crop_boxes, crop_detections
+from zone_config import zone_membership
+
+COARSE_SCALE = 0.5          # frame downscale for the first pass
+COARSE_IMGSZ = 320          # detector input size for the first pass (PyTorch backend only)
+REFINE_MAX_IMGSZ = 1280     # crops run at native resolution, up to this input size
+REFINE_CONFIDENCE = 0.5     # a coarse box below this makes its zone uncertain
+COUNT_TOLERANCE = 0.25      # relative count deviation from the zone history that triggers a refine
+OCCLUSION_RATIO = 0.6       # matches zone_monitor.DROP_RATIO: steeper drops are occlusions, not refined
+MIN_HISTORY = 5             # history samples needed before the count trigger applies
+MAX_REFINE_FRACTION = 0.5   # beyond this share of zones one full-resolution pass is cheaper than crops
+MERGE_SLACK = 1.3           # merge two crops when their union is at most this much larger than both
+CONFIRM_FRAMES = 30         # frames a refined zone result is reused while its coarse count is unchanged
+CONFIRM_TOLERANCE = 0.05    # ... and the width its coarse boxes cover moved by less than this fraction
+CALIBRATION_FRAMES = 3
+
+REASONS = ("low_conf", "count", "gap")
+
+
+def merge_crops(crops: np.ndarray, slack: float = MERGE_SLACK) -> list[tuple[int, int, int, int]]:
+    """Union overlapping crop rectangles (neighbouring zones of a row) so one call covers them."""
+    merged: list[list[int]] = []
+    for x1, y1, x2, y2 in sorted(crops.tolist(), key=lambda c: (c[1], c[0])):
+        for box in merged:
+            ux1, uy1, ux2, uy2 = min(box[0], x1), min(box[1], y1), max(box[2], x2), max(box[3], y2)
+            overlaps = x1 < box[2] and box[0] < x2 and y1 < box[3] and box[1] < y2
+            area = (box[2] - box[0]) * (box[3] - box[1]) + (x2 - x1) * (y2 - y1)
+            if overlaps and (ux2 - ux1) * (uy2 - uy1) <= area * slack:
+                box[:] = [ux1, uy1, ux2, uy2]
+                break
+        else:
+            merged.append([x1, y1, x2, y2])
+    return [tuple(box) for box in merged]
+
+
+class DetectionCascade:
+    def __init__(
+        self,
+        coarse_scale: float = COARSE_SCALE,
+        coarse_imgsz: int | None = COARSE_IMGSZ,
+        refine_confidence: float = REFINE_CONFIDENCE,
+        count_tolerance: float = COUNT_TOLERANCE,
+        max_refine_fraction: float = MAX_REFINE_FRACTION,
+    ):
+        self.coarse_scale = coarse_scale
+        self.coarse_imgsz = coarse_imgsz
+        self.refine_confidence = refine_confidence
+        self.count_tolerance = count_tolerance
+        self.max_refine_fraction = max_refine_fraction
+        self.frames = 0
+        self.zone_checks = 0
+        self.zones_refined = 0
+        self.frames_refined = 0
+        self.full_refines = 0
+        self.crops = 0
+        self.zones_reused = 0
+        self._confirmed_count = np.empty(0, dtype=np.int64)   # coarse count a zone was refined at, -1 = none
+        self._confirmed_age = np.empty(0, dtype=np.int64)
+        self._confirmed_cover = np.empty(0, dtype=np.float64)
+        self._confirmed: list[np.ndarray] = []
+        self.triggers = dict.fromkeys(REASONS, 0)
+        self.coarse_time = 0.0
+        self.refine_time = 0.0
+        self.full_times: list[float] = []
+
+    def _infer(self, model, image: np.ndarray, imgsz: int | None) -> np.ndarray:
+        # Backends with a run-time input size (PyTorch) get one per call; exported models keep theirs
+        if imgsz is None or not hasattr(model, "imgsz"):
+            return model(image)
+        base = model.imgsz
+        model.imgsz = imgsz
+        try:
+            return model(image)
+        finally:
+            model.imgsz = base
+
+    def coarse(self, model, frame: np.ndarray) -> np.ndarray:
+        scale = self.coarse_scale
+        small = frame if scale >= 1.0 else cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        dets = self._infer(model, small, self.coarse_imgsz)
+        if len(dets) and scale < 1.0:
+            dets = dets.copy()
+            dets[:, :4] /= scale
+        return dets
+
+    def uncertain_zones(
+        self, detections: np.ndarray, membership: np.ndarray, histories, previous_stock, skip: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Bool mask of zones whose coarse result should be re-checked (never ``skip``), counting each trigger reason."""
+        zones = membership.shape[1]
+        counts = membership.sum(axis=0)
+        low = detections[:, 4] < self.refine_confidence if len(detections) else np.zeros(0, dtype=bool)
+        low_conf = membership[low].any(axis=0) if low.any() else np.zeros(zones, dtype=bool)
+
+        count = np.zeros(zones, dtype=bool)
+        for zi, history in enumerate(histories):
+            if len(history) >= MIN_HISTORY:
+                mean = sum(history) / len(history)
+                deviation = abs(counts[zi] - mean)
+                count[zi] = deviation > max(1.0, self.count_tolerance * mean) and counts[zi] >= mean * OCCLUSION_RATIO
+        previous = np.asarray(previous_stock, dtype=np.int64)
+        gap = (previous >= 0) & (counts < previous)
+
+        masks = (low_conf, count, gap) if skip is None else (low_conf & ~skip, count & ~skip, gap & ~skip)
+        for reason, mask in zip(REASONS, masks):
+            self.triggers[reason] += int(np.count_nonzero(mask))
+        return masks[0] | masks[1] | masks[2]
+
+    def refine(self, model, frame: np.ndarray, zone_coords: np.ndarray, zone_indices: np.ndarray) -> np.ndarray:
+        """Detections on native-resolution crops around the given zones, in frame coordinates."""
+        def infer(crop: np.ndarray) -> np.ndarray:
+            self.crops += 1
+            imgsz = min(math.ceil(max(crop.shape[:2]) / 32) * 32, REFINE_MAX_IMGSZ)
+            return self._infer(model, crop, imgsz)
+
+        coords = zone_coords[zone_indices]
+        return crop_detections(infer, frame, coords, merge_crops(crop_boxes(coords, frame.shape)))
+
+    def __call__(self, model, frame: np.ndarray, zone_coords: np.ndarray, histories, previous_stock) -> np.ndarray:
+        """Merged detections for ``frame``; ``histories`` / ``previous_stock`` (-1 = unknown) follow zone order."""
+        self.frames += 1
+        if len(self.full_times) < CALIBRATION_FRAMES:
+            started = time.perf_counter()
+            dets = model(frame)
+            self.full_times.append(time.perf_counter() - started)
+            return dets
+
+        started = time.perf_counter()
+        coarse = self.coarse(model, frame)
+        self.coarse_time += time.perf_counter() - started
+        membership = zone_membership(coarse, zone_coords)
+        zones = len(zone_coords)
+        if len(self._confirmed_count) != zones:
+            self._reset_confirmed(zones)
+        counts = membership.sum(axis=0)
+        # A sale inside blobs the coarse pass merged changes their covered width even when the count holds
+        cover = (coarse[:, 2] - coarse[:, 0]).astype(np.float64) @ membership if len(coarse) else np.zeros(zones)
+        self._confirmed_age += 1
+        reused = (
+            (self._confirmed_count == counts)
+            & (self._confirmed_age <= CONFIRM_FRAMES)
+            & (np.abs(cover - self._confirmed_cover) <= CONFIRM_TOLERANCE * np.maximum(self._confirmed_cover, 1.0))
+        )
+        uncertain = self.uncertain_zones(coarse, membership, histories, previous_stock, skip=reused)
+        self.zone_checks += zones
+        self.zones_reused += int(np.count_nonzero(reused))
+        refine_idx = np.flatnonzero(uncertain)
+        replaced = np.flatnonzero(reused | uncertain)
+        if not len(replaced):
+            return coarse
+
+        refined = np.empty((0, 6), dtype=np.float32)
+        if len(refine_idx):
+            self.zones_refined += len(refine_idx)
+            self.frames_refined += 1
+            started = time.perf_counter()
+            if len(refine_idx) > self.max_refine_fraction * zones:
+                self.full_refines += 1
+                refined = model(frame)
+            else:
+                refined = self.refine(model, frame, zone_coords, refine_idx)
+            self.refine_time += time.perf_counter() - started
+            # Crops reach into neighbouring zones: keep boxes only for the zones they were run for
+            refined_membership = zone_membership(refined, zone_coords[refine_idx])
+            for column, zi in enumerate(refine_idx):
+                self._confirmed[zi] = refined[refined_membership[:, column]]
+                self._confirmed_count[zi] = counts[zi]
+                self._confirmed_cover[zi] = cover[zi]
+                self._confirmed_age[zi] = 0
+        keep_coarse = ~membership[:, replaced].any(axis=1)
+        return np.concatenate([coarse[keep_coarse]] + [self._confirmed[zi] for zi in replaced])
+
+    def _reset_confirmed(self, zones: int) -> None:
+        self._confirmed_count = np.full(zones, -1, dtype=np.int64)
+        self._confirmed_age = np.zeros(zones, dtype=np.int64)
+        self._confirmed_cover = np.zeros(zones, dtype=np.float64)
+        self._confirmed = [np.empty((0, 6), dtype=np.float32)] * zones
+
+    def stats(self) -> dict[str, float]:
+        cascaded = max(self.frames - len(self.full_times), 0)
+        per_frame = (self.coarse_time + self.refine_time) / cascaded if cascaded else 0.0
+        full = min(self.full_times) if self.full_times else 0.0
+        return {
+            "frames": self.frames,
+            "frames_refined_pct": 100.0 * self.frames_refined / max(cascaded, 1),
+            "zones_refined_pct": 100.0 * self.zones_refined / max(self.zone_checks, 1),
+            "zones_reused_pct": 100.0 * self.zones_reused / max(self.zone_checks, 1),
+            "full_refines": self.full_refines,
+            "crops": self.crops,
+            **{f"trigger_{reason}": count for reason, count in self.triggers.items()},
+            "coarse_ms": 1000.0 * self.coarse_time / max(cascaded, 1),
+            "refine_ms": 1000.0 * self.refine_time / max(cascaded, 1),
+            "full_ms": 1000.0 * full,
+            "speedup": full / per_frame if per_frame > 0 else 0.0,
+        }
+
+    def summary(self) -> str:
+        stats = self.stats()
+        triggers = ", ".join(f"{reason} {self.triggers[reason]}" for reason in REASONS)
+        return (
+            f"refined {stats['zones_refined_pct']:.1f}% of zones on {stats['frames_refined_pct']:.1f}% of frames "
+            f"({triggers}; {stats['crops']} crops, {stats['full_refines']} full passes, "
+            f"{stats['zones_reused_pct']:.1f}% reused), "
+            f"{stats['coarse_ms']:.1f} + {stats['refine_ms']:.1f} ms/frame vs {stats['full_ms']:.1f} ms full "
+            f"-> {stats['speedup']:.2f}x"
+        )
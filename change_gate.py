@@ -0,0 +1,143 @@
+"""Cheap per-zone change detection used to skip inference on static shelf frames."""
+from __future__ import annotations
+
+import cv2
+import numpy as np
+
+from zone_config import assign_zones
+
+GATE_SCALE = 0.125           # downscale factor for the grayscale comparison frame
+PIXEL_THRESHOLD = 18         # gray-level difference that counts as a changed pixel
+CHANGED_FRACTION = 0.02      # zone is "changed" when this fraction of its pixels changed
+REFRESH_INTERVAL = 300       # force re-inference of every zone after this many frames
+
+
+class ZoneChangeGate:
+    """Compares each zone of a downscaled grayscale frame with the frame it was last inferred on.
+
+    The reference for a zone is only refreshed when that zone is actually
+    re-inferred (``mark_inferred``), so slow drifts such as items being
+    removed one by one still accumulate until they trip the threshold.
+    """
+
+    def __init__(
+        self,
+        scale: float = GATE_SCALE,
+        pixel_threshold: int = PIXEL_THRESHOLD,
+        changed_fraction: float = CHANGED_FRACTION,
+        refresh_interval: int = REFRESH_INTERVAL,
+    ):
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.changed_fraction = changed_fraction
+        self.refresh_interval = refresh_interval
+        self.reference: np.ndarray | None = None
+        self.current: np.ndarray | None = None
+        self.small_coords: np.ndarray | None = None
+        self.age = np.empty(0, dtype=np.int64)
+        self.frames = 0
+        self.frames_skipped = 0
+        self.zone_checks = 0
+        self.zones_skipped = 0
+
+    def reset(self) -> None:
+        """Forget references (e.g. after a config reload) so every zone is re-inferred."""
+        self.reference = None
+        self.small_coords = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (3, 3), 0)
+
+    def changed_zones(self, frame: np.ndarray, zone_coords: np.ndarray) -> np.ndarray:
+        """Return a bool array marking the zones whose content changed since their last inference."""
+        self.current = self._prepare(frame)
+        zone_count = len(zone_coords)
+        if (
+            self.reference is None
+            or self.reference.shape != self.current.shape
+            or self.small_coords is None
+            or len(self.small_coords) != zone_count
+        ):
+            self.reference = np.zeros_like(self.current)
+            self.small_coords = np.floor(np.asarray(zone_coords) * self.scale).astype(np.int32)
+            self.small_coords[:, 2:] = np.maximum(self.small_coords[:, 2:], self.small_coords[:, :2] + 1)
+            self.age = np.full(zone_count, self.refresh_interval, dtype=np.int64)
+            changed = np.ones(zone_count, dtype=bool)
+        else:
+            diff = cv2.absdiff(self.current, self.reference) > self.pixel_threshold
+            # Integral image: changed-pixel count of every zone in O(1) each
+            integral = cv2.integral(diff.view(np.uint8))
+            x1, y1, x2, y2 = self.small_coords.T
+            counts = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+            areas = (x2 - x1) * (y2 - y1)
+            changed = (counts > self.changed_fraction * areas) | (self.age >= self.refresh_interval)
+
+        self.frames += 1
+        self.zone_checks += zone_count
+        skipped = zone_count - int(changed.sum())
+        self.zones_skipped += skipped
+        if zone_count and skipped == zone_count:
+            self.frames_skipped += 1
+        self.age += 1
+        return changed
+
+    def mark_inferred(self, zone_indices) -> None:
+        """Adopt the current frame as the reference for the given (freshly inferred) zones."""
+        for zi in np.atleast_1d(zone_indices):
+            x1, y1, x2, y2 = self.small_coords[zi]
+            self.reference[y1:y2, x1:x2] = self.current[y1:y2, x1:x2]
+            self.age[zi] = 0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "frames": self.frames,
+            "frames_skipped_pct": 100.0 * self.frames_skipped / self.frames if self.frames else 0.0,
+            "zones_skipped_pct": 100.0 * self.zones_skipped / self.zone_checks if self.zone_checks else 0.0,
+        }
+
+
+def crop_boxes(zone_coords: np.ndarray, frame_shape: tuple[int, ...], margin: float = 0.1) -> np.ndarray:
+    """Return padded crop rectangles around zones so boxes on the zone edge are not cut off."""
+    height, width = frame_shape[:2]
+    coords = np.asarray(zone_coords, dtype=np.float64)
+    pad = np.maximum(coords[:, 2] - coords[:, 0], coords[:, 3] - coords[:, 1]) * margin
+    crops = np.column_stack([coords[:, 0] - pad, coords[:, 1] - pad, coords[:, 2] + pad, coords[:, 3] + pad])
+    crops[:, [0, 2]] = crops[:, [0, 2]].clip(0, width)
+    crops[:, [1, 3]] = crops[:, [1, 3]].clip(0, height)
+    return crops.astype(np.int32)
+
+
+def crop_detections(infer, frame: np.ndarray, zone_coords: np.ndarray, crops=None) -> np.ndarray:
+    """Run ``infer`` on crops around ``zone_coords`` and return the detections in frame coordinates.
+
+    ``crops`` defaults to one ``crop_boxes`` rectangle per zone; a caller may pass
+    merged rectangles instead. Padded crops of neighbouring zones overlap, so a
+    product near a zone edge is found by more than one crop. Each zone is owned
+    by the first crop that contains its padded rectangle, and a box is kept only
+    from the owner of the first requested zone holding its centre. Every product
+    is therefore counted once, and boxes outside all requested zones are dropped.
+    """
+    coords = np.asarray(zone_coords)
+    zone_crops = crop_boxes(coords, frame.shape)
+    crops = zone_crops.tolist() if crops is None else [list(crop) for crop in crops]
+    owner = np.array([
+        next(ci for ci, (x1, y1, x2, y2) in enumerate(crops) if x1 <= zx1 and y1 <= zy1 and zx2 <= x2 and zy2 <= y2)
+        for zx1, zy1, zx2, zy2 in zone_crops.tolist()
+    ], dtype=np.intp)
+    parts = []
+    for ci, (cx1, cy1, cx2, cy2) in enumerate(crops):
+        if cx2 <= cx1 or cy2 <= cy1:
+            continue
+        dets = infer(frame[cy1:cy2, cx1:cx2])
+        if not len(dets):
+            continue
+        dets = dets.copy()
+        dets[:, [0, 2]] += cx1
+        dets[:, [1, 3]] += cy1
+        zone = assign_zones(dets, coords)
+        keep = zone >= 0
+        keep[keep] = owner[zone[keep]] == ci
+        parts.append(dets[keep])
+    return np.concatenate(parts) if parts else np.empty((0, 6), dtype=np.float32)
@@ -0,0 +1,283 @@
+"""Append-only binary log of per-frame detections, and a replay detector / capture built on it.
+
+``DetectionRecorder`` writes what the model returned for every frame (the
+``(N, 6)`` ``boxes.data`` array) together with the frame index and
+timestamp. ``ReplayDetector`` and ``ReplayCapture`` feed such a log back
+into the zone / gap / occlusion pipeline without weights or video, at
+recorded speed or as fast as possible::
+
+    python zone_monitor.py --source test2.mp4 --record-detections logs/test2.detlog
+    python zone_monitor.py --replay logs/test2.detlog --headless            # max speed
+    python zone_monitor.py --replay logs/test2.detlog --realtime            # recorded pacing
+
+File layout (little endian)::
+
+    header   64 bytes  magic, version, width, height, fps, committed length, metadata length
+    metadata JSON      class names, source, ... (padded to 8 bytes)
+    records  repeated  int64 frame, float64 ts, uint32 n, uint32 m, n x 6 float32, m mask bytes
+
+``m`` is 0 when every zone was analysed on the frame. Otherwise the record
+ends with the packed bit mask of the zones the run analysed (``--motion-gate``
+crops, QoS frame skips), padded to 8 bytes, and a replay analyses the same
+zones. Version 1 logs have no masks and read as ``m = 0``.
+
+The writer maps the file and grows it in large steps; the committed length
+in the header is only advanced after a record is fully written, so a crash
+never leaves a torn record visible and readers can follow a live log.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b"SHDETLOG"
+VERSION = 2
+READ_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sIIIdQQ20x")    # magic, version, width, height, fps, committed, meta_len
+RECORD = struct.Struct("<qdII")           # frame, ts, n, mask bytes
+COMMITTED_OFFSET = 8 + 4 + 4 + 4 + 8
+ROW_BYTES = 6 * 4
+GROW_BYTES = 16 * 2**20
+
+
+class DetectionLogError(ValueError):
+    """Raised for files that are not detection logs or are truncated beyond repair."""
+
+
+def _align8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class DetectionRecorder:
+    def __init__(
+        self,
+        path: str | Path,
+        width: int,
+        height: int,
+        fps: float,
+        metadata: dict | None = None,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        meta = json.dumps(metadata or {}, ensure_ascii=False).encode("utf-8")
+        self.data_start = _align8(HEADER.size + len(meta))
+        self._file = open(self.path, "w+b")
+        self._capacity = max(GROW_BYTES, self.data_start)
+        self._file.truncate(self._capacity)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[: HEADER.size] = HEADER.pack(MAGIC, VERSION, width, height, fps, self.data_start, len(meta))
+        self._map[HEADER.size : HEADER.size + len(meta)] = meta
+        self.offset = self.data_start
+        self.frames = 0
+
+    def _grow(self, needed: int) -> None:
+        self._map.flush()
+        self._map.close()
+        self._capacity = _align8(max(self._capacity + GROW_BYTES, needed))
+        self._file.truncate(self._capacity)
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+
+    def append(self, frame: int, ts: float, detections: np.ndarray, zones: np.ndarray | None = None) -> None:
+        """``zones``: bool mask of the zones analysed on this frame, ``None`` for all of them."""
+        rows = np.ascontiguousarray(detections, dtype=np.float32).reshape(-1, 6)
+        mask = b""
+        if zones is not None and not np.all(zones):
+            packed = np.packbits(np.asarray(zones, dtype=bool)).tobytes()
+            mask = packed.ljust(_align8(max(len(packed), 1)), b"\0")
+        size = RECORD.size + rows.nbytes + len(mask)
+        end = self.offset + size
+        if end > self._capacity:
+            self._grow(end)
+        RECORD.pack_into(self._map, self.offset, frame, ts, len(rows), len(mask))
+        rows_end = self.offset + RECORD.size + rows.nbytes
+        self._map[self.offset + RECORD.size : rows_end] = rows.tobytes()
+        self._map[rows_end:end] = mask
+        # Commit after the payload so readers never see a partial record
+        struct.pack_into("<Q", self._map, COMMITTED_OFFSET, end)
+        self.offset = end
+        self.frames += 1
+
+    def close(self) -> None:
+        if self._map.closed:
+            return
+        self._map.flush()
+        self._map.close()
+        self._file.truncate(self.offset)
+        self._file.close()
+
+    def __enter__(self) -> DetectionRecorder:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class DetectionLog:
+    """Read-only, memory-mapped view of a log; records are zero-copy ``(N, 6)`` float32 views."""
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER.size:
+            raise DetectionLogError(f"{self.path} is too small to be a detection log")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height, fps, committed, meta_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise DetectionLogError(f"{self.path} is not a detection log")
+        if version not in READ_VERSIONS:
+            raise DetectionLogError(f"{self.path}: unsupported log version {version}")
+        self.width, self.height, self.fps = width, height, fps
+        self.metadata = json.loads(bytes(self._map[HEADER.size : HEADER.size + meta_len]) or b"{}")
+        self.data_start = _align8(HEADER.size + meta_len)
+        self.committed = min(committed, size)
+        self.offsets, self.frame_ids, self.timestamps, self.counts, self.mask_bytes = self._build_index()
+
+    def _build_index(self):
+        offsets, frames, stamps, counts, masks = [], [], [], [], []
+        offset, end, buf = self.data_start, self.committed, self._map
+        while offset + RECORD.size <= end:
+            frame, ts, n, m = RECORD.unpack_from(buf, offset)
+            if offset + RECORD.size + n * ROW_BYTES + m > end:
+                break
+            offsets.append(offset)
+            frames.append(frame)
+            stamps.append(ts)
+            counts.append(n)
+            masks.append(m)
+            offset += RECORD.size + n * ROW_BYTES + m
+        return (
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(frames, dtype=np.int64),
+            np.asarray(stamps, dtype=np.float64),
+            np.asarray(counts, dtype=np.int64),
+            np.asarray(masks, dtype=np.int64),
+        )
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def detections(self, index: int) -> np.ndarray:
+        offset = int(self.offsets[index]) + RECORD.size
+        return np.frombuffer(self._map, dtype=np.float32, count=int(self.counts[index]) * 6, offset=offset).reshape(-1, 6)
+
+    def zones(self, index: int, count: int) -> np.ndarray | None:
+        """Bool mask of the ``count`` zones analysed on record ``index``, ``None`` when all were."""
+        size = int(self.mask_bytes[index])
+        if not size:
+            return None
+        offset = int(self.offsets[index]) + RECORD.size + int(self.counts[index]) * ROW_BYTES
+        packed = np.frombuffer(self._map, dtype=np.uint8, count=size, offset=offset)
+        return np.unpackbits(packed, count=count).astype(bool)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield int(self.frame_ids[i]), float(self.timestamps[i]), self.detections(i)
+
+    @property
+    def names(self) -> dict[int, str]:
+        return {int(k): v for k, v in self.metadata.get("names", {}).items()}
+
+    def close(self) -> None:
+        # Views handed out by detections() keep the map alive; let the GC close it in that case
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+
+class ReplayDetector:
+    """Detector backend that returns the recorded detections of the next frame on every call."""
+
+    backend = "replay"
+
+    def __init__(self, path: str | Path, loop: bool = False):
+        self.log = DetectionLog(path)
+        self.weights = self.log.path
+        self.names = self.log.names
+        self.loop = loop
+        self.position = 0
+
+    def __call__(self, frame: np.ndarray | None = None, conf: float | None = None) -> np.ndarray:
+        if self.position >= len(self.log):
+            if not self.loop or not len(self.log):
+                return np.empty((0, 6), dtype=np.float32)
+            self.position = 0
+        rows = self.log.detections(self.position)
+        self.position += 1
+        if conf is not None:
+            rows = rows[rows[:, 4] >= conf]
+        return rows
+
+
+class ReplayCapture:
+    """``cv2.VideoCapture`` stand-in that yields one frame per log record.
+
+    Frames come from the original video when ``video`` is given (seeked to the
+    recorded frame index), otherwise a blank canvas of the recorded size is
+    reused so drawing code keeps working. With ``realtime`` the reads are
+    paced by the recorded timestamps.
+    """
+
+    def __init__(self, log: DetectionLog, video: str | None = None, realtime: bool = False):
+        import cv2
+
+        self._cv2 = cv2
+        self.log = log
+        self.realtime = realtime
+        self.position = 0
+        self._video = cv2.VideoCapture(video) if video else None
+        self._video_pos = 0
+        self._canvas = np.zeros((log.height, log.width, 3), dtype=np.uint8)
+        self._started: float | None = None
+
+    def zones(self, count: int) -> np.ndarray | None:
+        """Zone mask of the frame last returned by ``read`` (see ``DetectionLog.zones``)."""
+        return self.log.zones(self.position - 1, count) if self.position else None
+
+    def isOpened(self) -> bool:  # noqa: N802 - mirrors cv2.VideoCapture
+        return self.position < len(self.log)
+
+    def read(self) -> tuple[bool, np.ndarray | None]:
+        if self.position >= len(self.log):
+            return False, None
+        if self.realtime:
+            ts = float(self.log.timestamps[self.position])
+            if self._started is None:
+                self._started = time.perf_counter() - ts
+            delay = self._started + ts - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame_id = int(self.log.frame_ids[self.position])
+        self.position += 1
+        if self._video is None:
+            self._canvas[:] = 0  # drop the previous frame's overlay
+            return True, self._canvas
+        if frame_id != self._video_pos:
+            self._video.set(self._cv2.CAP_PROP_POS_FRAMES, frame_id)
+        ok, frame = self._video.read()
+        self._video_pos = frame_id + 1
+        return (True, frame) if ok else (True, self._canvas)
+
+    def get(self, prop: int) -> float:
+        cv2 = self._cv2
+        if prop == cv2.CAP_PROP_FPS:
+            return self.log.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.log.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.log.height)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.log))
+        return 0.0
+
+    def release(self) -> None:
+        if self._video is not None:
+            self._video.release()
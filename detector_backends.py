@@ -0,0 +1,253 @@
+"""Pluggable detector backends returning ``results[0].boxes.data``-style arrays.
+
+Every backend is a callable ``detector(frame, conf=None) -> np.ndarray`` of
+shape ``(N, 6)`` with float32 columns ``x1, y1, x2, y2, conf, cls`` in the
+pixel coordinates of the input frame, exactly like
+``ultralytics.YOLO(frame)[0].boxes.data``. ``load_detector`` picks the
+backend from the weights path:
+
+- ``*.pt``                      PyTorch via ultralytics (reference)
+- ``*.onnx``                    ONNX Runtime (CPU), FP32 or INT8 QDQ models
+- ``*.xml`` / ``*_openvino_model`` OpenVINO IR
+- ``*.detlog``                  recorded detections replayed frame by frame (``detection_log.py``)
+
+Export and INT8 quantization live in ``export_model.py``.
+"""
+from __future__ import annotations
+
+import ast
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+DEFAULT_CONFIDENCE = 0.25  # ultralytics predict() default
+DEFAULT_IMGSZ = 640
+NMS_IOU_THRESHOLD = 0.7
+LETTERBOX_COLOR = (114, 114, 114)
+BACKENDS = ("auto", "ultralytics", "onnx", "openvino", "replay")
+WARMUP_RUNS = 2
+
+
+def letterbox(frame: np.ndarray, size: tuple[int, int]) -> tuple[np.ndarray, float, tuple[float, float]]:
+    """Resize with unchanged aspect ratio and pad to ``size`` (h, w) like ultralytics' LetterBox.
+
+    Returns the ``1x3xHxW`` float32 RGB blob in ``[0, 1]``, the scale ratio
+    and the ``(pad_w, pad_h)`` offsets needed to map boxes back.
+    """
+    height, width = frame.shape[:2]
+    new_h, new_w = size
+    ratio = min(new_h / height, new_w / width)
+    unpad_w, unpad_h = int(round(width * ratio)), int(round(height * ratio))
+    pad_w, pad_h = (new_w - unpad_w) / 2, (new_h - unpad_h) / 2
+    if (width, height) != (unpad_w, unpad_h):
+        frame = cv2.resize(frame, (unpad_w, unpad_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    padded = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR)
+    blob = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)
+    return blob, ratio, (pad_w, pad_h)
+
+
+def scale_boxes_back(
+    boxes: np.ndarray,
+    ratio: float,
+    pad: tuple[float, float],
+    frame_shape: tuple[int, ...],
+) -> np.ndarray:
+    """Map ``x1, y1, x2, y2`` from letterboxed input coordinates back to the frame (in place)."""
+    height, width = frame_shape[:2]
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - pad[0]) / ratio).clip(0, width)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - pad[1]) / ratio).clip(0, height)
+    return boxes
+
+
+def decode_output(output: np.ndarray, conf: float) -> np.ndarray:
+    """Turn a raw exported-model output into ``(N, 6)`` rows in letterboxed coordinates.
+
+    Handles both the YOLOv10 end-to-end head (``1 x max_det x 6``, already
+    NMS-free) and the classic ``1 x (4 + nc) x anchors`` head, which needs NMS.
+    """
+    pred = output[0]
+    if pred.ndim == 2 and pred.shape[-1] == 6:
+        return pred[pred[:, 4] >= conf].astype(np.float32)
+
+    pred = pred.T  # anchors x (4 + nc)
+    scores = pred[:, 4:]
+    cls = scores.argmax(axis=1)
+    best = scores[np.arange(len(cls)), cls]
+    keep = best >= conf
+    if not keep.any():
+        return np.empty((0, 6), dtype=np.float32)
+    cx, cy, w, h = pred[keep, :4].T
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    best, cls = best[keep], cls[keep]
+    # Class-aware NMS via the usual per-class coordinate offset
+    offset = cls[:, None] * 4096.0
+    shifted = xyxy + offset
+    rects = np.column_stack([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]])
+    idx = cv2.dnn.NMSBoxes(rects.tolist(), best.tolist(), conf, NMS_IOU_THRESHOLD)
+    idx = np.asarray(idx, dtype=np.intp).reshape(-1)
+    return np.column_stack([xyxy[idx], best[idx], cls[idx]]).astype(np.float32)
+
+
+def _parse_names(raw) -> dict[int, str]:
+    if isinstance(raw, dict):
+        return {int(k): str(v) for k, v in raw.items()}
+    if isinstance(raw, str):
+        try:
+            return _parse_names(ast.literal_eval(raw))
+        except (ValueError, SyntaxError):
+            return {}
+    return {}
+
+
+class UltralyticsDetector:
+    """PyTorch eager inference through ``ultralytics.YOLO`` (the reference backend)."""
+
+    backend = "ultralytics"
+
+    def __init__(self, weights: str | Path, imgsz: int | None = None):
+        from ultralytics import YOLO
+
+        self.weights = Path(weights)
+        self.model = YOLO(str(weights))
+        self.names = dict(self.model.names)
+        self.imgsz = imgsz
+
+    def __call__(self, frame: np.ndarray, conf: float | None = None) -> np.ndarray:
+        kwargs = {"conf": DEFAULT_CONFIDENCE if conf is None else conf, "verbose": False}
+        if self.imgsz:
+            kwargs["imgsz"] = self.imgsz
+        results = self.model(frame, **kwargs)
+        return results[0].boxes.data.cpu().numpy().astype(np.float32, copy=False)
+
+
+class _ExportedDetector:
+    """Shared letterbox / decode path for runtimes fed with a raw NCHW blob."""
+
+    backend = "exported"
+    input_size: tuple[int, int] = (DEFAULT_IMGSZ, DEFAULT_IMGSZ)
+    names: dict[int, str] = {}
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def __call__(self, frame: np.ndarray, conf: float | None = None) -> np.ndarray:
+        blob, ratio, pad = letterbox(frame, self.input_size)
+        rows = decode_output(self._infer(blob), DEFAULT_CONFIDENCE if conf is None else conf)
+        return scale_boxes_back(rows, ratio, pad, frame.shape)
+
+
+class OnnxDetector(_ExportedDetector):
+    """ONNX Runtime on CPU; works for both FP32 exports and INT8 QDQ-quantized models."""
+
+    backend = "onnx"
+
+    def __init__(self, weights: str | Path, threads: int | None = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise ImportError("ONNX backend requires `pip install onnxruntime`") from exc
+
+        self.weights = Path(weights)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(weights), options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        h, w = model_input.shape[2:4]
+        self.input_size = (h if isinstance(h, int) else DEFAULT_IMGSZ, w if isinstance(w, int) else DEFAULT_IMGSZ)
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = _parse_names(metadata.get("names"))
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenVinoDetector(_ExportedDetector):
+    """OpenVINO IR compiled for CPU (``*.xml`` or an ``*_openvino_model`` directory)."""
+
+    backend = "openvino"
+
+    def __init__(self, weights: str | Path):
+        try:
+            import openvino as ov
+        except ImportError as exc:
+            raise ImportError("OpenVINO backend requires `pip install openvino`") from exc
+
+        path = Path(weights)
+        xml_path = next(path.glob("*.xml")) if path.is_dir() else path
+        self.weights = xml_path
+        core = ov.Core()
+        model = core.read_model(str(xml_path))
+        self.compiled = core.compile_model(model, "CPU", {"PERFORMANCE_HINT": "LATENCY"})
+        self.request = self.compiled.create_infer_request()
+        shape = self.compiled.inputs[0].get_partial_shape()
+        h, w = shape[2], shape[3]
+        self.input_size = (
+            h.get_length() if h.is_static else DEFAULT_IMGSZ,
+            w.get_length() if w.is_static else DEFAULT_IMGSZ,
+        )
+        self.names = self._read_names(xml_path.parent / "metadata.yaml")
+
+    @staticmethod
+    def _read_names(metadata_path: Path) -> dict[int, str]:
+        if not metadata_path.exists():
+            return {}
+        try:
+            import yaml
+        except ImportError:
+            return {}
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            return _parse_names((yaml.safe_load(f) or {}).get("names"))
+
+    def _infer(self, blob: np.ndarray) -> np.ndarray:
+        self.request.infer({0: blob})
+        return self.request.get_output_tensor(0).data
+
+
+def detect_backend(weights: str | Path) -> str:
+    path = Path(weights)
+    if path.suffix == ".onnx":
+        return "onnx"
+    if path.suffix == ".xml" or (path.is_dir() and path.name.endswith("_openvino_model")):
+        return "openvino"
+    if path.suffix == ".detlog":
+        return "replay"
+    return "ultralytics"
+
+
+def load_detector(weights: str | Path, backend: str = "auto", imgsz: int | None = None):
+    """Instantiate the detector backend for ``weights`` (``backend='auto'`` guesses from the path)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    if backend == "auto":
+        backend = detect_backend(weights)
+    if backend == "onnx":
+        return OnnxDetector(weights)
+    if backend == "openvino":
+        return OpenVinoDetector(weights)
+    if backend == "replay":
+        from detection_log import ReplayDetector
+
+        return ReplayDetector(weights)
+    return UltralyticsDetector(weights, imgsz=imgsz)
+
+
+def warmup(detector, height: int, width: int, runs: int = WARMUP_RUNS) -> float:
+    """Run dummy frames at the stream resolution so graph setup is not paid on the first real frame.
+
+    The first call builds the predictor / allocates runtime buffers for the
+    input shape; the second one settles caches. Returns the elapsed seconds.
+    """
+    if getattr(detector, "backend", None) == "replay":
+        return 0.0  # every call would consume a recorded frame
+    started = time.perf_counter()
+    dummy = np.full((height, width, 3), LETTERBOX_COLOR[0], dtype=np.uint8)
+    for _ in range(runs):
+        detector(dummy)
+    return time.perf_counter() - started
@@ -0,0 +1,213 @@
+"""Cropped evidence snapshots of zones whose gap state changed, instead of a full recording.
+
+``EvidenceWriter.observe`` is called once per zone and frame. When a zone's
+state changes (its missing-slot count, or blocked / visible), the zone is
+cropped out of the frame and queued. A background thread draws the
+detections and gap rectangles, encodes the crop as JPEG or WebP and writes
+it next to a small JSON sidecar::
+
+    evidence/cam0/zone_1_00004512.jpg
+    evidence/cam0/zone_1_00004512.json   {"zone": "zone_1", "ts": ..., "missing": 2, "gaps": [...], ...}
+
+Each zone is saved at most once per ``min_interval`` seconds. A change
+inside that window is not lost; it is saved as soon as the window ends if
+the zone still differs from its last snapshot. A few tens of kB per event
+replace a continuous 1080x1920 video.
+"""
+from __future__ import annotations
+
+import json
+import queue
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Hashable
+
+import cv2
+import numpy as np
+
+FORMATS = ("jpg", "webp")
+DEFAULT_QUALITY = 85
+MIN_INTERVAL_SECONDS = 30.0   # per zone
+CROP_MARGIN = 0.1             # context around the zone, as a fraction of its size
+QUEUE_SIZE = 64               # pending crops; beyond this new snapshots are dropped, never the frame loop
+
+BOX_COLOR = (0, 255, 0)
+GAP_COLOR = (0, 0, 255)
+BLOCKED_COLOR = (0, 255, 255)
+
+
+@dataclass
+class _Snapshot:
+    key: Hashable
+    name: str
+    frame: int
+    ts: float
+    crop: np.ndarray
+    origin: tuple[int, int]
+    zone: tuple[int, int, int, int]
+    result: dict
+    previous: dict | None
+    extra: dict = field(default_factory=dict)
+
+
+def _state(result: dict) -> tuple:
+    return ("blocked",) if result["blocked"] else ("visible", result["missing"])
+
+
+def _summary(result: dict) -> dict:
+    if result["blocked"]:
+        return {"blocked": True}
+    return {"blocked": False, "stock": result["stock"], "missing": result["missing"]}
+
+
+class EvidenceWriter:
+    def __init__(
+        self,
+        out_dir: str | Path,
+        camera_id: str = "cam",
+        fmt: str = "jpg",
+        quality: int = DEFAULT_QUALITY,
+        min_interval: float = MIN_INTERVAL_SECONDS,
+        margin: float = CROP_MARGIN,
+    ):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported evidence format {fmt!r}; choose one of {FORMATS}")
+        self.out_dir = Path(out_dir) / camera_id
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.camera_id = camera_id
+        self.fmt = fmt
+        flag = cv2.IMWRITE_JPEG_QUALITY if fmt == "jpg" else cv2.IMWRITE_WEBP_QUALITY
+        self.params = [int(flag), int(quality)]
+        self.min_interval = min_interval
+        self.margin = margin
+        self._observed: dict[Hashable, tuple] = {}
+        self._saved: dict[Hashable, tuple[tuple, float, dict]] = {}   # state, ts, summary of the last snapshot
+        self.queued = 0
+        self.saved = 0
+        self.dropped = 0
+        self.deferred = 0
+        self.bytes = 0
+        self._queue: queue.Queue[_Snapshot | None] = queue.Queue(maxsize=QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="evidence-writer", daemon=True)
+        self._thread.start()
+
+    def observe(
+        self,
+        key: Hashable,
+        frame: np.ndarray,
+        zone: tuple[int, int, int, int],
+        result: dict,
+        frame_idx: int,
+        ts: float,
+        name: str | None = None,
+        extra: dict | None = None,
+    ) -> bool:
+        """Queue a snapshot if the zone's state changed; returns True when one was queued.
+
+        Call before overlays are drawn on ``frame``: only the crop is copied,
+        and only when a snapshot is actually taken.
+        """
+        state = _state(result)
+        changed = self._observed.get(key) != state
+        self._observed[key] = state
+        last = self._saved.get(key)
+        if last is None:
+            if not changed:
+                return False
+            # The first observation establishes the baseline; an empty or blocked zone is itself evidence
+            if not result["blocked"] and result["missing"] == 0:
+                self._saved[key] = (state, ts, _summary(result))
+                return False
+        elif last[0] == state:
+            return False
+        elif ts - last[1] < self.min_interval:
+            if changed:
+                self.deferred += 1
+            return False  # retried on later frames until the window ends
+
+        height, width = frame.shape[:2]
+        zx1, zy1, zx2, zy2 = zone
+        mx, my = int((zx2 - zx1) * self.margin), int((zy2 - zy1) * self.margin)
+        cx1, cy1 = max(zx1 - mx, 0), max(zy1 - my, 0)
+        cx2, cy2 = min(zx2 + mx, width), min(zy2 + my, height)
+        if cx2 <= cx1 or cy2 <= cy1:
+            return False
+        snapshot = _Snapshot(
+            key=key,
+            name=name or str(key),
+            frame=frame_idx,
+            ts=ts,
+            crop=frame[cy1:cy2, cx1:cx2].copy(),
+            origin=(cx1, cy1),
+            zone=(zx1, zy1, zx2, zy2),
+            result={"boxes": list(result["boxes"]), "gaps": list(result["gaps"]), **_summary(result)},
+            previous=last[2] if last else None,
+            extra=extra or {},
+        )
+        try:
+            self._queue.put_nowait(snapshot)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self._saved[key] = (state, ts, _summary(result))
+        self.queued += 1
+        return True
+
+    def _draw(self, snapshot: _Snapshot) -> np.ndarray:
+        image = snapshot.crop
+        ox, oy = snapshot.origin
+        zx1, zy1, zx2, zy2 = snapshot.zone
+        cv2.rectangle(image, (zx1 - ox, zy1 - oy), (zx2 - ox, zy2 - oy), BLOCKED_COLOR, 1)
+        for x1, y1, x2, y2 in snapshot.result["boxes"]:
+            cv2.rectangle(image, (int(x1) - ox, int(y1) - oy), (int(x2) - ox, int(y2) - oy), BOX_COLOR, 2)
+        for gx1, gy1, gx2, gy2 in snapshot.result["gaps"]:
+            cv2.rectangle(image, (gx1 - ox, gy1 - oy), (gx2 - ox, gy2 - oy), GAP_COLOR, 2)
+        label = "VIEW BLOCKED" if snapshot.result["blocked"] else f"{snapshot.name}: missing {snapshot.result['missing']}"
+        cv2.putText(image, label, (4, 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, GAP_COLOR, 1)
+        return image
+
+    def _write(self, snapshot: _Snapshot) -> None:
+        ok, encoded = cv2.imencode("." + self.fmt, self._draw(snapshot), self.params)
+        if not ok:
+            print(f"[evidence] Failed to encode snapshot of {snapshot.name}")
+            return
+        stem = f"{str(snapshot.key).replace('/', '_')}_{snapshot.frame:08d}"
+        image_path = self.out_dir / f"{stem}.{self.fmt}"
+        image_path.write_bytes(encoded.tobytes())
+        ox, oy = snapshot.origin
+        sidecar = {
+            "camera": self.camera_id,
+            "zone": str(snapshot.key),
+            "name": snapshot.name,
+            "frame": snapshot.frame,
+            "ts": round(snapshot.ts, 3),
+            **{k: snapshot.result[k] for k in ("blocked", "stock", "missing") if k in snapshot.result},
+            "previous": snapshot.previous,
+            "zone_box": list(snapshot.zone),
+            "crop_origin": [ox, oy],
+            "gaps": [[int(v) for v in gap] for gap in snapshot.result["gaps"]],
+            "image": image_path.name,
+            **snapshot.extra,
+        }
+        (self.out_dir / f"{stem}.json").write_text(json.dumps(sidecar, ensure_ascii=False), encoding="utf-8")
+        self.saved += 1
+        self.bytes += len(encoded)
+
+    def _run(self) -> None:
+        while True:
+            snapshot = self._queue.get()
+            if snapshot is None:
+                return
+            try:
+                self._write(snapshot)
+            except OSError as exc:
+                print(f"[evidence] Could not write snapshot of {snapshot.name}: {exc}")
+
+    def stats(self) -> dict[str, int]:
+        return {"saved": self.saved, "deferred": self.deferred, "dropped": self.dropped, "bytes": self.bytes}
+
+    def close(self) -> None:
+        """Flush pending snapshots and stop the writer thread."""
+        self._queue.put(None)
+        self._thread.join()
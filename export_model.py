@@ -0,0 +1,162 @@
+"""Export models/best.pt to ONNX or OpenVINO IR, optionally INT8-quantized on our own footage.
+
+Examples::
+
+    python export_model.py --format onnx
+    python export_model.py --format onnx --int8 --calib test2.mp4 test3.mp4
+    python export_model.py --format openvino --int8 --calib test2.mp4 test3.mp4
+
+The exported files are loaded by ``detector_backends.load_detector`` (and
+thus ``--weights`` of the monitors) based on their suffix.
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from detector_backends import DEFAULT_IMGSZ, letterbox
+from zone_creator import iter_keyframes
+
+MODEL_PATH = Path("models/best.pt")
+CALIBRATION_VIDEOS = ("test2.mp4", "test3.mp4")
+CALIBRATION_FRAMES = 120
+
+
+def calibration_blobs(videos: list[str], frames: int, imgsz: int) -> list[np.ndarray]:
+    """Sample frames evenly across ``videos`` and preprocess them exactly like inference."""
+    per_video = max(frames // max(len(videos), 1), 1)
+    blobs = []
+    for video in videos:
+        if not Path(video).exists():
+            print(f"[export] Calibration video not found, skipping: {video}")
+            continue
+        for frame in iter_keyframes(video, per_video):
+            blob, _, _ = letterbox(frame, (imgsz, imgsz))
+            blobs.append(blob)
+    if not blobs:
+        raise FileNotFoundError("No calibration frames could be read")
+    print(f"[export] Collected {len(blobs)} calibration frames from {len(videos)} video(s)")
+    return blobs
+
+
+def export_base(weights: Path, fmt: str, imgsz: int) -> Path:
+    from ultralytics import YOLO
+
+    model = YOLO(str(weights))
+    exported = model.export(format=fmt, imgsz=imgsz, half=False, int8=False, dynamic=False)
+    return Path(exported)
+
+
+def quantize_onnx(fp32_path: Path, blobs: list[np.ndarray]) -> Path:
+    try:
+        from onnxruntime.quantization import (
+            CalibrationDataReader,
+            CalibrationMethod,
+            QuantFormat,
+            QuantType,
+            quantize_static,
+        )
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+    except ImportError as exc:
+        raise ImportError("INT8 ONNX export requires `pip install onnxruntime`") from exc
+
+    import onnxruntime as ort
+
+    input_name = ort.InferenceSession(str(fp32_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._iter = iter(blobs)
+
+        def get_next(self):
+            blob = next(self._iter, None)
+            return None if blob is None else {input_name: blob}
+
+    prepared = fp32_path.with_name(f"{fp32_path.stem}_prep.onnx")
+    int8_path = fp32_path.with_name(f"{fp32_path.stem}_int8.onnx")
+    quant_pre_process(str(fp32_path), str(prepared))
+    quantize_static(
+        str(prepared),
+        str(int8_path),
+        FrameReader(),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+    )
+    prepared.unlink(missing_ok=True)
+    _copy_onnx_metadata(fp32_path, int8_path)
+    return int8_path
+
+
+def _copy_onnx_metadata(source: Path, target: Path) -> None:
+    """Keep ultralytics' ``names``/``imgsz`` metadata on the quantized model."""
+    try:
+        import onnx
+    except ImportError:
+        return
+    src = onnx.load(str(source), load_external_data=False)
+    dst = onnx.load(str(target))
+    existing = {prop.key for prop in dst.metadata_props}
+    for prop in src.metadata_props:
+        if prop.key not in existing:
+            dst.metadata_props.add(key=prop.key, value=prop.value)
+    onnx.save(dst, str(target))
+
+
+def quantize_openvino(ir_dir: Path, blobs: list[np.ndarray]) -> Path:
+    try:
+        import nncf
+        import openvino as ov
+    except ImportError as exc:
+        raise ImportError("INT8 OpenVINO export requires `pip install openvino nncf`") from exc
+
+    xml_path = next(ir_dir.glob("*.xml"))
+    core = ov.Core()
+    model = core.read_model(str(xml_path))
+    quantized = nncf.quantize(model, nncf.Dataset(blobs), preset=nncf.QuantizationPreset.MIXED, subset_size=len(blobs))
+    int8_dir = ir_dir.with_name(ir_dir.name.replace("_openvino_model", "_int8_openvino_model"))
+    int8_dir.mkdir(parents=True, exist_ok=True)
+    ov.save_model(quantized, str(int8_dir / xml_path.name))
+    metadata = ir_dir / "metadata.yaml"
+    if metadata.exists():
+        shutil.copy(metadata, int8_dir / metadata.name)
+    return int8_dir
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", type=str, default=str(MODEL_PATH))
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=DEFAULT_IMGSZ)
+    parser.add_argument("--int8", action="store_true", help="also write an INT8 model calibrated on --calib videos")
+    parser.add_argument("--calib", nargs="+", default=list(CALIBRATION_VIDEOS), help="calibration videos")
+    parser.add_argument("--calib-frames", type=int, default=CALIBRATION_FRAMES)
+    args = parser.parse_args()
+
+    weights = Path(args.weights)
+    if not weights.exists():
+        print(f"[export] Weights not found: {weights}")
+        sys.exit(1)
+
+    print(f"[export] Exporting {weights} to {args.format} at imgsz={args.imgsz}")
+    exported = export_base(weights, args.format, args.imgsz)
+    print(f"[export] FP32 model: {exported}")
+
+    if args.int8:
+        blobs = calibration_blobs(args.calib, args.calib_frames, args.imgsz)
+        if args.format == "onnx":
+            quantized = quantize_onnx(exported, blobs)
+        else:
+            quantized = quantize_openvino(exported, blobs)
+        print(f"[export] INT8 model: {quantized}")
+        print(f"[export] Compare with: python benchmarks/bench_backends.py --models {weights} {exported} {quantized}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""Decode a camera once and share the frames with every local consumer through shared memory.
+
+A capture daemon decodes straight into a ring of shared-memory frame
+slots. Each published frame gets a sequence number. Consumers attach by
+name and read numpy views of the slots without copying. Every consumer
+keeps its own position, so a slow one just skips frames and never holds
+up the decoder or the other consumers::
+
+    python frame_bus.py serve --source rtsp://cam0/stream --name cam0
+    python zone_monitor.py --source bus:cam0
+    python frame_bus.py record --name cam0 --output outputs/cam0.mp4
+
+Slots are guarded by a per-slot seqlock. The writer stores ``begin = seq``,
+decodes, then stores ``end = seq``. A reader accepts a slot only when
+``begin == end == seq`` both before and after it has used the pixels.
+
+The header holds the daemon's pid. A second ``serve`` with the same name
+refuses to start while that process is alive, and only takes over a
+segment left behind by a daemon that died.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import signal
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import cv2
+import numpy as np
+
+MAGIC = b"SHFRMBUS"
+HEADER = struct.Struct("<8sIIIIQdQQ")    # magic, width, height, channels, slots, frame_bytes, fps, latest seq, writer pid
+SLOT_META = struct.Struct("<QQd")        # begin seq, end seq, timestamp
+LATEST_OFFSET = 8 + 4 * 4 + 8 + 8
+DEFAULT_SLOTS = 8
+BUS_PREFIX = "bus:"
+POLL_SECONDS = 0.001
+RECONNECT_SECONDS = 2.0
+
+
+def _segment_name(name: str) -> str:
+    return f"shelf_bus_{name}"
+
+
+def _untrack(shm: shared_memory.SharedMemory) -> None:
+    # Attaching must not unlink the segment at exit (Python < 3.13 tracks attachments too)
+    try:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    except Exception:  # noqa: BLE001
+        pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by another user
+    return True
+
+
+class FrameBusWriter:
+    def __init__(self, name: str, width: int, height: int, fps: float = 30.0, slots: int = DEFAULT_SLOTS, channels: int = 3):
+        self.name = name
+        self.shape = (height, width, channels)
+        self.frame_bytes = width * height * channels
+        self.slots = slots
+        self.meta_offset = HEADER.size
+        self.data_offset = (HEADER.size + SLOT_META.size * slots + 63) & ~63
+        size = self.data_offset + self.frame_bytes * slots
+        try:
+            self.shm = shared_memory.SharedMemory(_segment_name(name), create=True, size=size)
+        except FileExistsError:
+            existing = shared_memory.SharedMemory(_segment_name(name))
+            owner = HEADER.unpack_from(existing.buf, 0)[-1] if existing.size >= HEADER.size else 0
+            if owner and owner != os.getpid() and _pid_alive(owner):
+                _untrack(existing)
+                existing.close()
+                raise FileExistsError(f"Frame bus {name!r} is being served by process {owner}")
+            # Left behind by a crashed daemon; nobody can be writing to it any more
+            existing.close()
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(_segment_name(name), create=True, size=size)
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, width, height, channels, slots, self.frame_bytes, fps, 0, os.getpid())
+        self.views = [
+            np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=self.data_offset + i * self.frame_bytes)
+            for i in range(slots)
+        ]
+        self.seq = 0
+
+    def _begin(self, seq: int) -> int:
+        slot = seq % self.slots
+        struct.pack_into("<Q", self.shm.buf, self.meta_offset + slot * SLOT_META.size, seq)
+        return slot
+
+    def _commit(self, seq: int, slot: int, ts: float) -> None:
+        struct.pack_into("<Qd", self.shm.buf, self.meta_offset + slot * SLOT_META.size + 8, seq, ts)
+        struct.pack_into("<Q", self.shm.buf, LATEST_OFFSET, seq)
+        self.seq = seq
+
+    def publish(self, frame: np.ndarray, ts: float | None = None) -> int:
+        """Copy ``frame`` into the next slot and return its sequence number."""
+        seq = self.seq + 1
+        slot = self._begin(seq)
+        np.copyto(self.views[slot], frame)
+        self._commit(seq, slot, time.time() if ts is None else ts)
+        return seq
+
+    def publish_from(self, capture: cv2.VideoCapture) -> int | None:
+        """Decode the next frame of ``capture`` directly into the next slot (no intermediate copy)."""
+        seq = self.seq + 1
+        slot = self._begin(seq)
+        view = self.views[slot]
+        ok, frame = capture.read(view)
+        if not ok:
+            return None
+        if frame is not view:
+            if frame.shape != self.shape:
+                frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+            np.copyto(view, frame)
+        self._commit(seq, slot, time.time())
+        return seq
+
+    def close(self) -> None:
+        self.views = []
+        self.shm.close()
+        self.shm.unlink()
+
+
+class FrameBusReader:
+    def __init__(self, name: str, timeout: float = 10.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.shm = shared_memory.SharedMemory(_segment_name(name))
+                break
+            except FileNotFoundError:
+                if time.monotonic() > deadline:
+                    raise FileNotFoundError(f"No frame bus named {name!r}; start `frame_bus.py serve --name {name}`")
+                time.sleep(0.1)
+        _untrack(self.shm)
+        magic, width, height, channels, slots, frame_bytes, fps, _, _ = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory {name!r} is not a frame bus")
+        self.name = name
+        self.shape = (height, width, channels)
+        self.slots = slots
+        self.fps = fps
+        self.meta_offset = HEADER.size
+        self.data_offset = (HEADER.size + SLOT_META.size * slots + 63) & ~63
+        views = []
+        for i in range(slots):
+            view = np.ndarray(self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=self.data_offset + i * frame_bytes)
+            view.flags.writeable = False  # other consumers see the same pixels
+            views.append(view)
+        self.views = views
+        self.last_seq = 0
+        self.skipped = 0
+
+    @property
+    def latest_seq(self) -> int:
+        return struct.unpack_from("<Q", self.shm.buf, LATEST_OFFSET)[0]
+
+    def _slot_meta(self, slot: int) -> tuple[int, int, float]:
+        return SLOT_META.unpack_from(self.shm.buf, self.meta_offset + slot * SLOT_META.size)
+
+    def is_valid(self, seq: int) -> bool:
+        """True while frame ``seq`` is still intact in its slot (call after using a zero-copy view)."""
+        begin, end, _ = self._slot_meta(seq % self.slots)
+        return begin == end == seq
+
+    def read(self, timeout: float | None = None) -> tuple[int, float, np.ndarray] | None:
+        """Wait for a frame newer than the last one read; returns ``(seq, ts, view)`` or ``None``.
+
+        Always jumps to the newest frame; frames missed in between are counted
+        in ``skipped``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            seq = self.latest_seq
+            if seq > self.last_seq:
+                begin, end, ts = self._slot_meta(seq % self.slots)
+                if begin == end == seq:
+                    if self.last_seq:
+                        self.skipped += seq - self.last_seq - 1
+                    self.last_seq = seq
+                    return seq, ts, self.views[seq % self.slots]
+            if deadline is not None and time.monotonic() > deadline:
+                return None
+            time.sleep(POLL_SECONDS)
+
+    def close(self) -> None:
+        self.views = []
+        self.shm.close()
+
+
+class BusCapture:
+    """``cv2.VideoCapture`` stand-in for ``bus:<name>`` sources.
+
+    ``read`` hands out a private copy by default, because the monitors draw
+    their overlays into the frame. A 1080x1920 copy costs about a
+    millisecond, against tens of milliseconds for decoding. Read-only
+    consumers can pass ``copy=False`` to get the zero-copy view.
+    """
+
+    def __init__(self, name: str, copy: bool = True, timeout: float = 5.0):
+        self.reader = FrameBusReader(name)
+        self.copy = copy
+        self.timeout = timeout
+        self.last_ts: float | None = None   # when the daemon decoded the frame last returned by read()
+        self._open = True
+
+    def isOpened(self) -> bool:  # noqa: N802 - mirrors cv2.VideoCapture
+        return self._open
+
+    def read(self, image: np.ndarray | None = None) -> tuple[bool, np.ndarray | None]:
+        """Like ``cv2.VideoCapture.read``; a matching ``image`` is filled in place instead of allocating."""
+        while True:
+            item = self.reader.read(self.timeout)
+            if item is None:
+                return False, None  # daemon stopped publishing
+            seq, ts, view = item
+            if not self.copy:
+                self.last_ts = ts
+                return True, view
+            if image is not None and image.shape == view.shape:
+                np.copyto(image, view)
+                frame = image
+            else:
+                frame = view.copy()
+            if self.reader.is_valid(seq):
+                self.last_ts = ts
+                return True, frame
+            # Overwritten while copying (we lagged a whole ring); take the next frame
+
+    def get(self, prop: int) -> float:
+        if prop == cv2.CAP_PROP_FPS:
+            return self.reader.fps
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.reader.shape[1])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.reader.shape[0])
+        return 0.0
+
+    def release(self) -> None:
+        if self._open:
+            self._open = False
+            self.reader.close()
+
+
+def open_capture(source):
+    """``cv2.VideoCapture`` for cameras / files / URLs, ``BusCapture`` for ``bus:<name>``."""
+    if isinstance(source, str) and source.startswith(BUS_PREFIX):
+        return BusCapture(source[len(BUS_PREFIX):])
+    return cv2.VideoCapture(source)
+
+
+def serve(args: argparse.Namespace) -> None:
+    source = int(args.source) if args.source.isdigit() else args.source
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        print(f"[bus] Unable to open {args.source}")
+        sys.exit(1)
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    try:
+        writer = FrameBusWriter(args.name, width, height, fps, slots=args.slots)
+    except FileExistsError as exc:
+        capture.release()
+        print(f"[bus] {exc}; stop it or pick another --name")
+        sys.exit(1)
+    print(f"[bus] Serving {args.source} as {BUS_PREFIX}{args.name} ({width}x{height} @ {fps:.1f} fps, {args.slots} slots)")
+
+    stop = []
+    signal.signal(signal.SIGTERM, lambda *_: stop.append(True))
+    is_file = isinstance(source, str) and "://" not in source
+    frame_interval = 1.0 / fps if is_file and not args.fast else 0.0
+    published, window_started = 0, time.perf_counter()
+    next_due = time.perf_counter()
+    try:
+        while not stop:
+            if writer.publish_from(capture) is None:
+                if is_file and args.loop:
+                    capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    continue
+                if is_file:
+                    break
+                print(f"[bus] Stream dropped, reconnecting in {RECONNECT_SECONDS:.0f}s")
+                time.sleep(RECONNECT_SECONDS)
+                capture.release()
+                capture = cv2.VideoCapture(source)
+                continue
+            published += 1
+            if frame_interval:
+                next_due += frame_interval
+                time.sleep(max(0.0, next_due - time.perf_counter()))
+            now = time.perf_counter()
+            if now - window_started >= 10:
+                print(f"[bus] {published / (now - window_started):.1f} fps published (seq {writer.seq})")
+                published, window_started = 0, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.release()
+        writer.close()
+        print("[bus] Stopped")
+
+
+def record(args: argparse.Namespace) -> None:
+    reader = FrameBusReader(args.name)
+    height, width = reader.shape[:2]
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    out = cv2.VideoWriter(args.output, fourcc, reader.fps, (width, height))
+    print(f"[bus] Recording {BUS_PREFIX}{args.name} to {args.output}")
+    frames, torn = 0, 0
+    buffer = np.empty(reader.shape, dtype=np.uint8)
+    try:
+        while True:
+            item = reader.read(timeout=5.0)
+            if item is None:
+                break
+            seq, _, view = item
+            # Encoding is slower than the copy: snapshot the slot and validate before it reaches the file
+            np.copyto(buffer, view)
+            if not reader.is_valid(seq):
+                torn += 1
+                continue
+            out.write(buffer)
+            frames += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        out.release()
+        reader.close()
+        print(f"[bus] Recorded {frames} frames ({reader.skipped} skipped while encoding, {torn} overwritten while copying)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_serve = sub.add_parser("serve", help="decode a source into a shared-memory ring")
+    p_serve.add_argument("--source", type=str, default="0")
+    p_serve.add_argument("--name", type=str, default="cam0")
+    p_serve.add_argument("--slots", type=int, default=DEFAULT_SLOTS)
+    p_serve.add_argument("--loop", action="store_true", help="restart video files at the end")
+    p_serve.add_argument("--fast", action="store_true", help="do not pace video files to their fps")
+    p_record = sub.add_parser("record", help="write a bus to a video file")
+    p_record.add_argument("--name", type=str, default="cam0")
+    p_record.add_argument("--output", type=str, required=True)
+    args = parser.parse_args()
+    serve(args) if args.command == "serve" else record(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,42 @@
 from __future__ import annotations
 
 import json
+import os
+import socket
 import sys
 import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import TYPE_CHECKING
 
 import cv2
 import numpy as np
-import paho.mqtt.client as mqtt
-from ultralytics import YOLO
+
+from buffer_pool import peak_rss_mb
+from detector_backends import load_detector, warmup
+from live_view import LiveViewServer
+from frame_bus import BUS_PREFIX, open_capture
+from latest_frame import LatestFrameCapture, is_live_source
+from metrics import Counter, Gauge, Histogram, start_metrics_server
+from row_clustering import RowTracker, cluster_rows  # noqa: F401 - cluster_rows kept importable here
+from startup import StartupTimeline
+from tracing import FrameTrace
+from width_priors import WidthPriors
+
+if TYPE_CHECKING:
+    import paho.mqtt.client as mqtt
 
 BROKER_HOST = "broker.emqx.io"
 BROKER_PORT = 1883
 TOPIC = "smart_retail/group3/shelf"
 
-MODEL_PATH = Path("models/best.pt")
+MODEL_PATH = Path(os.environ.get("SHELF_MODEL_PATH", "models/best.pt"))  # .pt, .onnx or OpenVINO IR
+DEVICE_ID = os.environ.get("SHELF_DEVICE_ID", socket.gethostname())
+METRICS_PORT = int(os.environ.get("SHELF_METRICS_PORT", "0"))  # 0 disables the /metrics endpoint
+LATEST_FRAME = os.environ.get("SHELF_LATEST_FRAME") == "1"  # live sources: always infer on the newest frame
+WIDTH_PRIORS_PATH = os.environ.get("SHELF_WIDTH_PRIORS")  # JSON file keeping learned facing widths across runs
+LIVE_PORT = int(os.environ.get("SHELF_LIVE_PORT", "0"))  # 0 disables the MJPEG live view
 PUBLISH_INTERVAL_SECONDS = 1.0
 CONFIDENCE_THRESHOLD = 0.15
 WINDOW_NAME = "YOLOv10 Shelf Monitor"
@@ -29,10 +49,19 @@ ZONE_RIGHT_LABEL = "Product B"
 OUTPUT_DIR = Path("outputs")
 OCCLUSION_WINDOW = 30
 OCCLUSION_DROP_RATIO = 0.6
+ROW_Y_THRESHOLD = 50.0
 IGNORE_ZONES: list[tuple[int, int]] = [(310, 360)]
 SHELF_START_X = 50
 SHELF_END_X = 600
 
+FRAMES_TOTAL = Counter("shelf_frames_total", "Frames processed")
+INFERENCE_SECONDS = Histogram("shelf_inference_seconds", "Detector latency per frame")
+FRAME_SECONDS = Histogram("shelf_frame_seconds", "End-to-end processing time per frame")
+ZONE_STOCK = Gauge("shelf_zone_stock", "Detected items per zone", ("zone",))
+SHELF_GAPS = Gauge("shelf_gaps", "Gap boxes on the shelf in the latest frame")
+ZONES_BLOCKED = Gauge("shelf_zones_blocked", "1 while the shelf view is occluded")
+MQTT_PUBLISHES = Counter("shelf_mqtt_publish_total", "MQTT publish attempts", ("result",))
+
 
 def ensure_model_exists(model_path: Path) -> None:
     if not model_path.exists():
@@ -42,21 +71,18 @@ def ensure_model_exists(model_path: Path) -> None:
 def resolve_video_source() -> int | str:
     if len(sys.argv) <= 1:
         return VIDEO_SOURCE_DEFAULT
+    if sys.argv[1].startswith(BUS_PREFIX):
+        return sys.argv[1]  # frames shared by a running `frame_bus.py serve`
     candidate = Path(sys.argv[1])
     if not candidate.exists():
         raise FileNotFoundError(f"Video file not found: {candidate}")
     return str(candidate)
 
 
-def extract_detections(result) -> list[tuple[float, float, float, float, float]]:
-    boxes = []
-    for box in result.boxes:
-        conf = float(box.conf.item())
-        if conf < CONFIDENCE_THRESHOLD:
-            continue
-        x1, y1, x2, y2 = map(float, box.xyxy[0].tolist())
-        boxes.append((x1, y1, x2, y2, conf))
-    return boxes
+def extract_detections(data: np.ndarray) -> list[tuple[float, float, float, float, float]]:
+    """Convert a ``boxes.data``-style ``(N, 6)`` array into ``(x1, y1, x2, y2, conf)`` tuples."""
+    kept = data[data[:, 4] >= CONFIDENCE_THRESHOLD, :5]
+    return [tuple(row) for row in kept.tolist()]
 
 
 def classify_detections(
@@ -96,13 +122,15 @@ def detect_gaps_for_row(
     row_boxes: list[tuple[float, float, float, float, float]],
     gap_factor: float,
     frame_width: int,
+    avg_width: float | None = None,
 ) -> tuple[list[tuple[int, int, int, int]], float]:
-    if len(row_boxes) < 2:
+    # Without a learned facing width (``avg_width``) one box gives no reliable slot size
+    if not row_boxes or (len(row_boxes) < 2 and not avg_width):
         return [], 0.0
 
     sorted_boxes = sorted(row_boxes, key=lambda b: b[0])
-    widths = [b[2] - b[0] for b in sorted_boxes]
-    avg_width = float(np.mean(widths)) if widths else 0.0
+    if not avg_width:
+        avg_width = float(np.mean([b[2] - b[0] for b in sorted_boxes]))
     if avg_width <= 0:
         return [], 0.0
 
@@ -202,8 +230,10 @@ def publish_inventory(
     zone_counts: dict[str, int],
     gap_count: int,
     status: str,
+    trace: FrameTrace | None = None,
 ) -> None:
     payload = {
+        "device_id": DEVICE_ID,
         "total": total,
         "details": {
             ZONE_LEFT_LABEL: zone_counts.get(ZONE_LEFT_LABEL, 0),
@@ -212,61 +242,81 @@ def publish_inventory(
         "gaps": gap_count,
         "status": status,
     }
+    if trace is not None:
+        payload["trace"] = trace.to_dict()
+    from paho.mqtt.client import MQTT_ERR_SUCCESS
+
     message = json.dumps(payload)
     result = client.publish(TOPIC, message, qos=1)
-    if result.rc != mqtt.MQTT_ERR_SUCCESS:
+    if result.rc != MQTT_ERR_SUCCESS:
+        MQTT_PUBLISHES.labels("failure").inc()
         print(f"[inference] Publish failed with status {result.rc}")
+    else:
+        MQTT_PUBLISHES.labels("success").inc()
 
 
-def cluster_rows(
-    boxes: Iterable[tuple[float, float, float, float, float]],
-    y_threshold: float,
-) -> list[list[tuple[float, float, float, float, float]]]:
-    rows: list[list[tuple[float, float, float, float, float]]] = []
-    centers: list[float] = []
+def connect_mqtt() -> mqtt.Client:
+    import paho.mqtt.client as mqtt
 
-    for box in sorted(boxes, key=lambda b: (b[1] + b[3]) / 2):
-        center_y = (box[1] + box[3]) / 2
-        for idx, current_center in enumerate(centers):
-            if abs(center_y - current_center) <= y_threshold:
-                rows[idx].append(box)
-                centers[idx] = (current_center * (len(rows[idx]) - 1) + center_y) / len(rows[idx])
-                break
-        else:
-            rows.append([box])
-            centers.append(center_y)
-
-    return rows
+    client = mqtt.Client()
+    print(f"[inference] Connecting to MQTT broker at {BROKER_HOST}:{BROKER_PORT}")
+    client.connect(BROKER_HOST, BROKER_PORT)
+    client.loop_start()
+    return client
 
 
 def main() -> None:
+    timeline = StartupTimeline("inference")
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+        print(f"[inference] Metrics at http://0.0.0.0:{METRICS_PORT}/metrics")
+    live = LiveViewServer(LIVE_PORT, title=WINDOW_NAME) if LIVE_PORT else None
+    if live:
+        print(f"[inference] Live view at http://0.0.0.0:{LIVE_PORT}/")
     ensure_model_exists(MODEL_PATH)
 
-    print(f"[inference] Loading YOLOv10 weights from {MODEL_PATH}")
-    model = YOLO(str(MODEL_PATH))
-    print(f"[inference] model.names -> {model.names}")
-
     try:
         source = resolve_video_source()
     except FileNotFoundError as exc:
         print(f"[inference] {exc}")
         sys.exit(1)
 
+    # Model load (torch / runtime import + weights) and the broker handshake overlap capture start-up
+    print(f"[inference] Loading YOLOv10 weights from {MODEL_PATH}")
+    startup_pool = ThreadPoolExecutor(max_workers=2)
+    model_future = startup_pool.submit(load_detector, MODEL_PATH)
+    client_future = startup_pool.submit(connect_mqtt)
+
     if isinstance(source, str):
         print(f"[inference] Playing video source {source}")
     else:
         print("[inference] Initializing webcam feed")
 
-    capture = cv2.VideoCapture(source)
+    if LATEST_FRAME and is_live_source(source):
+        # Drain the camera on a thread, infer on the newest frame and reconnect when the stream drops
+        capture = LatestFrameCapture(source, open_fn=open_capture, tag="inference")
+        if not capture.connected:
+            print("[inference] Video source not available yet, retrying in the background")
+    else:
+        capture = open_capture(source)
     if not capture.isOpened():
         print("[inference] Unable to open video source")
         sys.exit(1)
-
-    client = mqtt.Client()
-
-    print(f"[inference] Connecting to MQTT broker at {BROKER_HOST}:{BROKER_PORT}")
-    client.connect(BROKER_HOST, BROKER_PORT)
-    client.loop_start()
+    timeline.mark("capture")
+
+    model = model_future.result()
+    timeline.mark("model")
+    print(f"[inference] backend -> {model.backend}, model.names -> {model.names}")
+    warmup(
+        model,
+        int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or 480,
+        int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or 640,
+    )
+    timeline.mark("warmup")
+
+    client = client_future.result()
+    timeline.mark("mqtt")
+    startup_pool.shutdown(wait=False)
 
     fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
     if fps <= 0:
@@ -274,15 +324,23 @@ def main() -> None:
     writer: cv2.VideoWriter | None = None
     output_path: Path | None = None
     recent_counts: deque[int] = deque(maxlen=OCCLUSION_WINDOW)
+    row_tracker = RowTracker(ROW_Y_THRESHOLD, max_missed=OCCLUSION_WINDOW)
     last_avg_width = 0.0
+    width_priors = WidthPriors.load(WIDTH_PRIORS_PATH) if WIDTH_PRIORS_PATH else WidthPriors()
 
     last_publish_time = 0.0
+    frame_idx = -1
+    frame: np.ndarray | None = None
     try:
         while True:
-            success, frame = capture.read()
+            # Decode into the previous frame's array instead of allocating a new one per frame
+            success, frame = capture.read() if frame is None else capture.read(frame)
             if not success:
                 print("[inference] Video stream ended or frame grab failed")
                 break
+            frame_idx += 1
+            # Frame-bus sources know when the daemon decoded the frame; otherwise it was captured just now
+            trace = FrameTrace(frame_idx, getattr(capture, "last_ts", None))
 
             if writer is None:
                 height, width = frame.shape[:2]
@@ -300,12 +358,10 @@ def main() -> None:
                 else:
                     print(f"[inference] Writing annotated video to {output_path}")
 
-            results = model.predict(frame, conf=CONFIDENCE_THRESHOLD, verbose=False)
-            if not results:
-                continue
-
-            result = results[0]
-            detections = extract_detections(result)
+            frame_started = time.perf_counter()
+            detections = extract_detections(model(frame, conf=CONFIDENCE_THRESHOLD))
+            INFERENCE_SECONDS.observe(time.perf_counter() - frame_started)
+            trace.mark("infer")
             height, width = frame.shape[:2]
             divider_x = width / 2
             classified_boxes, zone_counts = classify_detections(detections, divider_x)
@@ -320,11 +376,11 @@ def main() -> None:
             gap_boxes: list[tuple[int, int, int, int]] = []
             if not occluded:
                 avg_widths: list[float] = []
-                row_clusters = cluster_rows(detections, y_threshold=50.0)
-                for row in row_clusters:
-                    if not row:
-                        continue
-                    row_gaps, row_avg_width = detect_gaps_for_row(row, GAP_FACTOR, width)
+                row_clusters = row_tracker.update(detections)
+                for row, row_id in zip(row_clusters, row_tracker.frame_ids.tolist()):
+                    # Keyed on the tracker's persistent row id: list positions shift when a row above empties
+                    slot_width = width_priors.estimate(f"row{row_id}", [box[2] - box[0] for box in row], width)
+                    row_gaps, row_avg_width = detect_gaps_for_row(row, GAP_FACTOR, width, slot_width)
                     gap_boxes.extend(row_gaps)
                     if row_avg_width > 0:
                         avg_widths.append(row_avg_width)
@@ -334,10 +390,10 @@ def main() -> None:
                         draw_dashed_rectangle(frame, gap_box, (0, 0, 255))
 
                 for start, end in IGNORE_ZONES:
-                    overlay = frame.copy()
-                    cv2.rectangle(overlay, (int(start), 0), (int(end), height), (80, 80, 80), -1)
+                    # Shade the band in place: same pixels as blending a filled full-frame overlay, no copy
+                    band = frame[:, max(int(start), 0) : int(end) + 1]
                     alpha = 0.15
-                    cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
+                    cv2.addWeighted(band, 1 - alpha, band, 0, alpha * 80, dst=band)
 
                 avg_width = float(np.mean(avg_widths)) if avg_widths else 0.0
                 if avg_width > 0:
@@ -346,6 +402,12 @@ def main() -> None:
                 avg_width = last_avg_width
 
             gap_count = len(gap_boxes)
+            trace.mark("analyze")
+            FRAMES_TOTAL.inc()
+            SHELF_GAPS.set(gap_count)
+            ZONES_BLOCKED.set(1 if occluded else 0)
+            for label, count in zone_counts.items():
+                ZONE_STOCK.labels(label).set(count)
             status_text = STATUS_LABEL if not occluded else "Blocked"
             cv2.putText(
                 frame,
@@ -390,14 +452,22 @@ def main() -> None:
                     3,
                 )
 
+            trace.mark("render")
             now = time.time()
             if now - last_publish_time >= PUBLISH_INTERVAL_SECONDS:
                 if not occluded:
-                    publish_inventory(client, detected_count, zone_counts, gap_count, STATUS_LABEL)
+                    publish_inventory(client, detected_count, zone_counts, gap_count, STATUS_LABEL, trace)
                 else:
-                    publish_inventory(client, detected_count, zone_counts, 0, "Blocked")
+                    publish_inventory(client, detected_count, zone_counts, 0, "Blocked", trace)
+                if last_publish_time == 0.0:
+                    timeline.mark("first publish")
+                    timeline.report()
                 last_publish_time = now
+                width_priors.maybe_save()
+            FRAME_SECONDS.observe(time.perf_counter() - frame_started)
 
+            if live is not None:
+                live.publish(frame)
             if writer is not None:
                 writer.write(frame)
 
@@ -411,10 +481,18 @@ def main() -> None:
         client.loop_stop()
         client.disconnect()
         capture.release()
+        if live is not None:
+            live.close()
+        if width_priors.path is not None and width_priors.dirty:
+            width_priors.save()
+            print(f"[inference] Saved {width_priors.summary()} to {width_priors.path}")
         if writer is not None:
             writer.release()
             if output_path is not None:
                 print(f"[inference] Saved annotated video to {output_path}")
+        peak = peak_rss_mb()
+        if peak is not None:
+            print(f"[inference] Peak RSS {peak:.0f} MiB")
         cv2.destroyAllWindows()
 
 
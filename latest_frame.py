@@ -0,0 +1,156 @@
+"""Latest-frame capture for live sources: drain the stream on a thread, always hand out the newest frame.
+
+``cv2.VideoCapture.read`` on a camera or RTSP stream returns the oldest
+frame in the driver's buffer. When inference is slower than the camera,
+the frames it sees get older and older. ``LatestFrameCapture`` reads the
+source continuously on a dedicated thread and keeps only the newest frame,
+so the monitor always analyses the current shelf. Frames it had no time
+for are dropped, and the drops are counted.
+
+When the stream fails, the thread reconnects with exponential backoff
+(0.5 s, 1 s, 2 s ... up to 30 s) instead of ending the monitor. A source
+that is down at startup takes the same path. ``isOpened`` stays true until
+``release``, ``connected`` tells whether the stream is up right now, and
+``read`` simply waits until frames flow again.
+
+Frames rotate through three buffers (being decoded, latest, held by the
+caller), so decoding does not allocate per frame. The array returned by
+``read`` stays valid until the next ``read``. ``last_ts`` holds its
+capture time, and ``age()`` tells how stale it was when inference started.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+
+import cv2
+import numpy as np
+
+RECONNECT_INITIAL_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30.0
+
+
+def is_live_source(source) -> bool:
+    """Cameras and network streams; video files are read in order and must not drop frames."""
+    return isinstance(source, int) or (isinstance(source, str) and "://" in source)
+
+
+class LatestFrameCapture:
+    def __init__(
+        self,
+        source,
+        open_fn=cv2.VideoCapture,
+        reconnect_initial: float = RECONNECT_INITIAL_SECONDS,
+        reconnect_max: float = RECONNECT_MAX_SECONDS,
+        tag: str = "capture",
+    ):
+        self.source = source
+        self.open_fn = open_fn
+        self.reconnect_initial = reconnect_initial
+        self.reconnect_max = reconnect_max
+        self.tag = tag
+        self.captured = 0
+        self.delivered = 0
+        self.reconnects = 0
+        self.last_ts: float | None = None
+        self._latest: np.ndarray | None = None
+        self._latest_ts = 0.0
+        self._spare: np.ndarray | None = None
+        self._held: np.ndarray | None = None
+        self._seq = 0
+        self._read_seq = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._cap = open_fn(source)
+        self._props: dict[int, float] = {}
+        self.connected = self._cap.isOpened()
+        if self.connected:
+            self._read_props(self._cap)
+        # Started even when the source is down: the thread retries with backoff
+        self._thread = threading.Thread(target=self._run, name="latest-frame-capture", daemon=True)
+        self._thread.start()
+
+    def _read_props(self, cap) -> None:
+        self._props = {
+            prop: cap.get(prop)
+            for prop in (cv2.CAP_PROP_FPS, cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT)
+        }
+
+    def isOpened(self) -> bool:  # noqa: N802 - mirrors cv2.VideoCapture
+        return not self._closed
+
+    def get(self, prop: int) -> float:
+        return self._props.get(prop, 0.0)
+
+    @property
+    def dropped(self) -> int:
+        """Frames decoded but replaced by a newer one before inference asked for them."""
+        return self.captured - self.delivered
+
+    def _run(self) -> None:
+        backoff = self.reconnect_initial
+        cap = self._cap
+        while not self._closed:
+            with self._cond:
+                buf, self._spare = self._spare, None
+            ok, frame = cap.read(buf) if buf is not None else cap.read()
+            if not ok:
+                if self._closed:
+                    break
+                self.connected = False
+                # Jitter keeps a rack of cameras behind one switch from reconnecting in lockstep
+                delay = backoff * random.uniform(0.8, 1.2)
+                print(f"[{self.tag}] Stream read failed, reconnecting in {delay:.1f}s")
+                cap.release()
+                with self._cond:
+                    if self._cond.wait_for(lambda: self._closed, delay):
+                        return  # released while waiting
+                backoff = min(backoff * 2, self.reconnect_max)
+                cap = self._cap = self.open_fn(self.source)
+                if cap.isOpened() and not self._props.get(cv2.CAP_PROP_FRAME_WIDTH):
+                    self._read_props(cap)
+                self.reconnects += 1
+                continue
+            self.connected = True
+            backoff = self.reconnect_initial
+            now = time.time()
+            with self._cond:
+                # The frame nobody consumed becomes the next decode target
+                self._spare, self._latest = self._latest, frame
+                self._latest_ts = now
+                self._seq += 1
+                self.captured += 1
+                self._cond.notify_all()
+        cap.release()
+
+    def read(self, image: np.ndarray | None = None, timeout: float | None = None) -> tuple[bool, np.ndarray | None]:
+        """Newest frame not returned before; waits while the stream is down. False only once closed / timed out.
+
+        ``image`` is accepted for ``cv2.VideoCapture`` compatibility and ignored:
+        frames already live in the capture's own rotating buffers.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._seq > self._read_seq or self._closed, timeout):
+                return False, None
+            if self._closed:
+                return False, None
+            frame, self._latest = self._latest, None
+            self._read_seq = self._seq
+            self.last_ts = self._latest_ts
+            self.delivered += 1
+            # The caller is done with the previous frame: recycle it unless a spare is already waiting
+            if self._held is not None and self._spare is None:
+                self._spare = self._held
+            self._held = frame
+            return True, frame
+
+    def age(self) -> float:
+        """Seconds between capturing the last returned frame and now."""
+        return time.time() - self.last_ts if self.last_ts is not None else 0.0
+
+    def release(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout=2.0)
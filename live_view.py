@@ -0,0 +1,199 @@
+"""Encode-once MJPEG live view of the annotated monitor output.
+
+The monitor hands every annotated frame to ``LiveViewServer.publish``.
+Frames are downscaled and JPEG-encoded at most ``max_fps`` times a second,
+and only while somebody is watching. Each encoded frame is the same bytes
+object for every viewer, so ten browsers cost no more encoding than one::
+
+    live = LiveViewServer(8090)
+    ...
+    live.publish(frame)          # cheap no-op between preview ticks / with no viewers
+
+    open http://edge-box:8090/   (or /stream.mjpg in any MJPEG client, /snapshot.jpg for one frame)
+
+Nothing is encoded while nobody watches, so ``/snapshot.jpg`` waits for a
+frame published after the request arrived. The frame's wall-clock time is in
+the ``X-Frame-Timestamp`` header, and a 503 means the monitor published
+nothing new within the timeout.
+
+Every viewer has its own thread and always sends the newest frame. A slow
+client skips the frames it could not keep up with instead of queueing
+them, so it never adds memory or latency for the others.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+import numpy as np
+
+DEFAULT_FPS = 5.0
+DEFAULT_MAX_WIDTH = 720
+DEFAULT_QUALITY = 70
+BOUNDARY = "shelfframe"
+CLIENT_TIMEOUT_SECONDS = 10.0
+KEEPALIVE_SECONDS = 5.0     # resend the last frame this often so proxies keep idle streams open
+
+INDEX_HTML = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Shelf monitor</title>
+<style>body{{margin:0;background:#111;color:#ccc;font:14px sans-serif;text-align:center}}
+img{{max-width:100vw;max-height:95vh}}</style></head>
+<body><div>{title}</div><img src="/stream.mjpg" alt="live view"></body></html>
+"""
+
+
+class LiveViewServer:
+    def __init__(
+        self,
+        port: int,
+        host: str = "0.0.0.0",
+        max_fps: float = DEFAULT_FPS,
+        max_width: int = DEFAULT_MAX_WIDTH,
+        quality: int = DEFAULT_QUALITY,
+        title: str = "Shelf monitor",
+    ):
+        self.interval = 1.0 / max_fps
+        self.max_width = max_width
+        self.params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+        self.title = title
+        self.viewers = 0
+        self.encoded = 0
+        self.bytes_sent = 0
+        self.jpeg: bytes | None = None
+        self.jpeg_ts = 0.0          # when the frame in ``jpeg`` was published
+        self.seq = 0
+        self._pending: tuple[np.ndarray, float] | None = None
+        self._last_publish = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._encoder = threading.Thread(target=self._encode_loop, name="live-view-encoder", daemon=True)
+        self._encoder.start()
+        self.server = self._make_server(host, port)
+        threading.Thread(target=self.server.serve_forever, name="live-view-http", daemon=True).start()
+
+    def publish(self, frame: np.ndarray) -> bool:
+        """Offer the latest annotated frame; returns True if it was taken for encoding."""
+        if not self.viewers:
+            return False
+        now = time.monotonic()
+        if now - self._last_publish < self.interval:
+            return False
+        self._last_publish = now
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            scale = self.max_width / width
+            # The resize doubles as the copy the encoder thread needs, so the caller may reuse ``frame``
+            preview = cv2.resize(frame, (self.max_width, max(int(height * scale), 1)), interpolation=cv2.INTER_AREA)
+        else:
+            preview = frame.copy()
+        with self._cond:
+            self._pending = (preview, time.time())  # an older frame still waiting is simply replaced
+            self._cond.notify_all()
+        return True
+
+    def _encode_loop(self) -> None:
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                (frame, ts), self._pending = self._pending, None
+            ok, encoded = cv2.imencode(".jpg", frame, self.params)
+            if not ok:
+                continue
+            with self._cond:
+                self.jpeg = encoded.tobytes()
+                self.jpeg_ts = ts
+                self.seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    def wait_frame(self, last_seq: int, timeout: float) -> tuple[int, bytes | None, float]:
+        """Block until a frame newer than ``last_seq`` exists (or timeout); returns the newest one."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > last_seq or self._closed, timeout)
+            return self.seq, self.jpeg, self.jpeg_ts
+
+    def _make_server(self, host: str, port: int) -> ThreadingHTTPServer:
+        live = self
+
+        class LiveViewHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                path = self.path.split("?", 1)[0]
+                if path == "/":
+                    self._send(200, "text/html; charset=utf-8", INDEX_HTML.format(title=live.title).encode("utf-8"))
+                elif path == "/snapshot.jpg":
+                    with live._cond:
+                        live.viewers += 1
+                        entry_seq = live.seq  # frames encoded before anyone asked may be hours old
+                    try:
+                        seq, jpeg, ts = live.wait_frame(entry_seq, CLIENT_TIMEOUT_SECONDS)
+                    finally:
+                        live._add_viewer(-1)
+                    if jpeg is None or seq <= entry_seq:
+                        self.send_error(503, "No new frame from the monitor")
+                    else:
+                        self._send(200, "image/jpeg", jpeg, {"X-Frame-Timestamp": f"{ts:.3f}"})
+                elif path == "/stream.mjpg":
+                    self._stream()
+                else:
+                    self.send_error(404)
+
+            def _send(self, status: int, content_type: str, body: bytes, headers: dict[str, str] | None = None) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self) -> None:
+                self.connection.settimeout(CLIENT_TIMEOUT_SECONDS)
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-store")
+                self.end_headers()
+                live._add_viewer(1)
+                last_seq = 0
+                try:
+                    while not live._closed:
+                        seq, jpeg, _ = live.wait_frame(last_seq, KEEPALIVE_SECONDS)
+                        if jpeg is None:
+                            continue
+                        last_seq = seq
+                        self.wfile.write(
+                            f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode("ascii")
+                        )
+                        self.wfile.write(jpeg)
+                        self.wfile.write(b"\r\n")
+                        live.bytes_sent += len(jpeg)
+                except (BrokenPipeError, ConnectionResetError, TimeoutError, OSError):
+                    pass  # viewer went away or stalled past the timeout
+                finally:
+                    live._add_viewer(-1)
+
+            def log_message(self, format, *args) -> None:  # noqa: A002 - one line per viewer request is noise
+                pass
+
+        server = ThreadingHTTPServer((host, port), LiveViewHandler)
+        server.daemon_threads = True
+        return server
+
+    def _add_viewer(self, delta: int) -> None:
+        with self._cond:
+            self.viewers += delta
+
+    def stats(self) -> dict[str, int]:
+        return {"viewers": self.viewers, "encoded": self.encoded, "bytes_sent": self.bytes_sent}
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,220 @@
+"""Minimal Prometheus-style metrics with an embedded HTTP endpoint.
+
+Counters, gauges and histograms render in the Prometheus text exposition
+format at ``GET /metrics``, so every edge node can be scraped without
+installing ``prometheus_client``::
+
+    FRAMES = Counter("shelf_frames_total", "Frames processed")
+    INFER = Histogram("shelf_inference_seconds", "Detector latency")
+    start_metrics_server(9108)
+    ...
+    FRAMES.inc()
+    INFER.observe(elapsed)
+
+Updates are plain attribute arithmetic with no locks. Each metric is
+written by one hot-path thread, and a scrape that races an update at
+worst reads a value that is one observation old.
+"""
+from __future__ import annotations
+
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        if any(m.name == metric.name for m in self.metrics):
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self.metrics.append(metric)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), registry: Registry | None = REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children: dict[tuple[str, ...], _Metric] = {}
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values) -> _Metric:
+        """Child metric for one label combination (cache it on the hot path)."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} expects labels {self.label_names}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, *values) -> None:
+        self._children.pop(tuple(str(v) for v in values), None)
+
+    def clear(self) -> None:
+        self._children.clear()
+
+    def _new_child(self) -> _Metric:
+        raise NotImplementedError
+
+    def _series(self):
+        if self.label_names:
+            return list(self._children.items())
+        return [((), self)]
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        self.value = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self) -> Counter:
+        return Counter(self.name, self.help, registry=None)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.value)}"
+            for key, child in self._series()
+        ]
+
+
+class Gauge(_Metric):
+    """A settable value; ``fn`` makes it a callback gauge evaluated at scrape time (e.g. queue depth)."""
+
+    kind = "gauge"
+
+    def __init__(self, *args, fn: Callable[[], float] | None = None, **kwargs):
+        self.value = 0.0
+        self.fn = fn
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self) -> Gauge:
+        return Gauge(self.name, self.help, registry=None)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set_function(self, fn: Callable[[], float] | None) -> None:
+        self.fn = fn
+
+    def current(self) -> float:
+        if self.fn is None:
+            return self.value
+        try:
+            return float(self.fn())
+        except Exception:  # noqa: BLE001 - a broken callback must not break the scrape
+            return float("nan")
+
+    def samples(self) -> list[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.current())}"
+            for key, child in self._series()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        super().__init__(*args, **kwargs)
+
+    def _new_child(self) -> Histogram:
+        return Histogram(self.name, self.help, buckets=self.buckets, registry=None)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self) -> list[str]:
+        lines = []
+        for key, child in self._series():
+            cumulative = 0
+            for bound, count in zip(child.buckets + (float("inf"),), list(child.counts)):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve ``registry`` at ``http://host:port/metrics`` from a daemon thread."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:  # noqa: A002 - scrapes every few seconds would flood stdout
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
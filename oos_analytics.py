@@ -0,0 +1,304 @@
+"""Out-of-stock analytics over recorded per-frame zone results (``zone_monitor --results``).
+
+Reads JSONL files with one line per frame,
+``{"frame": 12, "ts": 0.4, "zones": {"zone_1": {"stock": 3, "missing": 1, "blocked": false}, ...}}``,
+and computes per zone:
+
+- out-of-stock time and its share of the observed time;
+- empty episodes: maximal out-of-stock runs;
+- mean / max time-to-restock: the length of episodes that ended within the data;
+- blocked fraction: time the zone was occluded.
+
+A zone is out of stock when ``stock == 0`` (``--oos missing``: when at least
+one slot is missing). Blocked frames carry the last visible state forward,
+so a customer standing in front of an empty shelf neither ends nor splits
+the episode. Frame gaps longer than ``--max-gap`` seconds are treated as
+unobserved. Each file is one camera, named after the file::
+
+    python oos_analytics.py results/cam1.jsonl results/cam2.jsonl --csv oos.csv
+
+Each line is reduced to two flat lists as it is read, and every ``--chunk``
+frames these become (frames x zones) arrays. The statistics for all zones
+of the chunk are then computed with NumPy at once. Only a few values per
+zone carry over between chunks, so memory is bounded by the chunk size,
+not by the length of the recording.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+CHUNK_FRAMES = 20_000
+MAX_GAP_SECONDS = 5.0
+OOS_MODES = ("empty", "missing")
+
+
+@dataclass
+class ZoneStats:
+    camera: str
+    zone: str
+    frames: int
+    observed_s: float
+    oos_s: float
+    episodes: int
+    restocks: int
+    mean_restock_s: float | None
+    max_restock_s: float | None
+    blocked_s: float
+    open_episode_s: float | None     # out of stock when the recording ended, for this long
+
+    @property
+    def oos_fraction(self) -> float:
+        return self.oos_s / self.observed_s if self.observed_s else 0.0
+
+    @property
+    def blocked_fraction(self) -> float:
+        return self.blocked_s / self.observed_s if self.observed_s else 0.0
+
+
+class OosAccumulator:
+    """Run-length statistics for every zone of one camera, fed chunk by chunk."""
+
+    def __init__(self, camera: str, oos: str = "empty", max_gap: float = MAX_GAP_SECONDS, chunk: int = CHUNK_FRAMES):
+        if oos not in OOS_MODES:
+            raise ValueError(f"oos must be one of {OOS_MODES}")
+        self.camera = camera
+        self.oos = oos
+        self.max_gap = max_gap
+        self.chunk = chunk
+        self.zones: dict[str, int] = {}
+        # Rows buffered for the next chunk; consecutive lines with the same zone keys share one column map
+        self._key = "stock" if oos == "empty" else "missing"
+        self._keys: tuple[str, ...] | None = None
+        self._groups: list[tuple[np.ndarray, int]] = []
+        self._ts: list[float] = []
+        self._values: list[list[int]] = []
+        self._blocked: list[list[bool]] = []
+        # Carried between chunks: the last frame, and per zone the running totals
+        self.last_ts: float | None = None
+        self.last_state = np.zeros(0, dtype=bool)       # effective out-of-stock state (blocked carried forward)
+        self.last_blocked = np.zeros(0, dtype=bool)
+        self.last_present = np.zeros(0, dtype=bool)
+        self.frames = np.zeros(0, dtype=np.int64)
+        self.observed = np.zeros(0)
+        self.oos_time = np.zeros(0)                     # also the running clock episode lengths are read from
+        self.blocked_time = np.zeros(0)
+        self.episodes = np.zeros(0, dtype=np.int64)
+        self.restocks = np.zeros(0, dtype=np.int64)
+        self.restock_sum = np.zeros(0)
+        self.restock_max = np.zeros(0)
+        self.open_start = np.zeros(0)                   # oos_time at the start of the open episode, NaN if none
+
+    def _grow(self, zones: int) -> None:
+        extra = zones - len(self.last_state)
+        if extra <= 0:
+            return
+        for name, fill in (("last_state", False), ("last_blocked", False), ("last_present", False), ("frames", 0),
+                           ("observed", 0.0), ("oos_time", 0.0), ("blocked_time", 0.0), ("episodes", 0),
+                           ("restocks", 0), ("restock_sum", 0.0), ("restock_max", 0.0), ("open_start", np.nan)):
+            current = getattr(self, name)
+            setattr(self, name, np.concatenate((current, np.full(extra, fill, dtype=current.dtype))))
+
+    def feed(self, record: dict) -> None:
+        """Buffer one result line; a full chunk is analysed right away."""
+        zones = record["zones"]
+        keys = tuple(zones)
+        if keys != self._keys:
+            for zone in keys:
+                if zone not in self.zones:
+                    self.zones[zone] = len(self.zones)
+            self._keys = keys
+            self._groups.append((np.array([self.zones[zone] for zone in keys], dtype=np.intp), len(self._ts)))
+        key = self._key
+        results = zones.values()
+        self._ts.append(record["ts"])
+        self._values.append([result[key] or 0 for result in results])
+        self._blocked.append([result["blocked"] for result in results])
+        if len(self._ts) >= self.chunk:
+            self.flush()
+
+    def add(self, records: Iterable[dict]) -> None:
+        for record in records:
+            self.feed(record)
+        self.flush()
+
+    def flush(self) -> None:
+        """Analyse the buffered rows as one chunk."""
+        frames = len(self._ts)
+        if not frames:
+            return
+        shape = (frames, len(self.zones))
+        value = np.zeros(shape, dtype=np.int64)
+        blocked = np.zeros(shape, dtype=bool)
+        present = np.zeros(shape, dtype=bool)
+        bounds = [start for _, start in self._groups[1:]] + [frames]
+        for (cols, start), end in zip(self._groups, bounds):
+            value[start:end, cols] = self._values[start:end]
+            blocked[start:end, cols] = self._blocked[start:end]
+            present[start:end, cols] = True
+        ts = np.array(self._ts, dtype=np.float64)
+        self._keys = None
+        self._groups, self._ts, self._values, self._blocked = [], [], [], []
+        self._process(ts, value == 0 if self.oos == "empty" else value > 0, blocked, present)
+
+    def _process(self, ts: np.ndarray, oos: np.ndarray, blocked: np.ndarray, present: np.ndarray) -> None:
+        zones = oos.shape[1]
+        self._grow(zones)
+        if self.last_ts is None:
+            self.last_ts = float(ts[0])
+
+        # Row 0 is the last frame of the previous chunk, so transitions across the boundary are seen
+        ts = np.concatenate(([self.last_ts], ts))
+        visible = np.vstack((np.ones(zones, dtype=bool), present & ~blocked))
+        raw = np.vstack((self.last_state, oos))
+        blocked = np.vstack((self.last_blocked, blocked))
+        present = np.vstack((self.last_present, present))
+        rows = np.arange(len(ts))[:, None]
+        # Forward-fill the state over blocked / absent frames: index of the last visible row per zone
+        source = np.maximum.accumulate(np.where(visible, rows, 0), axis=0)
+        state = np.take_along_axis(raw, source, axis=0)
+
+        dt = np.diff(ts)
+        dt = np.where((dt >= 0) & (dt <= self.max_gap), dt, 0.0)[:, None]
+        observed = present[:-1] * dt
+        oos_dt = state[:-1] * observed
+        clock = self.oos_time + np.vstack((np.zeros((1, zones)), np.cumsum(oos_dt, axis=0)))
+
+        starts = state[1:] & ~state[:-1]
+        ends = ~state[1:] & state[:-1]
+        self.episodes += starts.sum(axis=0)
+        self._close_episodes(starts, ends, clock[1:])
+
+        self.frames += present[1:].sum(axis=0)
+        self.observed += observed.sum(axis=0)
+        self.oos_time = clock[-1]
+        self.blocked_time += (blocked[:-1] * observed).sum(axis=0)
+        self.last_ts = float(ts[-1])
+        self.last_state = state[-1]
+        self.last_blocked = blocked[-1]
+        self.last_present = present[-1]
+
+    def _close_episodes(self, starts: np.ndarray, ends: np.ndarray, clock: np.ndarray) -> None:
+        """Pair each episode end with its start (in this chunk or carried over) and record its length."""
+        # Events zone by zone in time order; per zone they alternate start / end
+        zone_idx, row_idx = np.nonzero((starts | ends).T)
+        if not len(zone_idx):
+            return
+        is_end = ends[row_idx, zone_idx]
+        at = clock[row_idx, zone_idx]
+        first = np.ones(len(zone_idx), dtype=bool)
+        first[1:] = zone_idx[1:] != zone_idx[:-1]
+        previous = np.roll(at, 1)
+        # An end that is the first event of its zone closes the episode carried in from earlier chunks
+        start_at = np.where(first, self.open_start[zone_idx], previous)
+        closed = is_end & ~np.isnan(start_at)
+        durations = at[closed] - start_at[closed]
+        zones = len(self.restocks)
+        self.restocks += np.bincount(zone_idx[closed], minlength=zones)
+        self.restock_sum += np.bincount(zone_idx[closed], weights=durations, minlength=zones)
+        np.maximum.at(self.restock_max, zone_idx[closed], durations)
+
+        last = np.ones(len(zone_idx), dtype=bool)
+        last[:-1] = zone_idx[:-1] != zone_idx[1:]
+        self.open_start[zone_idx[last]] = np.where(is_end[last], np.nan, at[last])
+
+    def results(self) -> list[ZoneStats]:
+        stats = []
+        for zone, col in self.zones.items():
+            restocks = int(self.restocks[col])
+            open_start = self.open_start[col]
+            stats.append(ZoneStats(
+                camera=self.camera,
+                zone=zone,
+                frames=int(self.frames[col]),
+                observed_s=float(self.observed[col]),
+                oos_s=float(self.oos_time[col]),
+                episodes=int(self.episodes[col]),
+                restocks=restocks,
+                mean_restock_s=float(self.restock_sum[col] / restocks) if restocks else None,
+                max_restock_s=float(self.restock_max[col]) if restocks else None,
+                blocked_s=float(self.blocked_time[col]),
+                open_episode_s=None if np.isnan(open_start) else float(self.oos_time[col] - open_start),
+            ))
+        return stats
+
+
+def read_results(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as results:
+        for line in results:
+            if line.strip():
+                yield json.loads(line)
+
+
+def analyze_files(
+    paths: Iterable[Path], oos: str = "empty", max_gap: float = MAX_GAP_SECONDS, chunk: int = CHUNK_FRAMES
+) -> list[ZoneStats]:
+    stats = []
+    for path in paths:
+        accumulator = OosAccumulator(Path(path).stem, oos=oos, max_gap=max_gap, chunk=chunk)
+        accumulator.add(read_results(Path(path)))
+        stats.extend(accumulator.results())
+    return stats
+
+
+def format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def print_table(stats: list[ZoneStats]) -> None:
+    print(f"{'camera':<14} {'zone':<12} {'observed':>9} {'oos':>9} {'oos%':>6} {'episodes':>8} "
+          f"{'mean ttr':>9} {'max ttr':>9} {'blocked%':>8}")
+    for row in sorted(stats, key=lambda s: (-s.oos_s, s.camera, s.zone)):
+        print(f"{row.camera:<14} {row.zone:<12} {format_duration(row.observed_s):>9} {format_duration(row.oos_s):>9} "
+              f"{row.oos_fraction * 100:5.1f}% {row.episodes:>8} {format_duration(row.mean_restock_s):>9} "
+              f"{format_duration(row.max_restock_s):>9} {row.blocked_fraction * 100:7.1f}%")
+
+
+def write_csv(stats: list[ZoneStats], path: Path) -> None:
+    fields = ["camera", "zone", "frames", "observed_s", "oos_s", "oos_fraction", "episodes", "restocks",
+              "mean_restock_s", "max_restock_s", "blocked_s", "blocked_fraction", "open_episode_s"]
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        for row in stats:
+            writer.writerow({field: getattr(row, field) for field in fields})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("results", nargs="+", type=Path, help="zone_monitor --results JSONL files, one per camera")
+    parser.add_argument("--oos", choices=OOS_MODES, default="empty",
+                        help="out of stock means stock == 0 (empty) or any missing slot (missing)")
+    parser.add_argument("--max-gap", type=float, default=MAX_GAP_SECONDS, help="longer frame gaps count as unobserved")
+    parser.add_argument("--chunk", type=int, default=CHUNK_FRAMES, help="frames parsed and analysed per chunk")
+    parser.add_argument("--csv", type=Path, help="also write the per-zone statistics to this CSV file")
+    args = parser.parse_args()
+
+    missing = [path for path in args.results if not path.exists()]
+    if missing:
+        sys.exit(f"[oos] Results file not found: {', '.join(map(str, missing))}")
+    started = time.perf_counter()
+    stats = analyze_files(args.results, oos=args.oos, max_gap=args.max_gap, chunk=args.chunk)
+    elapsed = time.perf_counter() - started
+    print_table(stats)
+    frames = sum(max((s.frames for s in stats if s.camera == cam), default=0) for cam in {s.camera for s in stats})
+    print(f"[oos] {len(stats)} zones, {frames} frames from {len(args.results)} files in {elapsed:.1f}s")
+    if args.csv:
+        write_csv(stats, args.csv)
+        print(f"[oos] Wrote {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Offline zone monitoring of long recordings split into chunks processed in parallel.
+
+Each worker process opens its own decoder and detector, seeks to its chunk,
+replays a short overlap window before the chunk start to warm up the
+anti-occlusion history, then writes an annotated video segment plus
+per-frame zone results (JSONL). Segments are stitched in order at the end.
+
+    python zone_monitor.py --source day.mp4 --output out/day.mp4 --results out/day.jsonl --workers 8
+"""
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+WARMUP_FRAMES = 30           # overlap replayed before each chunk (matches HISTORY_LEN)
+SEGMENT_FOURCC = "mp4v"
+
+# zone_monitor options parallel mode does not implement: (attribute, flag)
+IGNORED_FLAGS = (
+    ("motion_gate", "--motion-gate"),
+    ("cascade", "--cascade"),
+    ("target_fps", "--target-fps"),
+    ("latency_budget_ms", "--latency-budget-ms"),
+    ("history_db", "--history-db"),
+    ("metrics_port", "--metrics-port"),
+    ("live_port", "--live-port"),
+)
+# ... and those whose output would silently be missing
+REJECTED_FLAGS = (("evidence", "--evidence"), ("record_detections", "--record-detections"), ("replay", "--replay"))
+
+
+@dataclass(frozen=True)
+class ChunkJob:
+    index: int
+    source: str
+    start: int               # first frame written by this chunk
+    end: int                 # one past the last frame written
+    warm_start: int          # first frame decoded (start - overlap)
+    config_path: str
+    weights: str
+    backend: str
+    segment_path: str
+    results_path: str
+    threads: int
+    width_priors: str | None = None   # read-only starting point; every worker learns on its own copy
+
+
+def plan_chunks(total_frames: int, chunks: int, overlap: int = WARMUP_FRAMES) -> list[tuple[int, int, int]]:
+    """Split ``[0, total_frames)`` into ``chunks`` contiguous ``(warm_start, start, end)`` ranges."""
+    bounds = np.linspace(0, total_frames, num=max(chunks, 1) + 1).astype(int)
+    return [
+        (int(max(0, start - overlap)), int(start), int(end))
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def _init_worker(threads: int) -> None:
+    # One intra-op pool per process; otherwise N workers x all cores oversubscribe the CPU
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    cv2.setNumThreads(threads)
+
+
+def process_chunk(job: ChunkJob) -> dict:
+    """Worker entry point: warm up, process and write one chunk; returns timing info."""
+    from detector_backends import load_detector
+    from width_priors import WidthPriors
+    from zone_config import load_zone_config, zone_membership
+    from zone_monitor import HISTORY_LEN, analyze_zone, draw_zone_result, zone_record
+
+    try:
+        import torch
+
+        torch.set_num_threads(job.threads)
+    except ImportError:
+        pass
+
+    started = time.perf_counter()
+    config = load_zone_config(job.config_path)
+    model = load_detector(job.weights, backend=job.backend)
+    histories = {zid: deque(maxlen=HISTORY_LEN) for zid in config.ids}
+    # Never saved from here: workers would overwrite each other's file
+    width_priors = WidthPriors.load(job.width_priors) if job.width_priors else WidthPriors()
+
+    cap = cv2.VideoCapture(job.source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.set(cv2.CAP_PROP_POS_FRAMES, job.warm_start)
+    writer = None
+    frames_written = 0
+
+    with open(job.results_path, "w", encoding="utf-8") as results_file:
+        for frame_idx in range(job.warm_start, job.end):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            height, width = frame.shape[:2]
+            zone_coords = config.scaled_coords(width, height)
+            detections = model(frame)
+            membership = zone_membership(detections, zone_coords)
+
+            zone_results = {}
+            for zi, zid in enumerate(config.ids):
+                coords = tuple(int(v) for v in zone_coords[zi])
+                zone_boxes = detections[membership[:, zi], :4].tolist()
+                zone_results[zid] = analyze_zone(zone_boxes, coords, histories[zid], width_priors, zid)
+
+            if frame_idx < job.start:
+                continue  # overlap window: only warms up the occlusion history
+
+            for zi, (zid, p_name) in enumerate(zip(config.ids, config.names)):
+                coords = tuple(int(v) for v in zone_coords[zi])
+                draw_zone_result(frame, p_name, coords, zone_results[zid])
+            if writer is None:
+                fourcc = cv2.VideoWriter_fourcc(*SEGMENT_FOURCC)
+                writer = cv2.VideoWriter(job.segment_path, fourcc, fps, (width, height))
+            writer.write(frame)
+            record = zone_record(frame_idx, frame_idx / fps, config.ids, zone_results)
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            frames_written += 1
+
+    cap.release()
+    if writer is not None:
+        writer.release()
+    return {
+        "index": job.index,
+        "frames": frames_written,
+        "seconds": time.perf_counter() - started,
+        "segment": job.segment_path if writer is not None else None,
+        "results": job.results_path,
+    }
+
+
+def stitch_videos(segments: list[str], output_path: Path) -> None:
+    """Concatenate segments in order; stream-copy with ffmpeg when available, else re-encode."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        list_path = output_path.with_suffix(".segments.txt")
+        list_path.write_text("".join(f"file '{Path(s).resolve()}'\n" for s in segments), encoding="utf-8")
+        try:
+            subprocess.run(
+                [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                 "-i", str(list_path), "-c", "copy", str(output_path)],
+                check=True,
+            )
+            return
+        except subprocess.CalledProcessError as exc:
+            print(f"[parallel] ffmpeg concat failed ({exc}); falling back to OpenCV")
+        finally:
+            list_path.unlink(missing_ok=True)
+
+    writer = None
+    for segment in segments:
+        cap = cv2.VideoCapture(segment)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if writer is None:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+                height, width = frame.shape[:2]
+                writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*SEGMENT_FOURCC), fps, (width, height))
+            writer.write(frame)
+        cap.release()
+    if writer is not None:
+        writer.release()
+
+
+def stitch_results(parts: list[str], output_path: Path) -> None:
+    with open(output_path, "wb") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out)
+
+
+def run_parallel(args) -> None:
+    source = args.source
+    cap = cv2.VideoCapture(source)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    cap.release()
+    if total_frames <= 0:
+        print(f"[parallel] Cannot determine frame count of {source}; parallel mode needs a seekable file")
+        sys.exit(1)
+
+    workers = max(1, args.workers)
+    threads = max(1, (os.cpu_count() or workers) // workers)
+    output_path = Path(args.output) if args.output else None
+    results_path = Path(args.results) if getattr(args, "results", None) else None
+    if output_path is None and results_path is None:
+        print("[parallel] Nothing to write: pass --output and/or --results")
+        sys.exit(1)
+
+    rejected = [flag for attr, flag in REJECTED_FLAGS if getattr(args, attr, None)]
+    if rejected:
+        print(f"[parallel] {' / '.join(rejected)} not supported in parallel mode; run with --workers 1")
+        sys.exit(1)
+    ignored = [flag for attr, flag in IGNORED_FLAGS if getattr(args, attr, None)]
+    if ignored:
+        print(f"[parallel] {' / '.join(ignored)} ignored in parallel mode; use --results instead")
+
+    width_priors = getattr(args, "width_priors", None)
+    if width_priors == "auto":
+        from width_priors import default_path
+
+        width_priors = default_path(args.config)
+    if width_priors:
+        print(f"[parallel] Width priors read from {width_priors} (not updated in parallel mode)")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="zone_chunks_"))
+    jobs = [
+        ChunkJob(
+            index=i,
+            source=source,
+            start=start,
+            end=end,
+            warm_start=warm_start,
+            config_path=args.config,
+            weights=args.weights,
+            backend=getattr(args, "backend", "auto"),
+            segment_path=str(work_dir / f"segment_{i:04d}.mp4"),
+            results_path=str(work_dir / f"segment_{i:04d}.jsonl"),
+            threads=threads,
+            width_priors=str(width_priors) if width_priors else None,
+        )
+        for i, (warm_start, start, end) in enumerate(plan_chunks(total_frames, workers))
+    ]
+    print(
+        f"[parallel] {total_frames} frames ({total_frames / fps / 60:.1f} min) -> {len(jobs)} chunks, "
+        f"{workers} workers x {threads} threads, {WARMUP_FRAMES}-frame warm-up overlap"
+    )
+
+    started = time.perf_counter()
+    # spawn: each worker gets a clean decoder/model instead of forked library state
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        done = []
+        for info in pool.imap_unordered(process_chunk, jobs):
+            done.append(info)
+            print(f"[parallel] chunk {info['index']:>3} done: {info['frames']} frames in {info['seconds']:.1f}s")
+    done.sort(key=lambda info: info["index"])
+    processed = sum(info["frames"] for info in done)
+    elapsed = time.perf_counter() - started
+
+    if output_path:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        stitch_videos([info["segment"] for info in done if info["segment"]], output_path)
+        print(f"[parallel] Annotated video: {output_path}")
+    if results_path:
+        results_path.parent.mkdir(parents=True, exist_ok=True)
+        stitch_results([info["results"] for info in done], results_path)
+        print(f"[parallel] Per-frame zone results: {results_path}")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    print(f"[parallel] {processed} frames in {elapsed:.1f}s ({processed / elapsed:.1f} fps overall)")
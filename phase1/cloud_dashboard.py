@@ -1,17 +1,49 @@
 """Cloud dashboard subscriber that renders smart shelf status with gap alerts."""
+import argparse
 import json
 import os
+import sys
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict, Iterable
+from typing import Any, Deque, Dict, Iterable, Optional
 
 import colorama
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Counter, Gauge, Histogram, start_metrics_server  # noqa: E402
+from query_service import QueryServer, ShelfStateTable  # noqa: E402
+from restock_alerts import AlertEvent, RestockAlertEngine  # noqa: E402
+from tracing import HOPS, TraceAggregator  # noqa: E402
+from zone_history import ZoneHistoryStore  # noqa: E402
+
 BROKER_HOST = "broker.emqx.io"
 BROKER_PORT = 1883
 TOPIC = "smart_retail/group3/shelf"
 BAR_CAPACITY = 6
 LOW_STOCK_THRESHOLD = 3
+LATENCY_REPORT_SECONDS = 5.0
+RESTOCK_QUEUE_ROWS = 5
+RECENT_ALERT_ROWS = 5
+
+MESSAGES = Counter("dashboard_messages_total", "MQTT messages received", ("result",))
+MESSAGE_LATENCY = Histogram(
+    "dashboard_message_latency_seconds",
+    "Publish-to-receive latency of payloads carrying sent_ts",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+ZONE_STOCK = Gauge("dashboard_zone_stock", "Latest reported stock per zone", ("device", "zone"))
+TRACE_SECONDS = Histogram(
+    "dashboard_trace_seconds",
+    "Capture-to-render latency of traced payloads, split into hops",
+    ("device", "hop"),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+RESTOCK_ALERTS = Gauge("dashboard_restock_alerts", "Zones with an active restock alert")
+MESSAGES_OK = MESSAGES.labels("ok")
+MESSAGES_MALFORMED = MESSAGES.labels("malformed")
 
 colorama.init(autoreset=True)
 
@@ -32,6 +64,9 @@ def sanitize_details(details: Any) -> Dict[str, int]:
     if isinstance(details, dict):
         sanitized: Dict[str, int] = {}
         for key, value in details.items():
+            if isinstance(value, dict):
+                # zone_monitor: {"stock": n, "missing": m}, or {"status": "blocked"} (no count)
+                value = value.get("stock")
             try:
                 sanitized[str(key)] = max(0, int(value))
             except (TypeError, ValueError):
@@ -45,7 +80,67 @@ def draw_bar(count: int) -> str:
     return "■" * filled + "." * (BAR_CAPACITY - filled)
 
 
-def render_dashboard(payload: Dict[str, Any]) -> None:
+def track_alerts(
+    alerts: RestockAlertEngine,
+    recent: Deque[AlertEvent],
+    device: str,
+    details: Dict[str, int],
+) -> None:
+    now = time.time()
+    for zone, value in details.items():
+        ZONE_STOCK.labels(device, zone).set(value)
+        event = alerts.update((device, zone), value, None, now)
+        if event is not None:
+            recent.appendleft(event)
+
+
+def render_alert_panel(alerts: RestockAlertEngine, recent: Deque[AlertEvent]) -> None:
+    now = time.time()
+    queue = alerts.restock_queue(RESTOCK_QUEUE_ROWS)
+    print()
+    print(colorama.Style.BRIGHT + f"Restock queue ({len(alerts)} zones):")
+    if not queue:
+        print("  (empty)")
+    for item in queue:
+        device, zone = item.key
+        minutes = (now - item.short_since) / 60
+        print(colorama.Fore.YELLOW + f"  {device:<16} {zone:<12} stock {item.stock}  short for {minutes:.0f} min")
+    if recent:
+        print("Recent alerts:")
+        for event in recent:
+            device, zone = event.key
+            stamp = datetime.fromtimestamp(event.ts).strftime("%H:%M:%S")
+            color = colorama.Fore.RED if event.kind == "raised" else colorama.Fore.GREEN
+            print(color + f"  {stamp} {event.kind:<8} {device} / {zone} (stock {event.stock})")
+
+
+def render_trace_panel(traces: TraceAggregator) -> None:
+    devices = traces.devices()
+    if not devices:
+        return
+    print()
+    print(colorama.Style.BRIGHT + "Latency (ms, p50 / p95 / p99):")
+    labels = [hop.replace("_", "-") if hop == "end_to_end" else hop.replace("_to_", "->") for hop in HOPS]
+    print("  " + f"{'device':<16}" + "".join(f"{label:>26}" for label in labels))
+    for device in devices:
+        summary = traces.summary(device)
+        cells = "".join(
+            f"{summary[hop]['p50']:>8.1f} /{summary[hop]['p95']:>7.1f} /{summary[hop]['p99']:>7.1f}" for hop in HOPS
+        )
+        print(f"  {device:<16}{cells}")
+        stages = traces.stage_means(device)
+        if stages:
+            print("  " + " " * 16 + "edge stages: " + ", ".join(f"{name} {ms:.1f}" for name, ms in stages.items()))
+    if traces.skewed:
+        print(colorama.Fore.YELLOW + f"  {traces.skewed} messages arrived before they were sent: check NTP on the edge nodes")
+
+
+def render_dashboard(
+    payload: Dict[str, Any],
+    alerts: Optional[RestockAlertEngine] = None,
+    recent: Optional[Deque[AlertEvent]] = None,
+    traces: Optional[TraceAggregator] = None,
+) -> None:
     clear_screen()
 
     timestamp = format_timestamp(str(payload.get("timestamp", "")))
@@ -54,7 +149,7 @@ def render_dashboard(payload: Dict[str, Any]) -> None:
 
     gaps = 0
     try:
-        gaps = int(payload.get("gaps", 0))
+        gaps = int(payload.get("gaps", payload.get("total_gaps", 0)))
     except (TypeError, ValueError):
         gaps = 0
 
@@ -64,7 +159,13 @@ def render_dashboard(payload: Dict[str, Any]) -> None:
         if isinstance(count, int):
             details = {"Zone A": max(0, count)}
 
-    low_stock_zones = [zone for zone, value in details.items() if value <= LOW_STOCK_THRESHOLD]
+    if alerts is not None:
+        # Debounced, hysteretic state instead of re-deciding on every payload
+        recent = recent if recent is not None else deque(maxlen=RECENT_ALERT_ROWS)
+        track_alerts(alerts, recent, str(device), details)
+        low_stock_zones = [zone for zone in details if alerts.is_alerting((str(device), zone))]
+    else:
+        low_stock_zones = [zone for zone, value in details.items() if value <= LOW_STOCK_THRESHOLD]
     has_low_stock = bool(low_stock_zones)
 
     status_warning = gaps > 0 or has_low_stock
@@ -106,42 +207,154 @@ def render_dashboard(payload: Dict[str, Any]) -> None:
     if low_stock_zones:
         zones = ", ".join(low_stock_zones)
         print(colorama.Fore.YELLOW + f"Low stock zones: {zones}")
+    if alerts is not None:
+        render_alert_panel(alerts, recent)
+    if traces is not None:
+        render_trace_panel(traces)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LatencyMonitor:
+    """Publish-to-receive latency and loss for payloads carrying ``sent_ts``/``seq`` (see load_generator.py).
+
+    Replaces rendering, which cannot keep up with thousands of messages per
+    second. Sender and receiver clocks must agree, so run both on the broker
+    host or keep them NTP-synced.
+    """
+
+    def __init__(self) -> None:
+        self.window: list = []
+        self.window_started = time.perf_counter()
+        self.last_seq: Dict[str, int] = {}
+        self.received = 0
+        self.lost = 0
+        self.untimed = 0
+
+    def record(self, payload: Dict[str, Any]) -> None:
+        received_at = time.time()
+        self.received += 1
+        sent_ts = payload.get("sent_ts")
+        if isinstance(sent_ts, (int, float)):
+            self.window.append((received_at - sent_ts) * 1000)
+        else:
+            self.untimed += 1
+        device, seq = payload.get("device_id"), payload.get("seq")
+        if isinstance(seq, int) and device is not None:
+            previous = self.last_seq.get(device)
+            if previous is not None and seq > previous + 1:
+                self.lost += seq - previous - 1
+            if previous is None or seq > previous:
+                self.last_seq[device] = seq
+        if time.perf_counter() - self.window_started >= LATENCY_REPORT_SECONDS:
+            self.report()
+
+    def report(self) -> None:
+        elapsed = time.perf_counter() - self.window_started
+        values = sorted(self.window)
+        print(
+            f"[dashboard] {len(values) / elapsed:7.0f} msg/s | latency ms "
+            f"p50 {percentile(values, 0.5):6.1f}  p95 {percentile(values, 0.95):6.1f}  "
+            f"p99 {percentile(values, 0.99):6.1f}  max {values[-1] if values else 0.0:6.1f} | "
+            f"devices {len(self.last_seq)}  received {self.received}  lost {self.lost}"
+            + (f"  untimed {self.untimed}" if self.untimed else "")
+        )
+        self.window = []
+        self.window_started = time.perf_counter()
 
 
 def on_connect(client: mqtt.Client, userdata, flags, rc):  # type: ignore[override]
     if rc == 0:
         print("[dashboard] Connected to MQTT broker. Waiting for messages...")
-        client.subscribe(TOPIC, qos=1)
+        client.subscribe(userdata["topic"], qos=1)
     else:
         print(f"[dashboard] Failed to connect, return code {rc}")
 
 
 def on_message(client: mqtt.Client, userdata, msg: mqtt.MQTTMessage) -> None:  # type: ignore[override]
+    received_ts = time.time()
     try:
         payload = json.loads(msg.payload.decode("utf-8"))
     except json.JSONDecodeError:
+        MESSAGES_MALFORMED.inc()
         print(f"[dashboard] Received malformed payload: {msg.payload}")
         return
-
-    render_dashboard(payload)
+    MESSAGES_OK.inc()
+    sent_ts = payload.get("sent_ts") if isinstance(payload, dict) else None
+    if isinstance(sent_ts, (int, float)):
+        MESSAGE_LATENCY.observe(max(time.time() - sent_ts, 0.0))
+
+    state = userdata.get("state")
+    if state is not None:
+        state.update(payload, received_ts)
+    latency = userdata.get("latency")
+    if latency is not None:
+        latency.record(payload)
+        return
+    traces = userdata["traces"]
+    render_dashboard(payload, userdata["alerts"], userdata["recent_alerts"], traces)
+    if isinstance(payload, dict):
+        # Recorded after rendering, so the panel always shows the messages before this one
+        traces.record(str(payload.get("device_id", "Unknown Device")), payload, received_ts, time.time())
 
 
 def main() -> None:
-    client = mqtt.Client()
+    parser = argparse.ArgumentParser(description="Smart shelf MQTT dashboard")
+    parser.add_argument("--host", default=BROKER_HOST)
+    parser.add_argument("--port", type=int, default=BROKER_PORT)
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--latency", action="store_true", help="report publish-to-receive latency instead of rendering")
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve Prometheus metrics on this port (0 = off)")
+    parser.add_argument("--query-port", type=int, default=0, help="serve the shelf state query API on this port (0 = off)")
+    parser.add_argument("--history-db", help="record zone history to this SQLite file and serve it via the query API")
+    args = parser.parse_args()
+
+    userdata = {
+        "topic": args.topic,
+        "latency": LatencyMonitor() if args.latency else None,
+        "alerts": RestockAlertEngine(raise_stock=LOW_STOCK_THRESHOLD, clear_stock=LOW_STOCK_THRESHOLD + 2),
+        "recent_alerts": deque(maxlen=RECENT_ALERT_ROWS),
+        "traces": TraceAggregator(on_sample=lambda device, hop, seconds: TRACE_SECONDS.labels(device, hop).observe(seconds)),
+        "state": None,
+    }
+    query_server = None
+    if args.query_port or args.history_db:
+        history = ZoneHistoryStore(args.history_db) if args.history_db else None
+        userdata["state"] = ShelfStateTable(history)
+    if args.query_port:
+        query_server = QueryServer(userdata["state"], args.query_port)
+        print(f"[dashboard] Query API at http://0.0.0.0:{args.query_port}/state")
+    RESTOCK_ALERTS.set_function(userdata["alerts"].__len__)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+        print(f"[dashboard] Metrics at http://0.0.0.0:{args.metrics_port}/metrics")
+    client = mqtt.Client(userdata=userdata)
     client.on_connect = on_connect
     client.on_message = on_message
 
     try:
-        client.connect(BROKER_HOST, BROKER_PORT)
+        client.connect(args.host, args.port)
     except Exception as exc:  # noqa: BLE001
         print(f"[dashboard] Connection error: {exc}")
         return
 
-    print("[dashboard] Listening on topic smart_retail/group3/shelf")
+    print(f"[dashboard] Listening on topic {args.topic}")
     try:
         client.loop_forever()
     except KeyboardInterrupt:
         print("[dashboard] Stopping dashboard")
+        if userdata["latency"] is not None:
+            userdata["latency"].report()
+    finally:
+        if query_server is not None:
+            query_server.close()
+        if userdata["state"] is not None and userdata["state"].history is not None:
+            userdata["state"].history.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,214 @@
+"""Load generator that simulates many smart-shelf devices for broker and dashboard stress tests.
+
+Devices are spread over a small pool of MQTT connections and publish at a
+fixed aggregate rate. Every zone follows a sell-down / restock trajectory
+instead of independent random draws, and every payload carries ``sent_ts``
+and a per-device ``seq`` so ``cloud_dashboard.py --latency`` can measure
+publish-to-receive latency and message loss.
+
+    mosquitto -p 1883 &
+    python cloud_dashboard.py --latency --host localhost
+    python load_generator.py --host localhost --devices 2000 --zones 8 --rate 2000 --duration 120
+"""
+import argparse
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import paho.mqtt.client as mqtt
+
+from mock_edge import CAPACITY, LOW_STOCK_THRESHOLD, TOPIC
+
+DEFAULT_HOST = "localhost"
+DEFAULT_PORT = 1883
+DEFAULT_DEVICES = 1000
+DEFAULT_ZONES = 8
+DEFAULT_RATE = 1000.0           # messages per second, all devices together
+DEFAULT_CLIENTS = 16            # MQTT connections shared by the simulated devices
+DEFAULT_TIME_SCALE = 60.0       # simulated seconds per real second
+MAX_BURST = 500                 # publishes per pacing step before yielding
+REPORT_INTERVAL_SECONDS = 5.0
+MAX_QUEUED_MESSAGES = 10000     # per connection; beyond this publishes fail instead of buffering forever
+
+# Stock model (simulated time)
+SALES_PER_HOUR = (0.5, 12.0)    # per-zone mean sell rate, drawn log-uniformly
+RESTOCK_DELAY_MINUTES = 25.0    # mean delay between hitting the reorder point and a refill
+DAY_SECONDS = 24 * 3600
+
+
+def poisson(lam: float, rng: random.Random) -> int:
+    """Knuth's method; the expected counts per publish interval are small."""
+    if lam <= 0:
+        return 0
+    if lam > 30:
+        return max(0, int(round(rng.gauss(lam, math.sqrt(lam)))))
+    limit = math.exp(-lam)
+    k, p = 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def diurnal_factor(sim_ts: float) -> float:
+    """Store traffic: quiet at night, peaking in the late afternoon."""
+    hour = (sim_ts % DAY_SECONDS) / 3600
+    return 0.15 + 0.85 * math.sin(math.pi * min(max(hour - 7, 0), 15) / 15) ** 2
+
+
+class ZoneState:
+    __slots__ = ("name", "capacity", "stock", "sell_rate", "restock_at")
+
+    def __init__(self, name: str, rng: random.Random):
+        self.name = name
+        self.capacity = rng.randint(CAPACITY // 2, CAPACITY * 2)
+        self.stock = rng.randint(0, self.capacity)
+        low, high = SALES_PER_HOUR
+        self.sell_rate = math.exp(rng.uniform(math.log(low), math.log(high))) / 3600
+        self.restock_at: Optional[float] = None
+
+    def advance(self, sim_ts: float, sim_dt: float, rng: random.Random) -> None:
+        if self.restock_at is not None and sim_ts >= self.restock_at:
+            self.stock = self.capacity
+            self.restock_at = None
+        sold = poisson(self.sell_rate * diurnal_factor(sim_ts) * sim_dt, rng)
+        self.stock = max(0, self.stock - sold)
+        if self.stock <= LOW_STOCK_THRESHOLD and self.restock_at is None:
+            self.restock_at = sim_ts + rng.expovariate(1 / (RESTOCK_DELAY_MINUTES * 60))
+
+
+class SimulatedDevice:
+    __slots__ = ("device_id", "zones", "seq", "last_sim_ts")
+
+    def __init__(self, index: int, zone_count: int, sim_ts: float, rng: random.Random):
+        self.device_id = f"shelf_{index:05d}"
+        self.zones = [ZoneState(f"Zone {chr(ord('A') + z % 26)}{z // 26 or ''}", rng) for z in range(zone_count)]
+        self.seq = 0
+        self.last_sim_ts = sim_ts
+
+    def next_payload(self, sim_ts: float, rng: random.Random) -> Dict:
+        sim_dt = sim_ts - self.last_sim_ts
+        self.last_sim_ts = sim_ts
+        for zone in self.zones:
+            zone.advance(sim_ts, sim_dt, rng)
+        self.seq += 1
+        details = {zone.name: zone.stock for zone in self.zones}
+        gaps = sum(zone.capacity - zone.stock for zone in self.zones)
+        return {
+            "device_id": self.device_id,
+            "timestamp": datetime.fromtimestamp(sim_ts, timezone.utc).isoformat(),
+            "details": details,
+            "gaps": gaps,
+            "status": "Tracking",
+            "seq": self.seq,
+            "sent_ts": time.time(),
+        }
+
+
+class ClientPool:
+    """A fixed set of MQTT connections, each with its own network thread."""
+
+    def __init__(self, size: int, host: str, port: int):
+        self.clients: List[mqtt.Client] = []
+        self.acked = [0] * size
+        for index in range(size):
+            client = mqtt.Client(client_id=f"loadgen-{index:03d}-{random.getrandbits(24):06x}")
+            client.max_queued_messages_set(MAX_QUEUED_MESSAGES)
+            client.on_publish = self._make_on_publish(index)
+            client.connect(host, port)
+            client.loop_start()
+            self.clients.append(client)
+        print(f"[loadgen] {size} connections to {host}:{port}")
+
+    def _make_on_publish(self, index: int):
+        def on_publish(client, userdata, mid):  # type: ignore[override]
+            self.acked[index] += 1
+
+        return on_publish
+
+    def close(self) -> None:
+        for client in self.clients:
+            client.loop_stop()
+            client.disconnect()
+
+
+def run(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    sim_start = time.time()
+    devices = [SimulatedDevice(i, args.zones, sim_start, rng) for i in range(args.devices)]
+    pool = ClientPool(min(args.clients, args.devices), args.host, args.port)
+    clients = pool.clients
+
+    print(
+        f"[loadgen] {args.devices} devices x {args.zones} zones, target {args.rate:.0f} msg/s "
+        f"(each device every {args.devices / args.rate:.2f}s), qos={args.qos}, time scale x{args.time_scale:g}"
+    )
+
+    sent = failed = cursor = 0
+    started = time.perf_counter()
+    last_report, last_sent = started, 0
+    try:
+        while True:
+            now = time.perf_counter()
+            elapsed = now - started
+            if args.duration and elapsed >= args.duration:
+                break
+            due = int(args.rate * elapsed) - sent - failed
+            if due <= 0:
+                time.sleep(min(0.005, 1 / args.rate))
+                continue
+
+            sim_ts = sim_start + elapsed * args.time_scale
+            for _ in range(min(due, MAX_BURST)):
+                device = devices[cursor]
+                message = json.dumps(device.next_payload(sim_ts, rng))
+                info = clients[cursor % len(clients)].publish(args.topic, message, qos=args.qos)
+                if info.rc == mqtt.MQTT_ERR_SUCCESS:
+                    sent += 1
+                else:
+                    failed += 1
+                cursor = (cursor + 1) % len(devices)
+
+            if now - last_report >= REPORT_INTERVAL_SECONDS:
+                rate = (sent - last_sent) / (now - last_report)
+                print(f"[loadgen] {elapsed:6.1f}s  {rate:8.0f} msg/s  sent={sent} acked={sum(pool.acked)} failed={failed}")
+                last_report, last_sent = now, sent
+    except KeyboardInterrupt:
+        print("[loadgen] Interrupted")
+    finally:
+        elapsed = time.perf_counter() - started
+        # Let the network threads drain what is still queued before disconnecting
+        deadline = time.perf_counter() + 5
+        while sum(pool.acked) < sent and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        pool.close()
+        print(
+            f"[loadgen] Done: {sent} published in {elapsed:.1f}s ({sent / elapsed:.0f} msg/s, "
+            f"target {args.rate:.0f}), acked={sum(pool.acked)}, failed={failed}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--topic", default=TOPIC)
+    parser.add_argument("--devices", type=int, default=DEFAULT_DEVICES)
+    parser.add_argument("--zones", type=int, default=DEFAULT_ZONES, help="zones per device")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="aggregate messages per second")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="MQTT connections in the pool")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run (0 = until Ctrl+C)")
+    parser.add_argument("--qos", type=int, choices=(0, 1), default=0)
+    parser.add_argument("--time-scale", type=float, default=DEFAULT_TIME_SCALE, help="simulated seconds per real second")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    if args.rate <= 0 or args.devices <= 0 or args.clients <= 0:
+        parser.error("--rate, --devices and --clients must be positive")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
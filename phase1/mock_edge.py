@@ -1,11 +1,17 @@
 """Mock edge publisher that simulates smart shelf inventory events."""
 import json
+import os
 import random
+import sys
 import time
 from datetime import datetime, timezone
 
 import paho.mqtt.client as mqtt
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracing import FrameTrace  # noqa: E402
+
 BROKER_HOST = "broker.emqx.io"
 BROKER_PORT = 1883
 TOPIC = "smart_retail/group3/shelf"
@@ -53,8 +59,13 @@ def main() -> None:
     client.loop_start()
 
     try:
+        seq = 0
         while True:
+            trace = FrameTrace(seq)
             payload = build_payload()
+            trace.mark("simulate")
+            payload["trace"] = trace.to_dict()
+            seq += 1
             message = json.dumps(payload)
             result = client.publish(TOPIC, message, qos=1)
             status = result[0]
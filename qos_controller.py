@@ -0,0 +1,168 @@
+"""Feedback controller that trades image quality for speed to hold an fps / latency budget.
+
+The controller walks a ladder of quality levels. Each level fixes an input
+scale, a detector ``imgsz``, a frame stride and a rendering level. After
+every processed frame the monitor reports the measured latency. Once the
+smoothed cost per source frame stays over budget, the controller steps
+down a level. It steps back up once the better level is predicted to fit,
+using the cost that level showed last time it ran, or after a long stretch
+of headroom in case that measurement is stale::
+
+    qos = QosController(target_fps=15)
+    qos.apply(detector)
+    for frame_idx, frame in enumerate(frames):
+        if not qos.should_process(frame_idx):
+            continue                      # reuse the previous zone results
+        ...                               # resize by qos.level.scale, infer, draw per qos.level.render
+        if qos.observe(elapsed, frame_idx):
+            qos.apply(detector)           # level changed; every decision is logged
+
+Cost per source frame is ``latency / stride``. Skipping every other frame
+halves the work the stream asks for, even though each processed frame
+still takes the same time.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+RENDER_FULL = "full"        # zones, boxes, gaps and labels
+RENDER_ZONES = "zones"      # zone outlines, gaps and labels only (no per-box rectangles)
+RENDER_NONE = "none"        # no overlay; analytics only
+
+EWMA_ALPHA = 0.2
+COOLDOWN_FRAMES = 15         # processed frames to wait after a change before judging again
+DEGRADE_RATIO = 1.0          # step down when cost > budget * this
+RESTORE_RATIO = 0.8          # step up when the better level is predicted below budget * this
+PROBE_FRAMES = 150           # sustained headroom after which a better level is retried despite its old cost
+LOG_LIMIT = 1000             # decisions kept in memory
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    scale: float             # input resize factor before inference
+    imgsz: int | None        # detector input size (PyTorch backend only; exported models are fixed)
+    stride: int              # process every n-th frame
+    render: str
+
+
+DEFAULT_LADDER = (
+    QualityLevel(1.0, None, 1, RENDER_FULL),
+    QualityLevel(1.0, None, 1, RENDER_ZONES),
+    QualityLevel(0.75, 512, 1, RENDER_ZONES),
+    QualityLevel(0.5, 416, 1, RENDER_ZONES),
+    QualityLevel(0.5, 416, 2, RENDER_ZONES),
+    QualityLevel(0.5, 320, 2, RENDER_NONE),
+    QualityLevel(0.5, 320, 3, RENDER_NONE),
+)
+
+
+@dataclass(frozen=True)
+class QosDecision:
+    frame: int
+    previous: int
+    level: int
+    cost_ms: float           # smoothed cost per source frame that triggered the change
+    budget_ms: float
+    reason: str
+
+
+class QosController:
+    def __init__(
+        self,
+        target_fps: float | None = None,
+        latency_budget_ms: float | None = None,
+        ladder: tuple[QualityLevel, ...] = DEFAULT_LADDER,
+        start_level: int = 0,
+        verbose: bool = True,
+    ):
+        budgets = []
+        if target_fps:
+            budgets.append(1.0 / target_fps)
+        if latency_budget_ms:
+            budgets.append(latency_budget_ms / 1000.0)
+        if not budgets:
+            raise ValueError("QosController needs target_fps or latency_budget_ms")
+        if not ladder:
+            raise ValueError("QosController needs at least one quality level")
+        self.budget = min(budgets)
+        self.ladder = ladder
+        self.index = min(max(start_level, 0), len(ladder) - 1)
+        self.verbose = verbose
+        self.cost: float | None = None                          # smoothed seconds per source frame
+        self.level_costs: list[float | None] = [None] * len(ladder)
+        self.cooldown = COOLDOWN_FRAMES
+        self.headroom_frames = 0
+        self.probe_after = PROBE_FRAMES
+        self.decisions: list[QosDecision] = []
+        self._base_imgsz: int | None = None
+
+    @property
+    def level(self) -> QualityLevel:
+        return self.ladder[self.index]
+
+    def should_process(self, frame_idx: int) -> bool:
+        return frame_idx % self.level.stride == 0
+
+    def observe(self, latency: float, frame_idx: int = 0) -> bool:
+        """Record one processed frame's latency (seconds); returns True when the level changed."""
+        sample = latency / self.level.stride
+        self.cost = sample if self.cost is None else self.cost + EWMA_ALPHA * (sample - self.cost)
+        self.level_costs[self.index] = self.cost
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        if self.cost > self.budget * DEGRADE_RATIO and self.index < len(self.ladder) - 1:
+            return self._move(self.index + 1, frame_idx, "over budget")
+        if self.index > 0:
+            better = self.level_costs[self.index - 1]
+            if better is None:
+                # Never measured (we started degraded): assume it costs what this level would without its savings
+                better = self.cost * self.level.stride / self.ladder[self.index - 1].stride
+            if better < self.budget * RESTORE_RATIO:
+                return self._move(self.index - 1, frame_idx, "headroom")
+            # The better level's cost was measured under the load that pushed us off it; retry it now and then
+            self.headroom_frames = self.headroom_frames + 1 if self.cost < self.budget * RESTORE_RATIO else 0
+            if self.headroom_frames >= self.probe_after:
+                return self._move(self.index - 1, frame_idx, "probe")
+        return False
+
+    def _move(self, index: int, frame_idx: int, reason: str) -> bool:
+        decision = QosDecision(frame_idx, self.index, index, self.cost * 1000, self.budget * 1000, reason)
+        last = self.decisions[-1] if self.decisions else None
+        if last and last.reason == "probe" and last.level == self.index and index > self.index:
+            self.probe_after = min(self.probe_after * 2, PROBE_FRAMES * 16)  # failed probe: back off
+        elif reason == "headroom":
+            self.probe_after = PROBE_FRAMES
+        if len(self.decisions) >= LOG_LIMIT:
+            del self.decisions[: LOG_LIMIT // 2]
+        self.decisions.append(decision)
+        self.index = index
+        self.cooldown = COOLDOWN_FRAMES
+        self.headroom_frames = 0
+        # Start the new level from its last measurement, or from the current cost, not from zero
+        self.cost = self.level_costs[index] if self.level_costs[index] is not None else self.cost
+        if self.verbose:
+            level = self.level
+            print(
+                f"[qos] frame {frame_idx}: level {decision.previous} -> {index} ({reason}, "
+                f"{decision.cost_ms:.1f} ms/frame vs budget {decision.budget_ms:.1f} ms): "
+                f"scale={level.scale} imgsz={level.imgsz or 'default'} stride={level.stride} render={level.render}"
+            )
+        return True
+
+    def apply(self, detector) -> None:
+        """Push the level's ``imgsz`` into detectors that accept it at run time."""
+        if not hasattr(detector, "imgsz"):
+            return
+        if self._base_imgsz is None:
+            self._base_imgsz = detector.imgsz or 0
+        detector.imgsz = self.level.imgsz or self._base_imgsz or None
+
+    def summary(self) -> str:
+        level = self.level
+        return (
+            f"level {self.index}/{len(self.ladder) - 1} (scale={level.scale}, stride={level.stride}, "
+            f"render={level.render}), {len(self.decisions)} adjustments, "
+            f"{(self.cost or 0) * 1000:.1f} ms/frame vs budget {self.budget * 1000:.1f} ms"
+        )
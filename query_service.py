@@ -0,0 +1,371 @@
+"""HTTP/JSON query API over the live and historical shelf state, for downstream restocking systems.
+
+Every MQTT payload the cloud side receives updates ``ShelfStateTable``, an
+in-memory table of the latest state per device / zone. Zones that are
+empty right now have their own index, and changes are kept in version
+order. Each entry points into the zone history database for the range
+behind it::
+
+    GET /state                          every zone (?device=..., ?empty=1, ?since_version=N)
+    GET /state/<device>                 one device
+    GET /state/<device>/<zone>          one zone
+    GET /history?device=..&zone=..&start=today|<epoch>&end=..&since=8h&resolution=auto|raw|minute|hour
+
+``/history`` returns the stored samples and ``empty_seconds`` /
+``blocked_seconds`` over the range, which answers "how long was Row_3 empty
+today". Responses carry an ``ETag`` of the table version. A poller that
+sends ``If-None-Match`` gets ``304`` while nothing changed, and
+``?since_version=N`` returns only the zones that changed after version N.
+The version moves only when stock, missing or blocked change. Repeated
+identical payloads just refresh ``ts``.
+
+Attach it to the dashboard (``phase1/cloud_dashboard.py --query-port 8095
+--history-db history/cloud.db``) or run it standalone against the broker::
+
+    python query_service.py --port 8095 --history-db history/cloud.db
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from zone_history import ZoneHistoryStore, parse_duration, pick_table
+
+DEFAULT_PORT = 8095
+HOLD_GAP_SECONDS = 30.0     # a history sample stands for at most its bucket plus this long
+BLOCKED_STATUSES = {"blocked"}
+BUCKET_SECONDS = {"samples_raw": 1, "samples_1m": 60, "samples_1h": 3600}
+
+
+def zone_updates(payload: dict) -> list[tuple[str, int | None, int | None, bool]]:
+    """``(zone, stock, missing, blocked)`` per zone, from any payload shape the edge scripts publish.
+
+    - ``inference_yolo10`` / ``load_generator``: ``details`` maps zone -> count; ``status: Blocked``
+      marks the whole device occluded;
+    - ``zone_monitor`` style: ``details`` maps zone -> ``{stock, missing}`` or ``{status: blocked}``;
+    - ``mock_edge``: one product with ``current_stock`` / ``empty_slots``.
+    """
+    device_blocked = str(payload.get("status", "")).lower() in BLOCKED_STATUSES
+    details = payload.get("details")
+    updates = []
+    if isinstance(details, dict) and details:
+        for zone, value in details.items():
+            if isinstance(value, dict):
+                if str(value.get("status", "")).lower() in BLOCKED_STATUSES:
+                    updates.append((str(zone), None, None, True))
+                    continue
+                stock, missing = _as_count(value.get("stock")), _as_count(value.get("missing"))
+            else:
+                stock, missing = _as_count(value), None
+            if stock is not None or missing is not None:
+                updates.append((str(zone), stock, missing, device_blocked))
+    elif "current_stock" in payload:
+        zone = str(payload.get("product_id") or "Zone A")
+        updates.append((zone, _as_count(payload.get("current_stock")), _as_count(payload.get("empty_slots")), device_blocked))
+    elif isinstance(payload.get("count"), int):
+        updates.append(("Zone A", max(payload["count"], 0), None, device_blocked))
+    return updates
+
+
+def _as_count(value: Any) -> int | None:
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class ZoneState:
+    device: str
+    zone: str
+    stock: int | None
+    missing: int | None
+    blocked: bool
+    ts: float               # last payload for this zone
+    changed_ts: float       # last change of stock / missing / blocked
+    empty_since: float | None
+    version: int
+
+    @property
+    def empty(self) -> bool:
+        return self.stock == 0 and not self.blocked
+
+    def to_dict(self) -> dict:
+        start = int(self.empty_since if self.empty_since is not None else self.changed_ts)
+        return {
+            "device": self.device,
+            "zone": self.zone,
+            "stock": self.stock,
+            "missing": self.missing,
+            "blocked": self.blocked,
+            "empty": self.empty,
+            "ts": round(self.ts, 3),
+            "changed_ts": round(self.changed_ts, 3),
+            "empty_since": self.empty_since,
+            "version": self.version,
+            # Pointer into the stored history behind the current state
+            "history": f"/history?device={quote(self.device, safe='')}&zone={quote(self.zone, safe='')}&start={start}",
+        }
+
+
+class ShelfStateTable:
+    """Latest state per (device, zone), with an index of empty zones and a change log in version order."""
+
+    def __init__(self, history: ZoneHistoryStore | None = None):
+        self.history = history
+        self.version = 0
+        self._zones: dict[str, dict[str, ZoneState]] = {}
+        self._empty: set[tuple[str, str]] = set()
+        self._changes: OrderedDict[tuple[str, str], ZoneState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def update(self, payload: dict, received_ts: float | None = None) -> int:
+        """Apply one MQTT payload; returns how many zones changed."""
+        if not isinstance(payload, dict):
+            return 0
+        device = str(payload.get("device_id", "Unknown Device"))
+        now = time.time() if received_ts is None else received_ts
+        changed = 0
+        with self._lock:
+            zones = self._zones.setdefault(device, {})
+            for zone, stock, missing, blocked in zone_updates(payload):
+                if self.history is not None:
+                    self.history.record(device, zone, stock, missing, blocked=blocked, ts=now)
+                state = zones.get(zone)
+                if state is None:
+                    state = zones[zone] = ZoneState(device, zone, stock, missing, blocked, now, now, None, 0)
+                elif blocked:
+                    # Occluded: keep the last seen stock, only the flag changes
+                    state.ts = now
+                    if state.blocked:
+                        continue
+                    state.blocked = True
+                elif (state.stock, state.missing, state.blocked) == (stock, missing, False):
+                    state.ts = now
+                    continue
+                else:
+                    state.stock, state.missing, state.blocked, state.ts = stock, missing, False, now
+                if state.empty and state.empty_since is None:
+                    state.empty_since = now
+                elif not state.empty and not state.blocked:
+                    state.empty_since = None
+                self.version += 1
+                state.version = self.version
+                state.changed_ts = now
+                key = (device, zone)
+                if state.empty:
+                    self._empty.add(key)
+                else:
+                    self._empty.discard(key)
+                self._changes[key] = state
+                self._changes.move_to_end(key)
+                changed += 1
+        return changed
+
+    def __len__(self) -> int:
+        return sum(len(zones) for zones in self._zones.values())
+
+    def snapshot(self, device: str | None = None, empty: bool = False, since_version: int = 0) -> tuple[int, list[dict]]:
+        """``(version, zones)`` filtered by device / emptiness / change version."""
+        with self._lock:
+            if since_version:
+                states = []
+                for state in reversed(self._changes.values()):
+                    if state.version <= since_version:
+                        break
+                    states.append(state)
+                states.reverse()
+            elif empty:
+                states = [self._zones[d][z] for d, z in sorted(self._empty)]
+            elif device is not None:
+                states = list(self._zones.get(device, {}).values())
+            else:
+                states = [state for zones in self._zones.values() for state in zones.values()]
+            if device is not None:
+                states = [state for state in states if state.device == device]
+            if empty:
+                states = [state for state in states if state.empty]
+            return self.version, [state.to_dict() for state in states]
+
+    def get(self, device: str, zone: str | None = None) -> tuple[int, list[dict]] | None:
+        """Point query; None when the device / zone was never seen."""
+        with self._lock:
+            zones = self._zones.get(device)
+            if zones is None or (zone is not None and zone not in zones):
+                return None
+            states = [zones[zone]] if zone is not None else list(zones.values())
+            return max(state.version for state in states), [state.to_dict() for state in states]
+
+
+def history_summary(rows: list[dict], table: str, end: float) -> dict[str, float]:
+    """Seconds the zone was empty / blocked over ``rows``, each row standing until the next one (capped)."""
+    bucket = BUCKET_SECONDS[table]
+    empty = blocked = 0.0
+    for row, nxt in zip(rows, rows[1:] + [None]):
+        until = nxt["ts"] if nxt is not None and nxt["zone"] == row["zone"] else min(end, row["ts"] + bucket)
+        held = max(min(until - row["ts"], bucket + HOLD_GAP_SECONDS), 0.0)
+        blocked += held * row["blocked_ratio"]
+        if row["stock_max"] == 0:
+            empty += held * (1.0 - row["blocked_ratio"])
+    return {"empty_seconds": round(empty, 1), "blocked_seconds": round(blocked, 1)}
+
+
+def parse_time(text: str, now: float) -> float:
+    """``today`` (local midnight), an epoch timestamp, or a duration back from now (``8h``)."""
+    if text == "today":
+        return datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    try:
+        return float(text)
+    except ValueError:
+        return now - parse_duration(text)
+
+
+class QueryServer:
+    def __init__(self, table: ShelfStateTable, port: int = DEFAULT_PORT, host: str = "0.0.0.0"):
+        self.table = table
+        self.requests = 0
+        self.not_modified = 0
+        self.server = self._make_server(host, port)
+        threading.Thread(target=self.server.serve_forever, name="query-http", daemon=True).start()
+
+    def _make_server(self, host: str, port: int) -> ThreadingHTTPServer:
+        service = self
+
+        class QueryHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # noqa: N802 - http.server API
+                started = time.perf_counter()
+                service.requests += 1
+                url = urlsplit(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+                try:
+                    if parts[:1] == ["state"] and len(parts) <= 3:
+                        self._state(parts[1:], params, started)
+                    elif parts == ["history"]:
+                        self._history(params, started)
+                    else:
+                        self._json(404, {"error": "unknown path"}, started)
+                except ValueError as exc:
+                    self._json(400, {"error": str(exc)}, started)
+
+            def _state(self, parts: list[str], params: dict[str, str], started: float) -> None:
+                if parts:
+                    found = service.table.get(parts[0], parts[1] if len(parts) > 1 else None)
+                    if found is None:
+                        self._json(404, {"error": "unknown device or zone"}, started)
+                        return
+                    version, zones = found
+                else:
+                    version, zones = service.table.snapshot(
+                        device=params.get("device"),
+                        empty=params.get("empty") in ("1", "true"),
+                        since_version=int(params.get("since_version", 0)),
+                    )
+                etag = f'"{version}"'
+                if self.headers.get("If-None-Match") == etag:
+                    service.not_modified += 1
+                    self._send(304, b"", started, etag)
+                    return
+                body = zones[0] if len(parts) == 2 else {"version": version, "zones": zones}
+                self._json(200, body, started, etag)
+
+            def _history(self, params: dict[str, str], started: float) -> None:
+                history = service.table.history
+                if history is None:
+                    self._json(503, {"error": "no history database attached (--history-db)"}, started)
+                    return
+                if "device" not in params:
+                    raise ValueError("device is required")
+                now = time.time()
+                end = parse_time(params["end"], now) if "end" in params else now
+                start = parse_time(params.get("start", params.get("since", "1h")), now)
+                resolution = params.get("resolution", "auto")
+                if resolution not in ("auto", "raw", "minute", "hour"):
+                    raise ValueError("resolution must be auto, raw, minute or hour")
+                rows = history.query(params["device"], params.get("zone"), start, end, resolution)
+                table = pick_table(start, end, resolution)
+                # Durations come from per-second samples while those are retained: a minute that was
+                # empty for 40 s is not empty as a whole
+                summary_rows, summary_table = rows, table
+                raw_kept = history.retention.raw
+                if table != "samples_raw" and (raw_kept is None or start >= now - raw_kept):
+                    summary_rows = history.query(params["device"], params.get("zone"), start, end, "raw")
+                    summary_table = "samples_raw"
+                body = {"device": params["device"], "zone": params.get("zone"), "start": start, "end": end,
+                        "table": table, **history_summary(summary_rows, summary_table, end), "rows": rows}
+                self._json(200, body, started)
+
+            def _json(self, status: int, body: Any, started: float, etag: str | None = None) -> None:
+                self._send(status, json.dumps(body, ensure_ascii=False).encode("utf-8"), started, etag)
+
+            def _send(self, status: int, body: bytes, started: float, etag: str | None = None) -> None:
+                self.send_response(status)
+                if body:
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                if etag:
+                    self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("X-Query-Ms", f"{(time.perf_counter() - started) * 1000:.2f}")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:  # noqa: A002 - pollers would flood the log
+                pass
+
+        server = ThreadingHTTPServer((host, port), QueryHandler)
+        server.daemon_threads = True
+        return server
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Shelf state query API fed from MQTT")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--history-db", type=str, help="record and serve zone history from this SQLite file")
+    parser.add_argument("--broker", default="broker.emqx.io")
+    parser.add_argument("--broker-port", type=int, default=1883)
+    parser.add_argument("--topic", default="smart_retail/group3/shelf")
+    args = parser.parse_args()
+
+    # paho only for the standalone mode; the dashboard feeds the table from its own client
+    import paho.mqtt.client as mqtt
+
+    table = ShelfStateTable(ZoneHistoryStore(args.history_db) if args.history_db else None)
+    service = QueryServer(table, args.port)
+    print(f"[query] Serving http://0.0.0.0:{args.port}/state and /history")
+
+    def on_message(client, userdata, msg) -> None:
+        try:
+            table.update(json.loads(msg.payload.decode("utf-8")))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            pass
+
+    client = mqtt.Client()
+    client.on_connect = lambda client, userdata, flags, rc: client.subscribe(args.topic, qos=1)
+    client.on_message = on_message
+    client.connect(args.broker, args.broker_port)
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        print(f"[query] Stopping: {len(table)} zones, version {table.version}, {service.requests} requests "
+              f"({service.not_modified} not modified)")
+    finally:
+        service.close()
+        if table.history is not None:
+            table.history.close()
+
+
+if __name__ == "__main__":
+    main()
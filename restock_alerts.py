@@ -0,0 +1,238 @@
+"""Stateful restock alerting on the per-zone stock / missing stream.
+
+``RestockAlertEngine.update`` is called once per zone observation (a frame
+of ``zone_monitor`` or an MQTT payload) and returns an ``AlertEvent`` only
+when a zone's alert state actually changes:
+
+- hysteresis: an alert is raised at ``missing >= raise_missing`` or
+  ``stock <= raise_stock`` and only cleared once ``missing <= clear_missing``
+  and ``stock >= clear_stock``;
+- debouncing: the raise / clear condition must hold continuously for
+  ``raise_after`` / ``clear_after`` seconds; blocked (occluded) samples
+  neither confirm nor reset a pending change;
+- ordering: active alerts sit in a heap keyed by missing slots and by how
+  long the zone has been short, so ``restock_queue()`` is the order staff
+  should walk the store in.
+
+Per zone the engine keeps one small slotted record; idle zones are evicted
+and stale heap entries compacted, so memory is bounded by the number of
+live zones rather than by the event count.
+"""
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from typing import Hashable, Iterable
+
+RAISE_MISSING = 1           # missing slots that (after debouncing) raise an alert
+CLEAR_MISSING = 0
+RAISE_STOCK = 3             # matches LOW_STOCK_THRESHOLD of the dashboard
+CLEAR_STOCK = 5             # must recover above this before the alert clears
+RAISE_AFTER_SECONDS = 5.0
+CLEAR_AFTER_SECONDS = 10.0
+MISSING_WEIGHT = 600.0      # one missing slot outranks a zone that has been short 10 minutes longer
+IDLE_TTL_SECONDS = 3600.0   # zones without updates for this long are forgotten (if not alerting)
+SWEEP_INTERVAL = 100_000    # updates between idle/heap housekeeping passes
+
+OK = 0
+PENDING_RAISE = 1
+ALERT = 2
+PENDING_CLEAR = 3
+
+
+@dataclass(frozen=True)
+class AlertEvent:
+    key: Hashable            # usually (camera / device, zone)
+    kind: str                # "raised" or "cleared"
+    ts: float
+    stock: int | None
+    missing: int | None
+    since: float             # when the zone first went short (raised) / when it recovered (cleared)
+
+
+@dataclass(frozen=True)
+class RestockItem:
+    key: Hashable
+    missing: int
+    stock: int | None
+    short_since: float
+
+
+class _ZoneState:
+    __slots__ = ("state", "since", "short_since", "stock", "missing", "last_seen", "version")
+
+    def __init__(self, ts: float):
+        self.state = OK
+        self.since = ts          # start of the pending condition
+        self.short_since = ts    # start of the current shortage (valid while alerting)
+        self.stock: int | None = None
+        self.missing = 0
+        self.last_seen = ts
+        self.version = 0
+
+
+class RestockAlertEngine:
+    def __init__(
+        self,
+        raise_missing: int = RAISE_MISSING,
+        clear_missing: int = CLEAR_MISSING,
+        raise_stock: int | None = RAISE_STOCK,
+        clear_stock: int | None = CLEAR_STOCK,
+        raise_after: float = RAISE_AFTER_SECONDS,
+        clear_after: float = CLEAR_AFTER_SECONDS,
+        idle_ttl: float = IDLE_TTL_SECONDS,
+    ):
+        if clear_missing >= raise_missing:
+            raise ValueError("clear_missing must be below raise_missing")
+        if raise_stock is not None and (clear_stock is None or clear_stock <= raise_stock):
+            raise ValueError("clear_stock must be above raise_stock")
+        self.raise_missing = raise_missing
+        self.clear_missing = clear_missing
+        self.raise_stock = raise_stock
+        self.clear_stock = clear_stock
+        self.raise_after = raise_after
+        self.clear_after = clear_after
+        self.idle_ttl = idle_ttl
+        self.zones: dict[Hashable, _ZoneState] = {}
+        # (priority, version, key); entries whose version no longer matches are stale
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._active = 0
+        self._updates = 0
+
+    def __len__(self) -> int:
+        return self._active
+
+    def _is_short(self, stock: int | None, missing: int) -> bool:
+        if missing >= self.raise_missing:
+            return True
+        return self.raise_stock is not None and stock is not None and stock <= self.raise_stock
+
+    def _is_recovered(self, stock: int | None, missing: int) -> bool:
+        if missing > self.clear_missing:
+            return False
+        return self.clear_stock is None or stock is None or stock >= self.clear_stock
+
+    def _push(self, key: Hashable, zone: _ZoneState) -> None:
+        zone.version += 1
+        # Smaller is more urgent; "short for longer" is an earlier short_since, so the
+        # time-dependent part of the priority is the same for every zone and never needs re-keying
+        priority = zone.short_since - zone.missing * MISSING_WEIGHT
+        heapq.heappush(self._heap, (priority, zone.version, key))
+
+    def update(
+        self,
+        key: Hashable,
+        stock: int | None,
+        missing: int | None,
+        ts: float,
+        blocked: bool = False,
+    ) -> AlertEvent | None:
+        """Feed one observation of a zone; returns an event only on a raise / clear transition."""
+        self._updates += 1
+        if self._updates % SWEEP_INTERVAL == 0:
+            self._sweep(ts)
+
+        zone = self.zones.get(key)
+        if zone is None:
+            zone = self.zones[key] = _ZoneState(ts)
+        zone.last_seen = ts
+        if blocked or (stock is None and missing is None):
+            return None  # occluded: keep pending timers, decide nothing
+
+        missing = missing or 0
+        previous_missing = zone.missing
+        zone.stock, zone.missing = stock, missing
+        state = zone.state
+
+        if state == OK:
+            if self._is_short(stock, missing):
+                zone.state, zone.since = PENDING_RAISE, ts
+                if self.raise_after <= 0:
+                    return self._raise(key, zone, ts)
+            return None
+        if state == PENDING_RAISE:
+            if not self._is_short(stock, missing):
+                zone.state = OK
+            elif ts - zone.since >= self.raise_after:
+                return self._raise(key, zone, ts)
+            return None
+
+        # ALERT / PENDING_CLEAR
+        if missing != previous_missing:
+            self._push(key, zone)
+        if self._is_recovered(stock, missing):
+            if state == ALERT:
+                zone.state, zone.since = PENDING_CLEAR, ts
+            if ts - zone.since >= self.clear_after:
+                return self._clear(key, zone, ts)
+        elif state == PENDING_CLEAR:
+            zone.state = ALERT
+        return None
+
+    def update_many(self, observations: Iterable[tuple]) -> list[AlertEvent]:
+        """Batch form of ``update`` for ``(key, stock, missing, ts[, blocked])`` tuples."""
+        update = self.update
+        events = []
+        for observation in observations:
+            event = update(*observation)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _raise(self, key: Hashable, zone: _ZoneState, ts: float) -> AlertEvent:
+        zone.state = ALERT
+        zone.short_since = zone.since
+        self._active += 1
+        self._push(key, zone)
+        return AlertEvent(key, "raised", ts, zone.stock, zone.missing, zone.short_since)
+
+    def _clear(self, key: Hashable, zone: _ZoneState, ts: float) -> AlertEvent:
+        zone.state = OK
+        zone.version += 1  # invalidates its heap entries
+        self._active -= 1
+        return AlertEvent(key, "cleared", ts, zone.stock, zone.missing, zone.since)
+
+    def is_alerting(self, key: Hashable) -> bool:
+        zone = self.zones.get(key)
+        return zone is not None and zone.state in (ALERT, PENDING_CLEAR)
+
+    def _valid(self, entry: tuple[float, int, Hashable]) -> bool:
+        zone = self.zones.get(entry[2])
+        return zone is not None and zone.version == entry[1] and zone.state in (ALERT, PENDING_CLEAR)
+
+    def restock_queue(self, limit: int | None = None) -> list[RestockItem]:
+        """Active alerts, most urgent first (more missing slots, then short for longer)."""
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+        count = self._active if limit is None else min(limit, self._active)
+        entries = heapq.nsmallest(count, (entry for entry in heap if self._valid(entry)))
+        return [
+            RestockItem(key, zone.missing, zone.stock, zone.short_since)
+            for _, _, key in entries
+            for zone in (self.zones[key],)
+        ]
+
+    def pop(self) -> RestockItem | None:
+        """Take the most urgent zone off the queue (e.g. dispatched to staff); it stays alerting."""
+        heap = self._heap
+        while heap:
+            entry = heapq.heappop(heap)
+            if self._valid(entry):
+                zone = self.zones[entry[2]]
+                zone.version += 1
+                return RestockItem(entry[2], zone.missing, zone.stock, zone.short_since)
+        return None
+
+    def _sweep(self, now: float) -> None:
+        """Forget idle zones and drop stale heap entries so memory tracks live zones only."""
+        cutoff = now - self.idle_ttl
+        idle = [key for key, zone in self.zones.items() if zone.last_seen < cutoff and zone.state in (OK, PENDING_RAISE)]
+        for key in idle:
+            del self.zones[key]
+        if len(self._heap) > 2 * self._active + 1024:
+            self._heap = [entry for entry in self._heap if self._valid(entry)]
+            heapq.heapify(self._heap)
+
+    def stats(self) -> dict[str, int]:
+        return {"zones": len(self.zones), "alerting": self._active, "heap": len(self._heap), "updates": self._updates}
@@ -0,0 +1,203 @@
+"""Vectorized 1-D clustering of detection boxes into shelf rows."""
+from __future__ import annotations
+
+from typing import Iterable
+
+import numpy as np
+
+
+def box_centers(boxes) -> tuple[np.ndarray, np.ndarray]:
+    """Return ``(center_x, center_y)`` arrays for ``x1, y1, x2, y2, ...`` rows."""
+    data = np.asarray(boxes, dtype=np.float64)
+    if data.size == 0:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty
+    return (data[:, 0] + data[:, 2]) / 2, (data[:, 1] + data[:, 3]) / 2
+
+
+def split_by_gaps(values, threshold: float) -> np.ndarray:
+    """Label 1-D ``values`` so that sorted neighbours closer than ``threshold`` share a label.
+
+    Labels are dense and increase with value (label 0 is the smallest
+    cluster), so the result does not depend on the input order.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return np.empty(0, dtype=np.intp)
+    order = np.argsort(values, kind="stable")
+    breaks = np.diff(values[order]) > threshold
+    sorted_labels = np.concatenate(([0], np.cumsum(breaks)))
+    labels = np.empty(values.size, dtype=np.intp)
+    labels[order] = sorted_labels
+    return labels
+
+
+def auto_threshold(boxes, ratio: float = 0.5) -> float:
+    """Pick a row-split threshold from the median box height."""
+    data = np.asarray(boxes, dtype=np.float64)
+    if data.size == 0:
+        return 0.0
+    heights = data[:, 3] - data[:, 1]
+    return float(np.median(heights) * ratio)
+
+
+def cluster_centers(values, labels: np.ndarray) -> np.ndarray:
+    """Return the mean value per label (labels must be dense, starting at 0)."""
+    if labels.size == 0:
+        return np.empty(0, dtype=np.float64)
+    counts = np.bincount(labels)
+    return np.bincount(labels, weights=np.asarray(values, dtype=np.float64)) / np.maximum(counts, 1)
+
+
+def group_by_label(boxes: list, center_y: np.ndarray, labels: np.ndarray) -> list[list]:
+    """Group ``boxes`` into rows ordered by label, each row sorted by center-y."""
+    if labels.size == 0:
+        return []
+    order = np.lexsort((center_y, labels))
+    bounds = (np.flatnonzero(np.diff(labels[order])) + 1).tolist()
+    ordered = [boxes[i] for i in order.tolist()]
+    return [ordered[start:end] for start, end in zip([0] + bounds, bounds + [len(ordered)])]
+
+
+def cluster_rows(boxes: Iterable, y_threshold: float) -> list[list]:
+    """Group boxes into rows by splitting sorted center-y values at gaps > ``y_threshold``.
+
+    Stateless and independent of input order; use :class:`RowTracker` to
+    keep row assignments stable across frames.
+    """
+    box_list = list(boxes)
+    if not box_list:
+        return []
+    _, center_y = box_centers(box_list)
+    return group_by_label(box_list, center_y, split_by_gaps(center_y, y_threshold))
+
+
+class RowTracker:
+    """Clusters boxes into rows, warm-started from the rows seen in previous frames.
+
+    Each box is first matched to the nearest known row center (binary search
+    over the sorted centers); only unmatched boxes go through gap splitting
+    to open new rows. Centers are smoothed across frames and a row survives
+    ``max_missed`` empty frames, so row assignments stay stable while
+    customers briefly occlude part of the shelf.
+
+    Labels are dense over the rows present in a frame, so they shift when a
+    row above empties. ``frame_ids`` gives the persistent id of each label
+    of the last frame instead. Ids are handed out top to bottom as rows
+    appear, and a merged row keeps the older id.
+    """
+
+    def __init__(self, y_threshold: float, smoothing: float = 0.3, max_missed: int = 30):
+        self.y_threshold = float(y_threshold)
+        self.smoothing = smoothing
+        self.max_missed = max_missed
+        self.reset()
+
+    def reset(self) -> None:
+        self.centers = np.empty(0, dtype=np.float64)
+        self.missed = np.empty(0, dtype=np.int64)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.frame_ids = np.empty(0, dtype=np.int64)
+        self._next_id = 0
+
+    def assign(self, center_y: np.ndarray) -> np.ndarray:
+        """Return dense row labels (0 = top row) for ``center_y`` and update the tracked rows."""
+        center_y = np.asarray(center_y, dtype=np.float64)
+        known = self.centers.size
+        labels = np.full(center_y.size, -1, dtype=np.intp)
+
+        if known and center_y.size:
+            # self.centers is kept sorted, so neighbours come from one searchsorted
+            right = np.minimum(np.searchsorted(self.centers, center_y), known - 1)
+            left = np.maximum(right - 1, 0)
+            use_left = np.abs(center_y - self.centers[left]) <= np.abs(center_y - self.centers[right])
+            nearest = np.where(use_left, left, right)
+            matched = np.abs(center_y - self.centers[nearest]) <= self.y_threshold
+            if matched.all():
+                steady = self._assign_known(center_y, nearest)
+                if steady is not None:
+                    return steady
+            labels[matched] = nearest[matched]
+
+        unmatched = labels < 0
+        if unmatched.any():
+            labels[unmatched] = known + split_by_gaps(center_y[unmatched], self.y_threshold)
+
+        # Known rows without boxes this frame still count, even below the highest label
+        total = max(int(labels.max()) + 1, known) if labels.size else known
+        counts = np.bincount(labels, minlength=total)
+        sums = np.bincount(labels, weights=center_y, minlength=total)
+        observed = sums / np.maximum(counts, 1)
+        seen = counts > 0
+
+        centers = np.concatenate((self.centers, observed[known:]))
+        missed = np.concatenate((self.missed, np.zeros(total - known, dtype=np.int64)))
+        # split_by_gaps labels new rows top to bottom, so their ids follow that order
+        ids = np.concatenate((self.ids, np.arange(self._next_id, self._next_id + total - known)))
+        self._next_id += total - known
+        old_seen = seen[:known]
+        centers[:known][old_seen] += self.smoothing * (observed[:known][old_seen] - self.centers[old_seen])
+        missed[seen] = 0
+        missed[~seen] += 1
+
+        # Drop rows that stayed empty too long, then merge rows whose centers drifted together
+        alive = missed <= self.max_missed
+        order = np.argsort(centers, kind="stable")
+        order = order[alive[order]]
+        merged = np.concatenate(([0], np.cumsum(np.diff(centers[order]) > self.y_threshold)))
+        remap = np.full(total, -1, dtype=np.intp)
+        remap[order] = merged
+        if merged.size and merged[-1] + 1 < order.size:
+            weights = np.maximum(counts[order], 1)
+            self.centers = np.bincount(merged, weights=centers[order] * weights) / np.bincount(merged, weights=weights)
+            merged_missed = np.full(merged[-1] + 1, np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(merged_missed, merged, missed[order])
+            self.missed = merged_missed
+            merged_ids = np.full(merged[-1] + 1, np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(merged_ids, merged, ids[order])
+            self.ids = merged_ids
+        else:
+            self.centers = centers[order]
+            self.missed = missed[order]
+            self.ids = ids[order]
+
+        if not labels.size:
+            self.frame_ids = np.empty(0, dtype=np.int64)
+            return labels
+        # Report dense labels (top to bottom) over the rows present in this frame only
+        row_ids = remap[labels]
+        present = np.zeros(int(merged[-1]) + 1, dtype=bool)
+        present[row_ids] = True
+        self.frame_ids = self.ids[present]
+        return (np.cumsum(present) - 1)[row_ids]
+
+    def _assign_known(self, center_y: np.ndarray, nearest: np.ndarray) -> np.ndarray | None:
+        """Every box matched a tracked row: update in place, or ``None`` when rows would drop or merge."""
+        known = self.centers.size
+        counts = np.bincount(nearest, minlength=known)
+        sums = np.bincount(nearest, weights=center_y, minlength=known)
+        seen = counts > 0
+        centers = self.centers + self.smoothing * np.where(seen, sums / np.maximum(counts, 1) - self.centers, 0.0)
+        missed = np.where(seen, 0, self.missed + 1)
+        if (missed > self.max_missed).any() or (np.diff(centers) <= self.y_threshold).any():
+            return None  # the general path drops / merges / re-sorts rows
+        self.centers, self.missed = centers, missed
+        if seen.all():
+            self.frame_ids = self.ids
+            return nearest
+        self.frame_ids = self.ids[seen]
+        return (np.cumsum(seen) - 1)[nearest]
+
+    def update(self, boxes) -> list[list]:
+        """Cluster ``boxes`` into rows (top to bottom) using and refreshing the tracked rows.
+
+        ``frame_ids[i]`` is the persistent id of row ``i`` of the result.
+        """
+        box_list = list(boxes)
+        if not box_list:
+            self.assign(np.empty(0))
+            return []
+        # One pass over the tuples is cheaper than converting the whole box list to an array
+        center_y = np.fromiter(((box[1] + box[3]) * 0.5 for box in box_list), dtype=np.float64, count=len(box_list))
+        labels = self.assign(center_y)
+        return group_by_label(box_list, center_y, labels)
@@ -0,0 +1,58 @@
+"""Cold-start timeline for the edge entry points.
+
+``StartupTimeline`` records named steps from process start to the first
+published result so restart-to-first-publish regressions show up in the log::
+
+    [startup] imports 0.31s | config 0.01s | capture 0.42s | model 1.95s | warmup 0.88s | first frame 0.06s -> 3.63s total
+"""
+from __future__ import annotations
+
+import os
+import time
+
+
+def process_age() -> float | None:
+    """Seconds since this process was started (Linux only), i.e. including interpreter and import time."""
+    try:
+        with open("/proc/self/stat", "r", encoding="ascii") as f:
+            # Field 22 (after the parenthesised comm, which may contain spaces) is the start time in ticks
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", "r", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+        return max(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 0.0)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupTimeline:
+    """Named wall-clock steps; steps running concurrently are recorded when they are awaited."""
+
+    def __init__(self, tag: str = "startup", since_process_start: bool = True):
+        self.tag = tag
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.steps: list[tuple[str, float]] = []
+        age = process_age() if since_process_start else None
+        if age is not None:
+            # Everything before the timeline was created: interpreter start-up and module imports
+            self.started -= age
+            self.steps.append(("imports", age))
+
+    def mark(self, step: str) -> float:
+        """Close ``step`` at the current time and return its duration."""
+        now = time.perf_counter()
+        duration = now - self.last
+        self.steps.append((step, duration))
+        self.last = now
+        return duration
+
+    @property
+    def total(self) -> float:
+        return self.last - self.started
+
+    def summary(self) -> str:
+        parts = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.steps)
+        return f"{parts} -> {self.total:.2f}s total"
+
+    def report(self) -> None:
+        print(f"[{self.tag}] {self.summary()}")
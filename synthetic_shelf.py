@@ -0,0 +1,297 @@
+"""Synthetic shelf footage with ground truth, for benchmarking the zone / gap / occlusion pipeline at scale.
+
+A shelf is rows of product slots split into zones. Products sell out and
+get restocked at random, and person-sized occluders walk past. Every frame
+produces the true shelf state and a noisy detector output (jittered boxes,
+random misses, nothing inside an occluder). Optionally it is also rendered
+as a BGR image. State updates and detections are NumPy operations over all
+slots, so a few hundred slots stream at thousands of frames per second::
+
+    python synthetic_shelf.py --out synthetic/ --frames 3000 --products 500 --zones 200 --occluders 3
+    python zone_monitor.py --config synthetic/config.json --replay synthetic/detections.detlog \\
+        --headless --results synthetic/pred.jsonl
+
+The output directory holds:
+
+- ``config.json``: the zones, in the format ``zone_monitor`` reads.
+- ``detections.detlog``: the noisy detector stream, replayable with ``--replay``.
+- ``truth.detlog``: the present product boxes, one record per frame.
+- ``truth.jsonl``: per-zone stock / missing / blocked in the same format as
+  ``zone_monitor --results``, so the two files can be compared line by line.
+- ``shelf.mp4``: the rendered frames, only with ``--video``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+from detection_log import DetectionRecorder
+from zone_config import ZoneConfig, build_config, save_zone_config
+
+BLOCKED_COVERAGE = 0.3      # a zone counts as blocked when an occluder covers this much of it
+SLOT_FILL = 0.85            # product width as a fraction of its slot
+ROW_FILL = 0.8              # product height as a fraction of the row pitch
+
+BACKGROUND_COLOR = (60, 60, 60)
+SHELF_COLOR = (40, 90, 140)
+OCCLUDER_COLOR = (150, 120, 100)
+
+
+@dataclass(frozen=True)
+class ShelfSpec:
+    width: int = 1080
+    height: int = 1920
+    rows: int = 10
+    products: int = 500         # slots in total, spread evenly over the rows
+    zones: int = 200            # spread evenly over the rows
+    empty_ratio: float = 0.1    # initial fraction of empty slots
+    sell_rate: float = 0.002    # chance per frame that a stocked slot sells out
+    restock_rate: float = 0.004 # chance per frame that an empty slot is refilled
+    occluders: int = 2
+    occluder_speed: float = 12.0  # px / frame
+    jitter: float = 2.0         # detector box noise (px, std)
+    miss_rate: float = 0.02     # chance that a visible product is not detected
+    fps: float = 30.0
+    seed: int = 0
+
+
+@dataclass(frozen=True)
+class SyntheticFrame:
+    index: int
+    present: np.ndarray         # (S,) bool, true slot state
+    occluders: np.ndarray       # (M, 4) int boxes
+    detections: np.ndarray      # (N, 6) float32, boxes.data layout
+    zone_stock: np.ndarray      # (Z,) true products per zone
+    zone_missing: np.ndarray    # (Z,) true empty slots per zone
+    zone_blocked: np.ndarray    # (Z,) bool
+
+
+class SyntheticShelf:
+    def __init__(self, spec: ShelfSpec = ShelfSpec()):
+        if spec.products < spec.rows or spec.zones < spec.rows:
+            raise ValueError("Need at least one product and one zone per row")
+        self.spec = spec
+        self.rng = np.random.default_rng(spec.seed)
+        self._build_layout()
+        self.present = self.rng.random(len(self.slots)) >= spec.empty_ratio
+        self.index = -1
+        # Each occluder walks its own lane back and forth across the frame, with a random phase
+        count = spec.occluders
+        self._occ_w = (self.rng.uniform(0.2, 0.3, count) * spec.width).astype(int)
+        self._occ_h = (self.rng.uniform(0.4, 0.6, count) * spec.height).astype(int)
+        self._occ_y = (self.rng.random(count) * (spec.height - self._occ_h)).astype(int)
+        self._occ_phase = self.rng.random(count) * 2 * (spec.width + self._occ_w)
+        self._canvas: np.ndarray | None = None
+
+    def _build_layout(self) -> None:
+        spec = self.spec
+        per_row = spec.products // spec.rows
+        zones_per_row = min(spec.zones // spec.rows, per_row)
+        pitch_y = spec.height / spec.rows
+        pitch_x = spec.width / per_row
+        rows, cols = np.divmod(np.arange(per_row * spec.rows), per_row)
+        slot_x1 = cols * pitch_x
+        slot_y1 = rows * pitch_y
+        self.slot_boxes = np.stack([slot_x1, slot_y1, slot_x1 + pitch_x, slot_y1 + pitch_y], axis=1)
+        pad_x = pitch_x * (1 - SLOT_FILL) / 2
+        pad_y = pitch_y * (1 - ROW_FILL)
+        # Products stand on the shelf: bottom-aligned in their slot
+        self.slots = np.stack(
+            [slot_x1 + pad_x, slot_y1 + pad_y, slot_x1 + pitch_x - pad_x, slot_y1 + pitch_y], axis=1
+        ).astype(np.float32)
+
+        # Zones: consecutive slots of one row, each zone spanning whole slots
+        bounds = np.linspace(0, per_row, zones_per_row + 1).round().astype(int)
+        zone_of_col = np.searchsorted(bounds, np.arange(per_row), side="right") - 1
+        self.slot_zone = rows * zones_per_row + zone_of_col[cols]
+        zone_rows, zone_cols = np.divmod(np.arange(spec.rows * zones_per_row), zones_per_row)
+        self.zone_coords = np.stack(
+            [
+                bounds[zone_cols] * pitch_x,
+                zone_rows * pitch_y,
+                bounds[zone_cols + 1] * pitch_x,
+                (zone_rows + 1) * pitch_y,
+            ],
+            axis=1,
+        ).round().astype(int)
+        self.zone_capacity = np.bincount(self.slot_zone, minlength=len(self.zone_coords))
+
+    def config(self) -> ZoneConfig:
+        zones = [
+            {"id": f"zone_{i + 1}", "product": f"SKU_{i + 1:04d}", "coords": coords.tolist()}
+            for i, coords in enumerate(self.zone_coords)
+        ]
+        return build_config(zones, (self.spec.width, self.spec.height), description="Synthetic shelf")
+
+    def _occluder_boxes(self, index: int) -> np.ndarray:
+        spec = self.spec
+        span = spec.width + self._occ_w
+        position = (index * spec.occluder_speed + self._occ_phase) % (2 * span)
+        x1 = np.where(position < span, position, 2 * span - position) - self._occ_w
+        boxes = np.stack([x1, self._occ_y, x1 + self._occ_w, self._occ_y + self._occ_h], axis=1)
+        return np.clip(boxes, 0, [spec.width, spec.height, spec.width, spec.height]).astype(int)
+
+    def _zone_coverage(self, occluders: np.ndarray) -> np.ndarray:
+        zones = self.zone_coords
+        if not len(occluders):
+            return np.zeros(len(zones))
+        ix = np.clip(
+            np.minimum(zones[:, None, 2], occluders[None, :, 2]) - np.maximum(zones[:, None, 0], occluders[None, :, 0]), 0, None
+        )
+        iy = np.clip(
+            np.minimum(zones[:, None, 3], occluders[None, :, 3]) - np.maximum(zones[:, None, 1], occluders[None, :, 1]), 0, None
+        )
+        area = (zones[:, 2] - zones[:, 0]) * (zones[:, 3] - zones[:, 1])
+        # Occluders rarely overlap each other, so summing their coverage is close enough
+        return (ix * iy).sum(axis=1) / np.maximum(area, 1)
+
+    def step(self) -> SyntheticFrame:
+        spec, rng = self.spec, self.rng
+        self.index += 1
+        if self.index:
+            draw = rng.random(len(self.present))
+            self.present = np.where(self.present, draw >= spec.sell_rate, draw < spec.restock_rate)
+        occluders = self._occluder_boxes(self.index)
+
+        slots = self.slots
+        cx = (slots[:, 0] + slots[:, 2]) / 2
+        cy = (slots[:, 1] + slots[:, 3]) / 2
+        hidden = np.zeros(len(slots), dtype=bool)
+        for ox1, oy1, ox2, oy2 in occluders:
+            hidden |= (cx >= ox1) & (cx <= ox2) & (cy >= oy1) & (cy <= oy2)
+        detected = self.present & ~hidden & (rng.random(len(slots)) >= spec.miss_rate)
+        boxes = slots[detected] + rng.normal(0, spec.jitter, (int(detected.sum()), 4)).astype(np.float32)
+        detections = np.empty((len(boxes), 6), dtype=np.float32)
+        detections[:, :4] = boxes
+        detections[:, 4] = rng.uniform(0.5, 0.95, len(boxes))
+        detections[:, 5] = 0
+
+        stock = np.bincount(self.slot_zone, weights=self.present, minlength=len(self.zone_coords)).astype(int)
+        return SyntheticFrame(
+            index=self.index,
+            present=self.present.copy(),
+            occluders=occluders,
+            detections=detections,
+            zone_stock=stock,
+            zone_missing=self.zone_capacity - stock,
+            zone_blocked=self._zone_coverage(occluders) >= BLOCKED_COVERAGE,
+        )
+
+    def render(self, frame: SyntheticFrame) -> np.ndarray:
+        """BGR image of ``frame``; only the slots that changed since the last call are repainted."""
+        spec = self.spec
+        if self._canvas is None:
+            self._shelf = np.empty((spec.height, spec.width, 3), dtype=np.uint8)
+            self._shelf[:] = BACKGROUND_COLOR
+            for y in np.unique(self.slot_boxes[:, 3]).astype(int):
+                self._shelf[max(y - 6, 0) : y] = SHELF_COLOR
+            self._colors = self.rng.integers(40, 255, (len(self.slots), 3), dtype=np.uint8)
+            self._painted = np.zeros(len(self.slots), dtype=bool)
+            self._base = self._shelf.copy()
+            self._canvas = np.empty_like(self._base)
+        boxes = self.slots.astype(int)
+        for i in np.flatnonzero(frame.present != self._painted):
+            x1, y1, x2, y2 = boxes[i]
+            region = (slice(y1, y2), slice(x1, x2))
+            self._base[region] = self._colors[i] if frame.present[i] else self._shelf[region]
+        self._painted = frame.present.copy()
+        np.copyto(self._canvas, self._base)
+        for x1, y1, x2, y2 in frame.occluders:
+            self._canvas[y1:y2, x1:x2] = OCCLUDER_COLOR
+        return self._canvas
+
+    def truth_record(self, frame: SyntheticFrame, zone_ids: list[str]) -> dict:
+        """Ground truth in the ``zone_monitor --results`` line format."""
+        stock, missing, blocked = frame.zone_stock.tolist(), frame.zone_missing.tolist(), frame.zone_blocked.tolist()
+        return {
+            "frame": frame.index,
+            "ts": round(frame.index / self.spec.fps, 3),
+            "zones": {
+                zid: {"stock": stock[i], "missing": missing[i], "blocked": blocked[i]}
+                for i, zid in enumerate(zone_ids)
+            },
+        }
+
+
+def write_dataset(spec: ShelfSpec, frames: int, out_dir: Path, video: bool = False) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    shelf = SyntheticShelf(spec)
+    config = shelf.config()
+    save_zone_config(config, out_dir / "config.json")
+    metadata = {"source": "synthetic_shelf", "names": {0: "product"}, "spec": asdict(spec)}
+    detections_log = DetectionRecorder(out_dir / "detections.detlog", spec.width, spec.height, spec.fps, metadata)
+    truth_log = DetectionRecorder(out_dir / "truth.detlog", spec.width, spec.height, spec.fps, metadata)
+    writer = None
+    if video:
+        import cv2
+
+        writer = cv2.VideoWriter(str(out_dir / "shelf.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), spec.fps, (spec.width, spec.height))
+
+    truth_rows = np.empty((len(shelf.slots), 6), dtype=np.float32)
+    truth_rows[:, :4] = shelf.slots
+    truth_rows[:, 4:] = (1.0, 0.0)
+    zone_ids = list(config.ids)
+    started = time.perf_counter()
+    with open(out_dir / "truth.jsonl", "w", encoding="utf-8") as truth_file:
+        for _ in range(frames):
+            frame = shelf.step()
+            ts = frame.index / spec.fps
+            detections_log.append(frame.index, ts, frame.detections)
+            truth_log.append(frame.index, ts, truth_rows[frame.present])
+            truth_file.write(json.dumps(shelf.truth_record(frame, zone_ids)) + "\n")
+            if writer is not None:
+                writer.write(shelf.render(frame))
+    elapsed = time.perf_counter() - started
+    detections_log.close()
+    truth_log.close()
+    if writer is not None:
+        writer.release()
+    print(
+        f"[synthetic] {frames} frames, {len(shelf.slots)} slots, {len(zone_ids)} zones, "
+        f"{spec.occluders} occluders in {elapsed:.1f}s ({frames / elapsed:.0f} fps) -> {out_dir}"
+    )
+
+
+def main() -> None:
+    defaults = ShelfSpec()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, default=Path("synthetic"))
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--width", type=int, default=defaults.width)
+    parser.add_argument("--height", type=int, default=defaults.height)
+    parser.add_argument("--rows", type=int, default=defaults.rows)
+    parser.add_argument("--products", type=int, default=defaults.products)
+    parser.add_argument("--zones", type=int, default=defaults.zones)
+    parser.add_argument("--empty-ratio", type=float, default=defaults.empty_ratio)
+    parser.add_argument("--sell-rate", type=float, default=defaults.sell_rate)
+    parser.add_argument("--restock-rate", type=float, default=defaults.restock_rate)
+    parser.add_argument("--occluders", type=int, default=defaults.occluders)
+    parser.add_argument("--jitter", type=float, default=defaults.jitter)
+    parser.add_argument("--miss-rate", type=float, default=defaults.miss_rate)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--video", action="store_true", help="also render shelf.mp4 (much slower)")
+    args = parser.parse_args()
+    spec = ShelfSpec(
+        width=args.width,
+        height=args.height,
+        rows=args.rows,
+        products=args.products,
+        zones=args.zones,
+        empty_ratio=args.empty_ratio,
+        sell_rate=args.sell_rate,
+        restock_rate=args.restock_rate,
+        occluders=args.occluders,
+        jitter=args.jitter,
+        miss_rate=args.miss_rate,
+        seed=args.seed,
+    )
+    write_dataset(spec, args.frames, args.out, video=args.video)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""detection_log: write / read round trip with zone masks, torn records, v1 logs and replay.
+
+    python -m pytest test_detection_log.py
+"""
+from __future__ import annotations
+
+import struct
+
+import numpy as np
+import pytest
+
+from detection_log import (
+    COMMITTED_OFFSET, DetectionLog, DetectionLogError, DetectionRecorder, ReplayCapture, ReplayDetector,
+)
+
+ZONES = 70  # more than 64, so a mask spans two 8-byte words
+
+
+def synthetic_frames(count: int = 50, seed: int = 2) -> list[tuple]:
+    """``(frame, ts, detections, zones)`` with empty frames, all-zone frames and partial masks."""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i in range(count):
+        n = 0 if i % 7 == 3 else int(rng.integers(1, 40))
+        detections = rng.random((n, 6), dtype=np.float32) * 1000
+        if i % 3 == 0:
+            zones = None
+        elif i % 3 == 1:
+            zones = np.ones(ZONES, dtype=bool)           # every zone: stored without a mask
+        else:
+            zones = rng.random(ZONES) < 0.3
+        frames.append((i * 2, i / 15.0, detections, zones))
+    return frames
+
+
+def write_log(path, frames: list[tuple]) -> None:
+    with DetectionRecorder(path, 1920, 1080, 15.0, {"names": {0: "product"}, "source": "shelf.mp4"}) as recorder:
+        for frame, ts, detections, zones in frames:
+            recorder.append(frame, ts, detections, zones=zones)
+
+
+def test_round_trip(tmp_path) -> None:
+    frames = synthetic_frames()
+    write_log(tmp_path / "run.detlog", frames)
+    log = DetectionLog(tmp_path / "run.detlog")
+    assert (log.width, log.height, log.fps, len(log)) == (1920, 1080, 15.0, len(frames))
+    assert log.names == {0: "product"} and log.metadata["source"] == "shelf.mp4"
+    for i, ((frame, ts, detections, zones), (got_frame, got_ts, got)) in enumerate(zip(frames, log)):
+        assert (got_frame, got_ts) == (frame, ts)
+        np.testing.assert_array_equal(got, detections)
+        mask = log.zones(i, ZONES)
+        if zones is None or zones.all():
+            assert mask is None
+        else:
+            np.testing.assert_array_equal(mask, zones)
+    log.close()
+
+
+def test_reader_follows_a_live_log_and_ignores_torn_records(tmp_path) -> None:
+    path = tmp_path / "live.detlog"
+    recorder = DetectionRecorder(path, 640, 480, 30.0)
+    recorder.append(0, 0.0, np.ones((3, 6)))
+    recorder.append(1, 0.1, np.ones((2, 6)), zones=np.array([True, False, True]))
+    log = DetectionLog(path)  # the file is still preallocated: only committed records count
+    assert len(log) == 2
+    np.testing.assert_array_equal(log.zones(1, 3), [True, False, True])
+    log.close()
+    recorder.close()
+
+    # A commit pointer past the end of a truncated file keeps the complete records only
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<Q", data, COMMITTED_OFFSET, len(data) + 1000)
+    path.write_bytes(bytes(data[:-10]))
+    log = DetectionLog(path)
+    assert len(log) == 1 and len(log.detections(0)) == 3
+    log.close()
+
+
+def test_version_1_logs_read_without_masks(tmp_path) -> None:
+    path = tmp_path / "v1.detlog"
+    write_log(path, [(frame, ts, detections, None) for frame, ts, detections, _ in synthetic_frames(10)])
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<I", data, 8, 1)
+    path.write_bytes(bytes(data))
+    log = DetectionLog(path)
+    assert len(log) == 10 and log.zones(5, ZONES) is None
+    log.close()
+
+
+def test_rejects_other_files(tmp_path) -> None:
+    (tmp_path / "short").write_bytes(b"SHDETLOG")
+    (tmp_path / "other").write_bytes(b"\0" * 128)
+    for name in ("short", "other"):
+        with pytest.raises(DetectionLogError):
+            DetectionLog(tmp_path / name)
+
+
+def test_replay_detector_and_capture(tmp_path) -> None:
+    frames = synthetic_frames(6)
+    write_log(tmp_path / "run.detlog", frames)
+
+    detector = ReplayDetector(tmp_path / "run.detlog", loop=True)
+    for frame, _, detections, _ in frames + frames[:1]:
+        np.testing.assert_array_equal(detector(conf=500), detections[detections[:, 4] >= 500])
+
+    capture = ReplayCapture(DetectionLog(tmp_path / "run.detlog"))
+    assert capture.zones(ZONES) is None  # nothing read yet
+    for frame, _, _, zones in frames:
+        ok, image = capture.read()
+        assert ok and image.shape == (1080, 1920, 3) and not image.any()
+        mask = capture.zones(ZONES)
+        assert (mask is None) if zones is None or zones.all() else np.array_equal(mask, zones)
+    assert capture.read() == (False, None) and not capture.isOpened()
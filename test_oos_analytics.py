@@ -0,0 +1,120 @@
+"""oos_analytics against a frame-by-frame reference, at chunk sizes that split episodes across chunks.
+
+    python -m pytest test_oos_analytics.py
+"""
+from __future__ import annotations
+
+import math
+import random
+
+import pytest
+
+from oos_analytics import MAX_GAP_SECONDS, OosAccumulator
+
+ZONES = [f"zone_{i}" for i in range(6)]
+
+
+def synthetic_records(frames: int = 3000, seed: int = 1) -> list[dict]:
+    """Blocked frames, frame gaps past ``max_gap``, a zone that appears late and one that drops out."""
+    rng = random.Random(seed)
+    records, ts = [], 0.0
+    for frame in range(frames):
+        ts += rng.choice([0.1, 0.2, 0.3, 7.0]) if rng.random() < 0.03 else 0.1
+        if frame < 500:
+            zones = ZONES[:3]
+        else:
+            zones = ZONES if rng.random() > 0.05 else ZONES[1:]
+        records.append({
+            "frame": frame,
+            "ts": ts,
+            "zones": {
+                zone: {
+                    "stock": rng.choice([0, 0, 1, 2]) if rng.random() < 0.3 else 3,
+                    "missing": rng.choice([0, 1]),
+                    "blocked": rng.random() < 0.1,
+                }
+                for zone in zones
+            },
+        })
+    return records
+
+
+def reference(records: list[dict], oos: str, max_gap: float = MAX_GAP_SECONDS) -> dict[str, tuple]:
+    """The same statistics, one zone and one frame at a time."""
+    stats = {}
+    for zone in ZONES:
+        state = False
+        prev_ts, prev_present, prev_blocked = None, False, False
+        frames, observed, oos_time, blocked_time, episodes = 0, 0.0, 0.0, 0.0, 0
+        restocks, start = [], None
+        for record in records:
+            if prev_ts is not None and prev_present:
+                dt = record["ts"] - prev_ts
+                dt = dt if 0 <= dt <= max_gap else 0.0
+                observed += dt
+                oos_time += dt * state
+                blocked_time += dt * prev_blocked
+            result = record["zones"].get(zone)
+            if result is not None:
+                frames += 1
+                if not result["blocked"]:
+                    value = result["stock"] == 0 if oos == "empty" else result["missing"] > 0
+                    if value and not state:
+                        episodes += 1
+                        start = oos_time
+                    elif state and not value:
+                        restocks.append(oos_time - start)
+                    state = value
+            prev_ts, prev_present = record["ts"], result is not None
+            prev_blocked = result is not None and result["blocked"]
+        if not frames:
+            continue
+        stats[zone] = (
+            frames, observed, oos_time, blocked_time, episodes, len(restocks),
+            sum(restocks) / len(restocks) if restocks else None,
+            max(restocks) if restocks else None,
+            oos_time - start if state else None,
+        )
+    return stats
+
+
+def accumulate(records: list[dict], oos: str, chunk: int) -> dict[str, tuple]:
+    accumulator = OosAccumulator("cam", oos=oos, chunk=chunk)
+    accumulator.add(records)
+    return {
+        row.zone: (
+            row.frames, row.observed_s, row.oos_s, row.blocked_s, row.episodes, row.restocks,
+            row.mean_restock_s, row.max_restock_s, row.open_episode_s,
+        )
+        for row in accumulator.results()
+    }
+
+
+def assert_close(actual: dict[str, tuple], expected: dict[str, tuple]) -> None:
+    assert actual.keys() == expected.keys()
+    for zone, values in expected.items():
+        for got, want in zip(actual[zone], values):
+            if want is None:
+                assert got is None, zone
+            else:
+                assert math.isclose(got, want, rel_tol=1e-9, abs_tol=1e-6), (zone, actual[zone], values)
+
+
+@pytest.mark.parametrize("oos", ["empty", "missing"])
+@pytest.mark.parametrize("chunk", [1, 7, 500, 1_000_000])
+def test_matches_reference(oos: str, chunk: int) -> None:
+    records = synthetic_records()
+    assert_close(accumulate(records, oos, chunk), reference(records, oos))
+
+
+def test_episode_spanning_chunks_and_blocked_frames() -> None:
+    def frame(ts: float, stock: int, blocked: bool = False) -> dict:
+        return {"frame": int(ts), "ts": ts, "zones": {"z": {"stock": stock, "missing": 0, "blocked": blocked}}}
+
+    # Empty from t=1 to t=4: the customer in front at t=2..3 neither ends nor splits the episode
+    records = [frame(0, 2), frame(1, 0), frame(2, 3, blocked=True), frame(3, 3, blocked=True), frame(4, 2), frame(5, 2)]
+    for chunk in (1, 2, 3, 100):
+        accumulator = OosAccumulator("cam", chunk=chunk)
+        accumulator.add(records)
+        (row,) = accumulator.results()
+        assert (row.episodes, row.restocks, row.oos_s, row.max_restock_s, row.blocked_s) == (1, 1, 3.0, 3.0, 2.0)
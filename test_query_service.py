@@ -0,0 +1,128 @@
+"""query_service: payload shapes, ShelfStateTable versions / empty index, and ETags over HTTP.
+
+    python -m pytest test_query_service.py
+"""
+from __future__ import annotations
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from query_service import QueryServer, ShelfStateTable, history_summary, zone_updates
+from zone_history import ZoneHistoryStore
+
+
+@pytest.mark.parametrize("payload, updates", [
+    # inference_yolo10 / load_generator: counts, device-level occlusion
+    ({"details": {"Row_1": 4, "Row_2": "x"}}, [("Row_1", 4, None, False)]),
+    ({"status": "Blocked", "details": {"Row_1": 3}}, [("Row_1", 3, None, True)]),
+    # zone_monitor
+    ({"details": {"A": {"stock": 5, "missing": 1}, "B": {"status": "blocked"}}},
+     [("A", 5, 1, False), ("B", None, None, True)]),
+    # mock_edge
+    ({"product_id": "P1", "current_stock": 2, "empty_slots": 3}, [("P1", 2, 3, False)]),
+    ({"count": -1}, [("Zone A", 0, None, False)]),
+    ({"details": {}}, []),
+])
+def test_zone_updates(payload: dict, updates: list[tuple]) -> None:
+    assert zone_updates(payload) == updates
+
+
+def payload(device: str, **zones) -> dict:
+    return {"device_id": device, "details": {zone: value for zone, value in zones.items()}}
+
+
+def test_version_moves_only_on_change() -> None:
+    table = ShelfStateTable()
+    assert table.update(payload("cam1", A={"stock": 3, "missing": 0}, B={"stock": 0, "missing": 4}), 10) == 2
+    assert table.version == 2
+    assert table.update(payload("cam1", A={"stock": 3, "missing": 0}), 11) == 0   # same state: ts only
+    assert table.version == 2 and table.get("cam1", "A")[1][0]["ts"] == 11
+
+    assert table.update(payload("cam1", A={"status": "blocked"}), 12) == 1
+    assert table.update(payload("cam1", A={"status": "blocked"}), 13) == 0
+    state = table.get("cam1", "A")[1][0]
+    assert (state["blocked"], state["stock"], state["version"]) == (True, 3, 3)  # keeps the last seen stock
+    assert table.get("cam1", "Z") is None and table.get("cam2") is None
+
+
+def test_empty_index_and_since_version() -> None:
+    table = ShelfStateTable()
+    table.update(payload("cam1", A={"stock": 0, "missing": 4}, B={"stock": 2, "missing": 0}), 10)
+    table.update(payload("cam2", A={"stock": 0, "missing": 1}), 20)
+    version, empty = table.snapshot(empty=True)
+    assert version == 3 and [(z["device"], z["zone"], z["empty_since"]) for z in empty] == [
+        ("cam1", "A", 10), ("cam2", "A", 20)]
+
+    # Occluded: neither empty nor recovered, so the episode keeps its start
+    table.update(payload("cam1", A={"status": "blocked"}), 30)
+    table.update(payload("cam1", A={"stock": 0, "missing": 4}), 40)
+    assert table.get("cam1", "A")[1][0]["empty_since"] == 10
+
+    table.update(payload("cam1", B={"stock": 0, "missing": 2}), 50)
+    _, changes = table.snapshot(since_version=3)
+    assert [(z["zone"], z["version"]) for z in changes] == [("A", 5), ("B", 6)]   # each zone once, in order
+    _, changes = table.snapshot(device="cam2", since_version=3)
+    assert changes == []
+    assert len(table) == 3
+
+
+def test_history_summary_caps_gaps() -> None:
+    rows = [
+        {"zone": "A", "ts": 0, "stock_max": 0, "blocked_ratio": 0.0},
+        {"zone": "A", "ts": 10, "stock_max": 2, "blocked_ratio": 0.5},
+        {"zone": "A", "ts": 500, "stock_max": 0, "blocked_ratio": 0.0},
+    ]
+    assert history_summary(rows, "samples_raw", end=505) == {"empty_seconds": 11.0, "blocked_seconds": 15.5}
+
+
+@pytest.fixture
+def server(tmp_path):
+    history = ZoneHistoryStore(tmp_path / "history.db", flush_interval=3600)
+    table = ShelfStateTable(history)
+    service = QueryServer(table, port=0, host="127.0.0.1")
+    yield service, f"http://127.0.0.1:{service.server.server_address[1]}"
+    service.close()
+    history.close()
+
+
+def get(url: str, etag: str | None = None) -> tuple[int, dict, dict | None]:
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status, dict(response.headers), json.loads(response.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, dict(exc.headers), None
+
+
+def test_etag_and_not_modified(server) -> None:
+    service, base = server
+    service.table.update(payload("cam 1", A={"stock": 4, "missing": 0}))
+    status, headers, body = get(f"{base}/state")
+    assert status == 200 and headers["ETag"] == '"1"' and body["version"] == 1
+    assert get(f"{base}/state", etag='"1"')[0] == 304
+    assert service.not_modified == 1
+
+    service.table.update(payload("cam 1", A={"stock": 4, "missing": 0}))   # no change
+    assert get(f"{base}/state", etag='"1"')[0] == 304
+    service.table.update(payload("cam 1", A={"stock": 0, "missing": 4}))
+    status, headers, body = get(f"{base}/state?since_version=1", etag='"1"')
+    assert status == 200 and headers["ETag"] == '"2"' and [z["stock"] for z in body["zones"]] == [0]
+
+    status, _, zone = get(f"{base}/state/cam%201/A")
+    assert status == 200 and zone["empty"] and zone["history"].startswith("/history?device=cam%201&zone=A")
+    assert get(f"{base}/state/cam%201/B")[0] == 404
+    assert get(f"{base}/history")[0] == 400
+
+
+def test_history_endpoint(server) -> None:
+    service, base = server
+    service.table.update(payload("cam1", A={"stock": 0, "missing": 4}), 1000)
+    service.table.update(payload("cam1", A={"stock": 3, "missing": 0}), 1001)
+    service.table.history.flush()
+    status, _, body = get(f"{base}/history?device=cam1&zone=A&start=990&end=1010&resolution=raw")
+    assert status == 200 and body["table"] == "samples_raw"
+    assert [row["ts"] for row in body["rows"]] == [1000, 1001]
+    assert body["empty_seconds"] == 1.0
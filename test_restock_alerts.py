@@ -0,0 +1,81 @@
+"""RestockAlertEngine: debounced raise, hold through the hysteresis band, clear, occlusion and queue order.
+
+    python -m pytest test_restock_alerts.py
+"""
+from __future__ import annotations
+
+import pytest
+
+from restock_alerts import RestockAlertEngine
+
+
+def feed(engine: RestockAlertEngine, samples: list[tuple], key: str = "z") -> list[tuple]:
+    """``(ts, stock, missing[, blocked])`` samples; returns ``(ts, kind)`` for every event."""
+    events = []
+    for ts, stock, missing, *blocked in samples:
+        event = engine.update(key, stock, missing, ts, blocked=bool(blocked and blocked[0]))
+        if event:
+            events.append((event.ts, event.kind))
+    return events
+
+
+def missing_only_engine() -> RestockAlertEngine:
+    # No stock threshold, like zone_monitor, with a band between raising and clearing on missing slots
+    return RestockAlertEngine(raise_missing=2, clear_missing=0, raise_stock=None, clear_stock=None,
+                              raise_after=5, clear_after=10)
+
+
+def test_raise_hold_clear_with_hysteresis() -> None:
+    engine = missing_only_engine()
+    samples = [(t, 8, 0) for t in range(0, 3)]
+    samples += [(t, 6, 2) for t in range(3, 9)]     # short from t=3, raised once it has held 5 s
+    samples += [(t, 7, 1) for t in range(9, 30)]    # inside the band: neither raises again nor clears
+    samples += [(t, 8, 0) for t in range(30, 45)]   # recovered from t=30, cleared at t=40
+    assert feed(engine, samples) == [(8, "raised"), (40, "cleared")]
+    assert not engine.is_alerting("z")
+
+
+def test_zone_monitor_alerts_on_missing_slots_only() -> None:
+    # A zone that only ever holds two facings is full, not low on stock
+    engine = RestockAlertEngine(raise_stock=None, clear_stock=None)
+    assert feed(engine, [(t, 2, 0) for t in range(60)]) == []
+    assert feed(engine, [(t, 1, 1) for t in range(60, 70)]) == [(65, "raised")]
+
+
+def test_short_blips_are_debounced() -> None:
+    engine = missing_only_engine()
+    samples = [(0, 8, 2), (4, 8, 2), (5, 8, 0), (6, 8, 2), (10, 8, 2), (11, 8, 2)]
+    assert feed(engine, samples) == [(11, "raised")]
+    # Back in the band during the clear wait restarts it
+    samples = [(20, 8, 0), (25, 8, 1), (26, 8, 0), (35, 8, 0), (36, 8, 0)]
+    assert feed(engine, samples) == [(36, "cleared")]
+
+
+def test_blocked_samples_neither_confirm_nor_reset() -> None:
+    engine = missing_only_engine()
+    samples = [(0, 8, 2), (2, None, None, True), (4, 8, 0, True), (5, 8, 2)]
+    assert feed(engine, samples) == [(5, "raised")]
+
+
+def test_stock_thresholds_need_a_band() -> None:
+    with pytest.raises(ValueError):
+        RestockAlertEngine(raise_stock=3, clear_stock=3)
+    with pytest.raises(ValueError):
+        RestockAlertEngine(raise_missing=1, clear_missing=1)
+
+
+def test_restock_queue_order_and_pop() -> None:
+    engine = RestockAlertEngine(raise_stock=None, clear_stock=None, raise_after=0, clear_after=0)
+    engine.update("a", 5, 1, ts=0)
+    engine.update("b", 5, 1, ts=100)
+    engine.update("c", 5, 3, ts=200)
+    assert [item.key for item in engine.restock_queue()] == ["c", "a", "b"]  # more missing, then short longer
+    engine.update("b", 5, 4, ts=210)
+    assert [item.key for item in engine.restock_queue()] == ["b", "c", "a"]
+    assert len(engine) == 3
+
+    assert engine.pop().key == "b"
+    assert engine.is_alerting("b")
+    engine.update("c", 5, 0, ts=220)
+    assert [item.key for item in engine.restock_queue()] == ["a"]
+    assert len(engine) == 2
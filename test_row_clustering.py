@@ -0,0 +1,90 @@
+"""Row clustering and RowTracker: rows that empty, reappear and merge, and the steady-state fast path.
+
+    python -m pytest test_row_clustering.py
+"""
+from __future__ import annotations
+
+import random
+
+import numpy as np
+import pytest
+
+from row_clustering import RowTracker, cluster_rows
+
+
+def shelf(rows: list[float], per_row: int = 6) -> list[tuple]:
+    return [(x, y - 10, x + 20, y + 10, 0.9) for y in rows for x in range(0, per_row * 30, 30)]
+
+
+def test_cluster_rows_ignores_input_order() -> None:
+    boxes = shelf([100, 300, 500])
+    shuffled = boxes[:]
+    random.Random(0).shuffle(shuffled)
+    assert [sorted(row) for row in cluster_rows(shuffled, 40)] == [sorted(row) for row in cluster_rows(boxes, 40)]
+    assert [len(row) for row in cluster_rows(boxes, 40)] == [6, 6, 6]
+
+
+@pytest.mark.parametrize("rows", [[100, 300], [300, 500], [100, 500]])
+def test_a_row_emptying_keeps_the_others(rows: list[float]) -> None:
+    tracker = RowTracker(40)
+    tracker.update(shelf([100, 300, 500]))
+    result = tracker.update(shelf(rows))
+    assert [len(row) for row in result] == [6, 6]
+    ids = {100: 0, 300: 1, 500: 2}
+    assert tracker.frame_ids.tolist() == [ids[y] for y in rows]
+
+
+def test_row_ids_survive_until_max_missed() -> None:
+    tracker = RowTracker(40, max_missed=5)
+    tracker.update(shelf([100, 300, 500]))
+    for _ in range(5):
+        tracker.update(shelf([300, 500]))
+    tracker.update(shelf([100, 300, 500]))
+    assert tracker.frame_ids.tolist() == [0, 1, 2]  # back within max_missed: same row
+
+    for _ in range(7):
+        tracker.update(shelf([300, 500]))
+    tracker.update(shelf([100, 300, 500]))
+    assert tracker.frame_ids.tolist() == [3, 1, 2]  # dropped meanwhile: a new row
+
+
+def test_empty_frame_and_restart() -> None:
+    tracker = RowTracker(40)
+    assert tracker.update([]) == []
+    tracker.update(shelf([100, 300]))
+    assert tracker.update([]) == []
+    assert len(tracker.update(shelf([100, 300]))) == 2
+    tracker.reset()
+    tracker.update(shelf([300]))
+    assert tracker.frame_ids.tolist() == [0]
+
+
+def test_drifting_rows_merge_into_the_older_id() -> None:
+    tracker = RowTracker(40, smoothing=1.0)
+    tracker.update(shelf([100, 300]))
+    tracker.update(shelf([100, 300, 390]))   # a new row below
+    result = tracker.update(shelf([100, 300, 330]))
+    assert [len(row) for row in result] == [6, 12]
+    assert tracker.frame_ids.tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("max_missed", [1, 10])
+def test_fast_path_matches_general_path(monkeypatch: pytest.MonkeyPatch, max_missed: int) -> None:
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(400):
+        rows = [y for y in (100, 260, 420, 580) if rng.random() > 0.15]
+        boxes = [box for box in shelf(rows, 8) if rng.random() > 0.2]
+        frames.append([(x1, y1 + dy, x2, y2 + dy, c) for (x1, y1, x2, y2, c), dy in
+                       zip(boxes, rng.normal(0, 5, len(boxes)))])
+
+    def run() -> list:
+        tracker = RowTracker(40, max_missed=max_missed)
+        out = []
+        for boxes in frames:
+            out.append(([len(row) for row in tracker.update(boxes)], tracker.frame_ids.tolist()))
+        return out
+
+    fast = run()
+    monkeypatch.setattr(RowTracker, "_assign_known", lambda self, center_y, nearest: None)
+    assert run() == fast
@@ -0,0 +1,105 @@
+"""zone_history: per-second writes, minute / hour rollups behind the watermark, retention and query resolution.
+
+    python -m pytest test_zone_history.py
+"""
+from __future__ import annotations
+
+import pytest
+
+from zone_history import RetentionPolicy, ZoneHistoryStore, connect, pick_table, query_range
+
+
+@pytest.fixture
+def store(tmp_path):
+    # The writer thread never wakes up on its own: the tests flush explicitly
+    history = ZoneHistoryStore(tmp_path / "history.db", flush_interval=3600)
+    yield history
+    history.close()
+
+
+def record_seconds(store: ZoneHistoryStore, start: int, end: int, camera: str = "cam", stock: int = 4) -> None:
+    for ts in range(start, end):
+        store.record(camera, "z1", stock, 1, ts=ts + 0.5)
+
+
+def test_flush_aggregates_samples_per_second(store: ZoneHistoryStore) -> None:
+    store.record("cam", "z1", 3, 1, ts=10.1)
+    store.record("cam", "z1", 5, 0, ts=10.6)
+    store.record("cam", "z1", None, None, blocked=True, ts=10.9)
+    store.record("cam", "z1", 9, 9, blocked=True, ts=11.0)
+    assert store.pending() == 4
+    assert store.flush() == 2
+    assert store.pending() == 0
+
+    first, second = store.query("cam", "z1", 0, 60, "raw")
+    assert (first["ts"], first["stock"], first["stock_min"], first["stock_max"]) == (10, 4.0, 3, 5)
+    assert (first["missing"], first["missing_max"]) == (0.5, 1)
+    assert first["blocked_ratio"] == pytest.approx(1 / 3)
+    assert (second["ts"], second["stock"], second["blocked_ratio"]) == (11, None, 1.0)
+
+
+def test_rollup_follows_the_sample_clock(store: ZoneHistoryStore) -> None:
+    # Video time starts at 0: buckets close as the video advances, not by the wall clock
+    record_seconds(store, 0, 180)
+    store.flush()
+    minutes = store.query("cam", "z1", 0, 3600, "minute")
+    assert [(row["ts"], row["stock"]) for row in minutes] == [(0, 4.0), (60, 4.0)]  # 120.. still open
+
+    record_seconds(store, 180, 251, stock=2)
+    store.flush()
+    minutes = store.query("cam", "z1", 0, 3600, "minute")
+    assert [row["ts"] for row in minutes] == [0, 60, 120, 180]
+    assert minutes[2]["stock"] == 4.0 and minutes[3]["stock"] == 2.0
+    assert store.query("cam", "z1", 0, 3600, "hour") == []  # the first hour is still open
+
+    record_seconds(store, 3600, 3615)
+    store.flush()
+    (hour,) = store.query("cam", "z1", 0, 7200, "hour")
+    assert hour["ts"] == 0
+    assert hour["stock"] == pytest.approx((180 * 4 + 71 * 2) / 251)  # every second of the hour, counted once
+
+
+def test_cameras_roll_up_independently(store: ZoneHistoryStore) -> None:
+    wall = 1_700_000_000
+    record_seconds(store, wall, wall + 5, camera="live")
+    record_seconds(store, 0, 140, camera="video")
+    store.flush()
+    assert [row["ts"] for row in store.query("video", "z1", 0, 3600, "minute")] == [0, 60]
+    record_seconds(store, 140, 200, camera="video")
+    store.flush()
+    assert [row["ts"] for row in store.query("video", "z1", 0, 3600, "minute")] == [0, 60, 120]
+
+
+def test_retention_per_resolution(tmp_path) -> None:
+    store = ZoneHistoryStore(tmp_path / "history.db", RetentionPolicy(raw=100, minute=None), flush_interval=3600)
+    try:
+        record_seconds(store, 0, 300)
+        store.flush()
+        raw = store.query("cam", "z1", 0, 3600, "raw")
+        assert raw[0]["ts"] == 199 and raw[-1]["ts"] == 299
+        # Rolled up before the raw seconds were dropped
+        assert [row["ts"] for row in store.query("cam", "z1", 0, 3600, "minute")] == [0, 60, 120, 180]
+    finally:
+        store.close()
+
+
+def test_close_writes_what_is_queued(tmp_path) -> None:
+    store = ZoneHistoryStore(tmp_path / "history.db", flush_interval=3600)
+    record_seconds(store, 0, 3)
+    store.close()
+    conn = connect(tmp_path / "history.db")
+    assert len(query_range(conn, "cam", None, 0, 60, "raw")) == 3
+    conn.close()
+
+
+@pytest.mark.parametrize("span, resolution, table", [
+    (60, "auto", "samples_raw"),
+    (2 * 3600, "auto", "samples_raw"),
+    (2 * 3600 + 1, "auto", "samples_1m"),
+    (7 * 86400, "auto", "samples_1m"),
+    (30 * 86400, "auto", "samples_1h"),
+    (30 * 86400, "raw", "samples_raw"),
+    (60, "hour", "samples_1h"),
+])
+def test_pick_table(span: float, resolution: str, table: str) -> None:
+    assert pick_table(1000, 1000 + span, resolution) == table
@@ -0,0 +1,125 @@
+"""End-to-end latency tracing from frame capture to dashboard render.
+
+The edge side starts a ``FrameTrace`` when a frame is captured, then marks
+each stage as it finishes. When the frame's results are published, the
+trace goes into the payload::
+
+    trace = FrameTrace(frame_idx)
+    detections = model(frame);  trace.mark("infer")
+    ...;                        trace.mark("analyze")
+    payload["trace"] = trace.to_dict()      # adds publish_ts
+
+    "trace": {"frame": 1234, "capture_ts": 1700000000.123, "publish_ts": 1700000000.201,
+              "stages_ms": {"infer": 61.2, "analyze": 3.4, "render": 9.8}}
+
+``TraceAggregator`` runs on the dashboard. It splits every received trace
+into hops, capture -> publish -> receive -> render, and keeps a rolling
+window per device for each hop. The percentiles then show which edge node
+or broker hop adds the delay.
+
+Timestamps are wall-clock ``time.time()`` so they can be compared across
+hosts. Keep the edge nodes and the dashboard NTP-synced. A negative
+publish -> receive hop means the clocks disagree; it is clamped to zero
+and counted as skewed.
+"""
+from __future__ import annotations
+
+import time
+from collections import defaultdict, deque
+
+HOPS = ("capture_to_publish", "publish_to_receive", "receive_to_render", "end_to_end")
+WINDOW = 1000               # latest traces kept per device and hop
+
+
+class FrameTrace:
+    __slots__ = ("frame", "capture_ts", "stages", "_last")
+
+    def __init__(self, frame: int, capture_ts: float | None = None):
+        self.frame = frame
+        self.capture_ts = time.time() if capture_ts is None else capture_ts
+        self.stages: dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str) -> float:
+        """Close ``stage`` (time since the previous mark); repeated stages accumulate."""
+        now = time.perf_counter()
+        elapsed = (now - self._last) * 1000
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        self._last = now
+        return elapsed
+
+    def to_dict(self) -> dict:
+        return {
+            "frame": self.frame,
+            "capture_ts": round(self.capture_ts, 6),
+            "publish_ts": round(time.time(), 6),
+            "stages_ms": {name: round(ms, 2) for name, ms in self.stages.items()},
+        }
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+class TraceAggregator:
+    def __init__(self, window: int = WINDOW, on_sample=None):
+        self.hops: dict[str, dict[str, deque]] = defaultdict(lambda: {hop: deque(maxlen=window) for hop in HOPS})
+        self.stages: dict[str, dict[str, deque]] = defaultdict(lambda: defaultdict(lambda: deque(maxlen=window)))
+        self.traced = 0
+        self.untraced = 0
+        self.skewed = 0
+        self.on_sample = on_sample      # callback(device, hop, seconds), e.g. a metrics histogram
+
+    def record(self, device: str, payload: dict, received_ts: float, rendered_ts: float) -> bool:
+        """Add one message; returns False if it carries no usable trace."""
+        trace = payload.get("trace")
+        if not isinstance(trace, dict):
+            self.untraced += 1
+            return False
+        capture_ts, publish_ts = trace.get("capture_ts"), trace.get("publish_ts")
+        if not isinstance(capture_ts, (int, float)) or not isinstance(publish_ts, (int, float)):
+            self.untraced += 1
+            return False
+        network = received_ts - publish_ts
+        if network < 0:
+            self.skewed += 1
+            network = 0.0
+        samples = {
+            "capture_to_publish": max(publish_ts - capture_ts, 0.0),
+            "publish_to_receive": network,
+            "receive_to_render": max(rendered_ts - received_ts, 0.0),
+        }
+        samples["end_to_end"] = sum(samples.values())
+        hops = self.hops[device]
+        for hop, seconds in samples.items():
+            hops[hop].append(seconds)
+            if self.on_sample is not None:
+                self.on_sample(device, hop, seconds)
+        stages = trace.get("stages_ms")
+        if isinstance(stages, dict):
+            for name, ms in stages.items():
+                if isinstance(ms, (int, float)):
+                    self.stages[device][str(name)].append(float(ms))
+        self.traced += 1
+        return True
+
+    def summary(self, device: str) -> dict[str, dict[str, float]]:
+        """``{hop: {"p50": ms, "p95": ms, "p99": ms, "max": ms}}`` for one device."""
+        result = {}
+        for hop, values in self.hops[device].items():
+            ordered = sorted(values)
+            result[hop] = {
+                "p50": percentile(ordered, 0.5) * 1000,
+                "p95": percentile(ordered, 0.95) * 1000,
+                "p99": percentile(ordered, 0.99) * 1000,
+                "max": (ordered[-1] if ordered else 0.0) * 1000,
+            }
+        return result
+
+    def stage_means(self, device: str) -> dict[str, float]:
+        return {name: sum(values) / len(values) for name, values in self.stages[device].items() if values}
+
+    def devices(self) -> list[str]:
+        return sorted(self.hops)
@@ -0,0 +1,143 @@
+"""Per-zone facing-width priors learned over time for gap estimation.
+
+Gap detection needs the width of one product facing to turn an empty span
+into a number of missing slots. Averaging the boxes of the current frame
+breaks down when a zone is sparse: one odd box sets the slot size, and an
+empty zone becomes a single "gap" however wide it is. ``WidthPriors``
+keeps an EWMA of the facing width per zone (or shelf row)::
+
+    priors = WidthPriors.load(default_path("config.json"))
+    slot = priors.estimate(zid, [x2 - x1 for x1, _, x2, _ in boxes], zone_width)
+    ...
+    priors.maybe_save()          # atomic rewrite at most every SAVE_INTERVAL_SECONDS
+
+The prior learns only from frames with at least ``min_boxes`` boxes, from
+their median width, so a merged double box or a half-visible edge product
+does not move it much. It is stored as a fraction of the span it was
+measured in (zone width, or frame width for rows), so it survives a change
+of stream resolution. Once warm it is used on every frame, which keeps the
+slot size stable while products are taken one by one.
+"""
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Hashable
+
+import numpy as np
+
+ALPHA = 0.05                # EWMA weight of a new observation once the prior is warm
+MIN_BOXES = 3               # boxes a frame needs before its widths teach the prior
+WARMUP_SAMPLES = 20         # observations before the prior replaces the per-frame average
+SAVE_INTERVAL_SECONDS = 60.0
+
+
+def default_path(config_path: str | Path) -> Path:
+    """``config.json`` -> ``config.widths.json`` next to it."""
+    config_path = Path(config_path)
+    return config_path.with_name(f"{config_path.stem}.widths.json")
+
+
+@dataclass
+class WidthPrior:
+    width: float            # facing width as a fraction of the span
+    samples: int = 0
+
+    @property
+    def warm(self) -> bool:
+        return self.samples >= WARMUP_SAMPLES
+
+
+class WidthPriors:
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        alpha: float = ALPHA,
+        min_boxes: int = MIN_BOXES,
+    ):
+        self.path = Path(path) if path else None
+        self.alpha = alpha
+        self.min_boxes = min_boxes
+        self.priors: dict[str, WidthPrior] = {}
+        self.dirty = False
+        self._last_save = time.monotonic()
+
+    @classmethod
+    def load(cls, path: str | Path, **kwargs) -> "WidthPriors":
+        """Priors saved at ``path``; starts empty when the file is missing or unreadable."""
+        priors = cls(path, **kwargs)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+            for key, entry in data.get("zones", {}).items():
+                if entry.get("width", 0) > 0:
+                    priors.priors[key] = WidthPrior(float(entry["width"]), int(entry.get("samples", 0)))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as exc:
+            print(f"[widths] Ignoring unreadable priors {path}: {exc}")
+        return priors
+
+    def __len__(self) -> int:
+        return len(self.priors)
+
+    def get(self, key: Hashable) -> WidthPrior | None:
+        return self.priors.get(str(key))
+
+    def observe(self, key: Hashable, widths, span: float) -> None:
+        """Teach the prior of ``key`` from this frame's box widths (ignored below ``min_boxes``)."""
+        if len(widths) < self.min_boxes or span <= 0:
+            return
+        observed = float(np.median(widths)) / span
+        if observed <= 0:
+            return
+        prior = self.priors.get(str(key))
+        if prior is None:
+            self.priors[str(key)] = WidthPrior(observed, 1)
+        else:
+            # Plain running mean while young, so the first frames do not dominate the EWMA
+            prior.samples += 1
+            prior.width += max(self.alpha, 1.0 / prior.samples) * (observed - prior.width)
+        self.dirty = True
+
+    def estimate(self, key: Hashable, widths, span: float) -> float | None:
+        """Facing width in pixels for gap detection; None when nothing is known yet.
+
+        A warm prior wins. Before that the frame's own average is used, and
+        a young prior only fills in when the zone shows no boxes at all.
+        """
+        self.observe(key, widths, span)
+        prior = self.priors.get(str(key))
+        if prior is not None and prior.warm:
+            return prior.width * span
+        if len(widths):
+            return float(np.mean(widths))
+        return prior.width * span if prior is not None else None
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        data = {"version": 1, "zones": {key: asdict(prior) for key, prior in sorted(self.priors.items())}}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, self.path)
+        self.dirty = False
+        self._last_save = time.monotonic()
+
+    def maybe_save(self, interval: float = SAVE_INTERVAL_SECONDS) -> bool:
+        """Save when something changed and ``interval`` seconds passed since the last save."""
+        if not self.dirty or self.path is None or time.monotonic() - self._last_save < interval:
+            return False
+        try:
+            self.save()
+        except OSError as exc:
+            print(f"[widths] Could not save priors to {self.path}: {exc}")
+            self._last_save = time.monotonic()
+            return False
+        return True
+
+    def summary(self) -> str:
+        warm = sum(prior.warm for prior in self.priors.values())
+        return f"{len(self.priors)} width priors ({warm} warm)"
@@ -0,0 +1,277 @@
+"""Validated, compiled and hot-reloadable zone configuration (config.json)."""
+from __future__ import annotations
+
+import json
+import os
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_DESCRIPTION = "Shelf Area Config"
+RELOAD_CHECK_INTERVAL_SECONDS = 1.0
+
+
+class ZoneConfigError(ValueError):
+    """Raised when config.json is missing, unreadable or structurally invalid."""
+
+
+@dataclass(frozen=True)
+class ZoneConfig:
+    """Immutable, array-packed view of config.json.
+
+    ``coords`` is an ``(N, 4)`` int32 array of ``x1, y1, x2, y2`` in the
+    stored ``resolution`` (``[width, height]``); ``product_index`` maps each
+    zone to its entry in ``products`` so zones sharing a product share an index.
+    """
+
+    description: str
+    resolution: tuple[int, int]
+    ids: tuple[str, ...]
+    names: tuple[str, ...]
+    products: tuple[str, ...]
+    product_index: np.ndarray
+    coords: np.ndarray
+    source_path: Path | None = None
+    mtime_ns: int = 0
+    _scaled: dict = field(default_factory=dict, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def scaled_coords(self, frame_width: int, frame_height: int) -> np.ndarray:
+        """Return zone coords rescaled to the actual stream resolution (cached)."""
+        key = (int(frame_width), int(frame_height))
+        cached = self._scaled.get(key)
+        if cached is not None:
+            return cached
+        ref_w, ref_h = self.resolution
+        if key == (ref_w, ref_h):
+            scaled = self.coords
+        else:
+            factors = np.array(
+                [frame_width / ref_w, frame_height / ref_h] * 2, dtype=np.float64
+            )
+            scaled = np.round(self.coords * factors).astype(np.int32)
+            scaled.setflags(write=False)
+        self._scaled[key] = scaled
+        return scaled
+
+    def matches_resolution(self, frame_width: int, frame_height: int) -> bool:
+        return (int(frame_width), int(frame_height)) == self.resolution
+
+    def zone_dicts(self) -> list[dict]:
+        """Return zones in the config.json schema."""
+        return [
+            {"id": zid, "product": name, "coords": [int(v) for v in box]}
+            for zid, name, box in zip(self.ids, self.names, self.coords)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "description": self.description,
+            "resolution": list(self.resolution),
+            "zones": self.zone_dicts(),
+        }
+
+
+def zone_membership(detections, coords: np.ndarray) -> np.ndarray:
+    """Return an ``(N_detections, N_zones)`` bool matrix of box-center-in-zone tests.
+
+    Uses the same strict interior test as the original per-zone loops, so a
+    detection on overlapping zones still counts toward each of them.
+    """
+    if len(detections) == 0 or len(coords) == 0:
+        return np.zeros((len(detections), len(coords)), dtype=bool)
+    dets = np.asarray(detections, dtype=np.float64)
+    cx = ((dets[:, 0] + dets[:, 2]) / 2)[:, None]
+    cy = ((dets[:, 1] + dets[:, 3]) / 2)[:, None]
+    return (
+        (coords[:, 0] < cx) & (cx < coords[:, 2])
+        & (coords[:, 1] < cy) & (cy < coords[:, 3])
+    )
+
+
+def assign_zones(detections, coords: np.ndarray) -> np.ndarray:
+    """Return the first matching zone index per detection (``-1`` outside every zone)."""
+    inside = zone_membership(detections, coords)
+    if inside.shape[1] == 0:
+        return np.full(len(inside), -1, dtype=np.intp)
+    return np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+
+
+def validate_config(data: object) -> list[str]:
+    """Return a list of human-readable problems found in a raw config dict."""
+    if not isinstance(data, dict):
+        return ["top-level value must be a JSON object"]
+
+    problems: list[str] = []
+    resolution = data.get("resolution")
+    res_ok = (
+        isinstance(resolution, (list, tuple))
+        and len(resolution) == 2
+        and all(isinstance(v, int) and v > 0 for v in resolution)
+    )
+    if not res_ok:
+        problems.append(f"resolution must be [width, height] positive ints, got {resolution!r}")
+
+    zones = data.get("zones")
+    if not isinstance(zones, list):
+        return problems + ["zones must be a list"]
+
+    seen: set[str] = set()
+    for index, zone in enumerate(zones):
+        where = f"zones[{index}]"
+        if not isinstance(zone, dict):
+            problems.append(f"{where} must be an object")
+            continue
+        zid = zone.get("id")
+        if not isinstance(zid, str) or not zid:
+            problems.append(f"{where}.id must be a non-empty string")
+        elif zid in seen:
+            problems.append(f"{where}.id {zid!r} is duplicated")
+        else:
+            seen.add(zid)
+        if not isinstance(zone.get("product"), str):
+            problems.append(f"{where}.product must be a string")
+        coords = zone.get("coords")
+        if not (
+            isinstance(coords, (list, tuple))
+            and len(coords) == 4
+            and all(isinstance(v, (int, float)) for v in coords)
+        ):
+            problems.append(f"{where}.coords must be [x1, y1, x2, y2]")
+            continue
+        x1, y1, x2, y2 = coords
+        if x2 <= x1 or y2 <= y1:
+            problems.append(f"{where}.coords {list(coords)} must satisfy x1 < x2 and y1 < y2")
+        if res_ok:
+            width, height = resolution
+            if min(x1, y1) < 0 or x2 > width or y2 > height:
+                problems.append(f"{where}.coords {list(coords)} fall outside resolution {list(resolution)}")
+    return problems
+
+
+def compile_config(data: dict, source_path: Path | None = None, mtime_ns: int = 0) -> ZoneConfig:
+    """Validate a raw config dict and pack it into a :class:`ZoneConfig`."""
+    problems = validate_config(data)
+    if problems:
+        where = f" ({source_path})" if source_path else ""
+        raise ZoneConfigError(f"Invalid zone config{where}: " + "; ".join(problems))
+
+    zones = data["zones"]
+    names = tuple(zone["product"] for zone in zones)
+    products = tuple(dict.fromkeys(names))
+    lookup = {name: idx for idx, name in enumerate(products)}
+
+    coords = np.array([zone["coords"] for zone in zones], dtype=np.int32).reshape(-1, 4)
+    product_index = np.array([lookup[name] for name in names], dtype=np.int32)
+    coords.setflags(write=False)
+    product_index.setflags(write=False)
+
+    return ZoneConfig(
+        description=str(data.get("description", DEFAULT_DESCRIPTION)),
+        resolution=(int(data["resolution"][0]), int(data["resolution"][1])),
+        ids=tuple(zone["id"] for zone in zones),
+        names=names,
+        products=products,
+        product_index=product_index,
+        coords=coords,
+        source_path=source_path,
+        mtime_ns=mtime_ns,
+    )
+
+
+def build_config(
+    zones: list[dict],
+    resolution: tuple[int, int],
+    description: str = DEFAULT_DESCRIPTION,
+) -> ZoneConfig:
+    """Compile zones produced by a tool (creator/proposer) into a :class:`ZoneConfig`."""
+    data = {
+        "description": description,
+        "resolution": [int(resolution[0]), int(resolution[1])],
+        "zones": [
+            {"id": z["id"], "product": z["product"], "coords": [int(v) for v in z["coords"]]}
+            for z in zones
+        ],
+    }
+    return compile_config(data)
+
+
+def load_zone_config(path: str | os.PathLike) -> ZoneConfig:
+    config_path = Path(path)
+    try:
+        stat = config_path.stat()
+        with open(config_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as exc:
+        raise ZoneConfigError(f"Unable to read zone config {config_path}: {exc}") from exc
+    return compile_config(data, source_path=config_path, mtime_ns=stat.st_mtime_ns)
+
+
+def save_zone_config(config: ZoneConfig, path: str | os.PathLike) -> Path:
+    """Write ``config`` atomically so a watching monitor never reads a partial file."""
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(config.to_dict(), f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, target)
+    return target
+
+
+class ConfigWatcher:
+    """Polls config.json and swaps in a freshly compiled config between frames.
+
+    ``current`` always refers to a complete :class:`ZoneConfig`; a reload that
+    fails validation keeps the previous config and reports the error instead.
+    """
+
+    def __init__(self, path: str | os.PathLike, interval: float = RELOAD_CHECK_INTERVAL_SECONDS):
+        self.path = Path(path)
+        self.interval = interval
+        self.current = load_zone_config(self.path)
+        self.version = 1
+        self._last_check = time.monotonic()
+
+    def poll(self) -> bool:
+        """Reload if the file changed; return True when a new config was swapped in."""
+        now = time.monotonic()
+        if now - self._last_check < self.interval:
+            return False
+        self._last_check = now
+        try:
+            mtime_ns = self.path.stat().st_mtime_ns
+        except OSError:
+            return False
+        if mtime_ns == self.current.mtime_ns:
+            return False
+        try:
+            fresh = load_zone_config(self.path)
+        except ZoneConfigError as exc:
+            print(f"[zone_config] Keeping previous config: {exc}")
+            # Remember the bad mtime so the same broken file is not re-parsed every poll
+            self.current = replace(self.current, mtime_ns=mtime_ns)
+            return False
+        self.current = fresh
+        self.version += 1
+        print(f"[zone_config] Reloaded {self.path} (v{self.version}, {len(fresh)} zones)")
+        return True
+
+
+def check_resolution(config: ZoneConfig, frame_width: int, frame_height: int) -> str | None:
+    """Return a warning message when the stream resolution differs from the config."""
+    if config.matches_resolution(frame_width, frame_height):
+        return None
+    ref_w, ref_h = config.resolution
+    ref_ratio = ref_w / ref_h
+    ratio = frame_width / frame_height
+    message = (
+        f"Stream resolution {frame_width}x{frame_height} differs from config "
+        f"{ref_w}x{ref_h}; zones will be rescaled"
+    )
+    if abs(ratio - ref_ratio) > 0.01 * ref_ratio:
+        message += " (aspect ratio mismatch, check camera orientation)"
+    return message
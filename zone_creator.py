@@ -1,168 +1,338 @@
 import cv2
-import json
 import os
 import argparse
+import time
+import numpy as np
+from zone_config import ZoneConfigError, build_config, load_zone_config, save_zone_config
 
 # ==========================================
 # 參數設定
 # ==========================================
 OUTPUT_FILE = 'config.json'
+KEYFRAME_COUNT = 12          # 從影片中抽樣的關鍵幀數量 (只解碼這些畫面)
+CAMERA_KEYFRAME_INTERVAL = 0.5  # 鏡頭來源：每隔幾秒擷取一張關鍵幀
+MIN_ZONE_SIZE = 10           # 防呆：小於此尺寸視為誤點
+ZONE_COLOR = (0, 255, 0)
+DRAFT_COLOR = (0, 255, 255)
 # ==========================================
 
-# 全域變數
-drawing = False
-ix, iy = -1, -1
-current_rect = None
-zones = []
-zone_counter = 1
+KEY_ENTER = (10, 13)
+KEY_ESC = 27
+KEY_BACKSPACE = (8, 127)
 
-def mouse_callback(event, x, y, flags, param):
-    global ix, iy, drawing, current_rect
 
-    if event == cv2.EVENT_LBUTTONDOWN:
-        drawing = True
-        ix, iy = x, y
-        current_rect = None
+def iter_keyframes(source, count):
+    """逐張產生抽樣的關鍵幀：影片檔以 seek 均勻抽樣，鏡頭則間隔擷取。"""
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        return
+
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if isinstance(source, str) else 0
+        if total > 0:
+            positions = np.linspace(0, total - 1, num=min(count, total)).astype(int)
+            for pos in dict.fromkeys(positions.tolist()):
+                cap.set(cv2.CAP_PROP_POS_FRAMES, pos)
+                ret, frame = cap.read()
+                if ret:
+                    yield frame
+        else:
+            # 鏡頭或無法取得總幀數的串流：間隔擷取
+            last = 0.0
+            taken = 0
+            while taken < count:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                now = time.monotonic()
+                if now - last >= CAMERA_KEYFRAME_INTERVAL:
+                    yield frame
+                    taken += 1
+                    last = now
+    finally:
+        cap.release()
+
+
+def load_keyframes(source, count):
+    """只解碼抽樣的關鍵幀放進快取，標記時不再持續解碼影片。"""
+    return list(iter_keyframes(source, count))
+
+
+class ZoneCanvas:
+    """維護「底圖 + 區域圖層」，只在有變動的地方重繪。
+
+    - zone_layer / zone_mask：已確認的區域只畫一次，新增時只畫新的那一個
+    - composed：底圖 + 區域圖層，只有換幀或區域變動時才重新合成
+    - display：實際顯示的畫面，拖拉時只還原上一個草稿框所在的小區塊
+    """
+
+    def __init__(self, frame_shape):
+        height, width = frame_shape[:2]
+        self.zone_layer = np.zeros((height, width, 3), dtype=np.uint8)
+        self.zone_mask = np.zeros((height, width), dtype=bool)
+        self.composed = np.zeros((height, width, 3), dtype=np.uint8)
+        self.display = np.zeros((height, width, 3), dtype=np.uint8)
+        self.base = None
+        self.dirty = True
+        self._draft_roi = None
+
+    def set_base(self, frame):
+        self.base = frame
+        self.dirty = True
+
+    def add_zone(self, zone):
+        x1, y1, x2, y2 = zone['coords']
+        layer_mask = np.zeros(self.zone_mask.shape, dtype=np.uint8)
+        for img, color in ((self.zone_layer, ZONE_COLOR), (layer_mask, 255)):
+            cv2.rectangle(img, (x1, y1), (x2, y2), color, 2)
+            cv2.putText(img, zone['product'], (x1, max(y1 - 10, 15)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        self.zone_mask |= layer_mask.astype(bool)
+        self.dirty = True
+
+    def rebuild(self, zones):
+        self.zone_layer[:] = 0
+        self.zone_mask[:] = False
+        for zone in zones:
+            self.add_zone(zone)
+
+    def render(self, draft_rect=None, prompt=None):
+        """回傳要顯示的畫面；只有 composed 失效時才做整張合成。"""
+        if self.dirty:
+            np.copyto(self.composed, self.base)
+            np.copyto(self.composed, self.zone_layer, where=self.zone_mask[..., None])
+            np.copyto(self.display, self.composed)
+            self._draft_roi = None
+            self.dirty = False
+        elif self._draft_roi is not None:
+            x1, y1, x2, y2 = self._draft_roi
+            self.display[y1:y2, x1:x2] = self.composed[y1:y2, x1:x2]
+            self._draft_roi = None
+
+        if draft_rect is not None:
+            self._draft_roi = self._draw_draft(draft_rect, prompt)
+        return self.display
+
+    def _draw_draft(self, rect, prompt):
+        height, width = self.display.shape[:2]
+        x1, y1, x2, y2 = rect
+        xmin, xmax = sorted((x1, x2))
+        ymin, ymax = sorted((y1, y2))
+        cv2.rectangle(self.display, (xmin, ymin), (xmax, ymax), DRAFT_COLOR, 2)
+        roi = [xmin, ymin, xmax, ymax]
+        if prompt:
+            (tw, th), _ = cv2.getTextSize(prompt, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
+            ty = min(ymax + th + 12, height - 5)
+            cv2.rectangle(self.display, (xmin, ty - th - 8), (xmin + tw + 10, ty + 6), (0, 0, 0), -1)
+            cv2.putText(self.display, prompt, (xmin + 5, ty),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, DRAFT_COLOR, 2)
+            roi = [xmin, min(ymin, ty - th - 8), max(xmax, xmin + tw + 10), max(ymax, ty + 6)]
+        # 加上線寬的邊界，還原時才不會留下殘影
+        margin = 3
+        return (max(roi[0] - margin, 0), max(roi[1] - margin, 0),
+                min(roi[2] + margin, width), min(roi[3] + margin, height))
+
+
+class ZoneCreator:
+    def __init__(self, frames, zones=None):
+        self.frames = frames
+        self.index = 0
+        self.zones = list(zones or [])
+        self.zone_counter = len(self.zones) + 1
+        self.canvas = ZoneCanvas(frames[0].shape)
+        self.canvas.set_base(frames[0])
+        self.canvas.rebuild(self.zones)
+
+        self.drawing = False
+        self.ix, self.iy = -1, -1
+        self.current_rect = None
+        # 命名中的區域：在視窗內直接打字，不再卡在終端機 input()
+        self.pending_rect = None
+        self.name_buffer = ''
+        self.needs_redraw = True
+
+    def mouse_callback(self, event, x, y, flags, param):
+        if self.pending_rect is not None:
+            return
+
+        if event == cv2.EVENT_LBUTTONDOWN:
+            self.drawing = True
+            self.ix, self.iy = x, y
+            self.current_rect = None
+
+        elif event == cv2.EVENT_MOUSEMOVE:
+            if self.drawing:
+                self.current_rect = (self.ix, self.iy, x, y)
+                self.needs_redraw = True
+
+        elif event == cv2.EVENT_LBUTTONUP:
+            self.drawing = False
+            height, width = self.canvas.display.shape[:2]
+            # 拖出視窗外時夾回畫面範圍內
+            x1, x2 = (min(max(v, 0), width) for v in (self.ix, x))
+            y1, y2 = (min(max(v, 0), height) for v in (self.iy, y))
+            xmin, xmax = sorted([x1, x2])
+            ymin, ymax = sorted([y1, y2])
+            self.current_rect = None
+            if (xmax - xmin) > MIN_ZONE_SIZE and (ymax - ymin) > MIN_ZONE_SIZE:
+                self.pending_rect = (xmin, ymin, xmax, ymax)
+                self.name_buffer = ''
+                print(f"\n[區域 {self.zone_counter}] 請在視窗中輸入商品名稱，Enter 確認 / Esc 取消")
+            self.needs_redraw = True
 
-    elif event == cv2.EVENT_MOUSEMOVE:
-        if drawing:
-            current_rect = (ix, iy, x, y)
+    def seek(self, step):
+        self.index = (self.index + step) % len(self.frames)
+        self.canvas.set_base(self.frames[self.index])
+        self.needs_redraw = True
+        print(f"🎞️ 關鍵幀 {self.index + 1}/{len(self.frames)}")
+
+    def next_zone_id(self):
+        used = {z['id'] for z in self.zones}
+        counter = self.zone_counter
+        while f"zone_{counter}" in used:
+            counter += 1
+        return f"zone_{counter}"
+
+    def handle_name_key(self, key):
+        if key in KEY_ENTER:
+            product_name = self.name_buffer.strip() or f"Row_{self.zone_counter}"
+            new_zone = {
+                "id": self.next_zone_id(),
+                "product": product_name,
+                "coords": list(self.pending_rect),
+            }
+            self.zones.append(new_zone)
+            self.canvas.add_zone(new_zone)
+            print(f"👍 已新增: {product_name}")
+            self.zone_counter += 1
+            self.pending_rect = None
+        elif key == KEY_ESC:
+            print("✖️ 已取消此區域")
+            self.pending_rect = None
+        elif key in KEY_BACKSPACE:
+            self.name_buffer = self.name_buffer[:-1]
+        elif 32 <= key < 127:
+            self.name_buffer += chr(key)
+        else:
+            return
+        self.needs_redraw = True
+
+    def undo(self):
+        removed = self.zones.pop()
+        print(f"↩️ 已移除: {removed['product']}")
+        self.zone_counter -= 1
+        self.canvas.rebuild(self.zones)
+        self.needs_redraw = True
+
+    def frame(self):
+        if self.pending_rect is not None:
+            default_name = f"Row_{self.zone_counter}"
+            prompt = f"Name: {self.name_buffer or default_name}_"
+            return self.canvas.render(self.pending_rect, prompt)
+        return self.canvas.render(self.current_rect)
 
-    elif event == cv2.EVENT_LBUTTONUP:
-        drawing = False
-        current_rect = (ix, iy, x, y)
 
 def save_config(zones, width, height):
-    data = {
-        "description": "Shelf Area Config",
-        "resolution": [width, height],
-        "zones": zones
-    }
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
-    print(f"\n✅ 設定檔已儲存至: {os.path.abspath(OUTPUT_FILE)}")
-    print(f"   共包含 {len(zones)} 個區域")
+    try:
+        config = build_config(zones, (width, height))
+    except ZoneConfigError as e:
+        print(f"\n❌ 設定檔驗證失敗，未儲存: {e}")
+        return False
+    path = save_zone_config(config, OUTPUT_FILE)
+    print(f"\n✅ 設定檔已儲存至: {os.path.abspath(path)}")
+    print(f"   共包含 {len(config)} 個區域")
+    return True
+
+
+def load_existing_zones(width, height):
+    if not os.path.exists(OUTPUT_FILE):
+        return []
+    try:
+        config = load_zone_config(OUTPUT_FILE)
+    except ZoneConfigError as e:
+        print(f"⚠️ 無法載入既有設定檔，從空白開始: {e}")
+        return []
+    if not config.matches_resolution(width, height):
+        print(f"ℹ️ 既有設定檔解析度 {config.resolution} 與來源不同，已自動換算座標")
+    coords = config.scaled_coords(width, height)
+    return [
+        {"id": zid, "product": name, "coords": [int(v) for v in box]}
+        for zid, name, box in zip(config.ids, config.names, coords)
+    ]
+
 
 def main(args):
-    global zones, zone_counter, current_rect
-    
+    global OUTPUT_FILE
+    OUTPUT_FILE = args.output
+
     source = args.source
     if source.isdigit():
         source = int(source)
-    
-    print(f"📂 正在開啟來源: {source}")
-    cap = cv2.VideoCapture(source)
-    
-    if not cap.isOpened():
+
+    print(f"📂 正在開啟來源: {source}，抽樣 {args.keyframes} 張關鍵幀")
+    frames = load_keyframes(source, args.keyframes)
+
+    if not frames:
         print(f"❌ 無法開啟影片/鏡頭: {source}")
         return
 
     # 取得原始解析度
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    height, width = frames[0].shape[:2]
     print(f"ℹ️ 來源解析度: {width} x {height}")
 
+    zones = load_existing_zones(width, height) if args.append else []
+    creator = ZoneCreator(frames, zones)
+
     window_name = 'Zone Creator'
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.resizeWindow(window_name, 1024, 600)
-    cv2.setMouseCallback(window_name, mouse_callback)
+    cv2.setMouseCallback(window_name, creator.mouse_callback)
 
     print("="*50)
     print(f"🎯 區域標記工具 (Zone Creator)")
     print("="*50)
-    print("💡 視窗可自由縮放，配合 p 暫停來慢慢標記。")
+    print("💡 視窗可自由縮放，只會解碼抽樣的關鍵幀。")
     print("1. [滑鼠拖拉] 畫出 '整排貨架' 的大範圍")
-    print("2. [終端機] 輸入名稱 (如: Coke)")
-    print("3. [按 p] 暫停/繼續播放")
-    print("4. [按 s] 存檔")
+    print("2. [視窗內打字] 輸入名稱 (如: Coke)，Enter 確認 / Esc 取消")
+    print("3. [按 , / .] 切換上一張/下一張關鍵幀")
+    print("4. [按 z] 復原，[按 s] 存檔，[按 q] 離開")
     print("="*50)
 
-    paused = False
-    frame = None
-
     while True:
-        if not paused:
-            ret, next_frame = cap.read()
-            if not ret:
-                if isinstance(source, str):
-                    print("影片播放結束，已自動回到開頭。")
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                    continue
-                break
-            frame = next_frame
-        elif frame is None:
-            # 尚未讀到畫面就按暫停，直接跳過一次迴圈
-            paused = False
-            continue
+        if creator.needs_redraw:
+            cv2.imshow(window_name, creator.frame())
+            creator.needs_redraw = False
 
-        display_frame = frame.copy()
-
-        for z in zones:
-            x1, y1, x2, y2 = z['coords']
-            cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(display_frame, z['product'], (x1, y1-10), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-
-        if current_rect:
-            x1, y1, x2, y2 = current_rect
-            cv2.rectangle(display_frame, (x1, y1), (x2, y2), (0, 255, 255), 2)
+        key = cv2.waitKey(15)
+        if key < 0:
+            continue
+        key &= 0xFF
 
-        cv2.imshow(window_name, display_frame)
-        
-        delay = 1 if paused else (30 if isinstance(source, str) else 1)
-        key = cv2.waitKey(delay) & 0xFF
+        # 命名中：所有按鍵都當作文字輸入
+        if creator.pending_rect is not None:
+            creator.handle_name_key(key)
+            continue
 
-        # 輸入邏輯
-        if not drawing and current_rect is not None:
-            x1, y1, x2, y2 = current_rect
-            # 確保座標順序正確
-            xmin, xmax = sorted([x1, x2])
-            ymin, ymax = sorted([y1, y2])
-            
-            # 防呆：避免點一下變成一個點
-            if (xmax - xmin) > 10 and (ymax - ymin) > 10:
-                # 暫停畫面
-                temp = display_frame.copy()
-                cv2.rectangle(temp, (xmin, ymin), (xmax, ymax), (0, 255, 255), 2)
-                cv2.imshow(window_name, temp)
-                cv2.waitKey(1)
-                
-                print(f"\n[區域 {zone_counter}]")
-                product_name = input(f"請輸入整排商品名稱 (例如 Coke): ").strip()
-                
-                if not product_name:
-                    product_name = f"Row_{zone_counter}"
-                
-                new_zone = {
-                    "id": f"zone_{zone_counter}",
-                    "product": product_name,
-                    "coords": [xmin, ymin, xmax, ymax]
-                }
-                zones.append(new_zone)
-                print(f"👍 已新增: {product_name}")
-                zone_counter += 1
-            current_rect = None
-
-        if key == ord('p'):
-            paused = not paused
-            state = "已暫停" if paused else "繼續播放"
-            print(f"⏯️ {state}")
+        if key == ord('.'):
+            creator.seek(1)
+        elif key == ord(','):
+            creator.seek(-1)
         elif key == ord('q'):
             break
-        elif key == ord('z') and zones:
-            removed = zones.pop()
-            print(f"↩️ 已移除: {removed['product']}")
-            zone_counter -= 1
+        elif key == ord('z') and creator.zones:
+            creator.undo()
         elif key == ord('s'):
-            save_config(zones, width, height)
-            break
+            if save_config(creator.zones, width, height):
+                break
 
-    cap.release()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--source', type=str, default='0')
+    parser.add_argument('--keyframes', type=int, default=KEYFRAME_COUNT, help='抽樣的關鍵幀數量')
+    parser.add_argument('--output', type=str, default=OUTPUT_FILE, help='設定檔輸出路徑')
+    parser.add_argument('--append', action='store_true', help='載入既有設定檔並繼續新增區域')
     args = parser.parse_args()
-    
-    main(args)
\ No newline at end of file
+
+    main(args)
@@ -0,0 +1,316 @@
+"""Embedded time-series store for per-zone stock / missing / blocked history.
+
+Samples are queued by the monitors on the hot path and written in batches
+by a background thread into SQLite (WAL mode). Raw points are kept at one
+row per camera/zone/second and rolled up into minute and hour tables, each
+with its own retention period. Rollups and retention follow each camera's
+own sample clock, so video-time history (offline files, replays) rolls up
+the same way as wall-clock history from live cameras.
+"""
+from __future__ import annotations
+
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+DEFAULT_DB_PATH = Path("history/zone_history.db")
+FLUSH_INTERVAL_SECONDS = 2.0
+RETENTION_CHECK_INTERVAL_SECONDS = 3600.0
+ROLLUP_GRACE_SECONDS = 10.0  # wait this long after a bucket closes before rolling it up
+
+# (table, bucket seconds) from finest to coarsest
+TABLES = (("samples_raw", 1), ("samples_1m", 60), ("samples_1h", 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    camera TEXT NOT NULL,
+    zone TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    n_blocked INTEGER NOT NULL,
+    stock_sum REAL NOT NULL,
+    stock_min REAL,
+    stock_max REAL,
+    missing_sum REAL NOT NULL,
+    missing_max REAL,
+    PRIMARY KEY (camera, zone, ts)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO {table} (camera, zone, ts, n, n_blocked, stock_sum, stock_min, stock_max, missing_sum, missing_max)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (camera, zone, ts) DO UPDATE SET
+    n = n + excluded.n,
+    n_blocked = n_blocked + excluded.n_blocked,
+    stock_sum = stock_sum + excluded.stock_sum,
+    stock_min = MIN(COALESCE(stock_min, excluded.stock_min), COALESCE(excluded.stock_min, stock_min)),
+    stock_max = MAX(COALESCE(stock_max, excluded.stock_max), COALESCE(excluded.stock_max, stock_max)),
+    missing_sum = missing_sum + excluded.missing_sum,
+    missing_max = MAX(COALESCE(missing_max, excluded.missing_max), COALESCE(excluded.missing_max, missing_max))
+"""
+
+ROLLUP = """
+INSERT OR REPLACE INTO {target} (camera, zone, ts, n, n_blocked, stock_sum, stock_min, stock_max, missing_sum, missing_max)
+SELECT camera, zone, (ts / {bucket}) * {bucket} AS bucket_ts,
+       SUM(n), SUM(n_blocked), SUM(stock_sum), MIN(stock_min), MAX(stock_max), SUM(missing_sum), MAX(missing_max)
+FROM {source}
+WHERE camera = ? AND ts >= ? AND ts < ?
+GROUP BY camera, zone, bucket_ts
+"""
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """How long each resolution is kept, in seconds (``None`` keeps forever)."""
+
+    raw: float | None = 3 * 86400
+    minute: float | None = 60 * 86400
+    hour: float | None = None
+
+    def for_table(self, table: str) -> float | None:
+        return {"samples_raw": self.raw, "samples_1m": self.minute, "samples_1h": self.hour}[table]
+
+
+def connect(path: str | Path) -> sqlite3.Connection:
+    db_path = Path(path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for table, _ in TABLES:
+        conn.execute(SCHEMA.format(table=table))
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(rollup_state)")]
+    if columns and "camera" not in columns:
+        # Single watermark per table from older files: rollups are idempotent, so start over per camera
+        conn.execute("DROP TABLE rollup_state")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS rollup_state ("
+        "target TEXT NOT NULL, camera TEXT NOT NULL, watermark INTEGER NOT NULL, PRIMARY KEY (target, camera))"
+    )
+    conn.commit()
+    return conn
+
+
+class ZoneHistoryStore:
+    """Batched writer and range-query API over the zone history database.
+
+    ``record`` only appends to a queue, so it is safe to call once per zone
+    per frame from the inference loop; everything else happens on the writer
+    thread. Readers may open the same file concurrently thanks to WAL.
+    """
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_DB_PATH,
+        retention: RetentionPolicy | None = None,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+    ):
+        self.path = Path(path)
+        self.retention = retention or RetentionPolicy()
+        self.flush_interval = flush_interval
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._conn = connect(self.path)
+        self._db_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._last_retention = 0.0
+        self._latest: dict[str, float] = {}  # newest sample time per camera: the clock for rollups / retention
+        self._thread = threading.Thread(target=self._run, name="zone-history-writer", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------ write
+    def record(
+        self,
+        camera: str,
+        zone: str,
+        stock: int | None,
+        missing: int | None,
+        blocked: bool = False,
+        ts: float | None = None,
+    ) -> None:
+        """Queue one per-frame sample; ``stock``/``missing`` are ignored while blocked."""
+        self._queue.put((camera, zone, time.time() if ts is None else ts, stock, missing, blocked))
+
+    def pending(self) -> int:
+        """Samples queued but not yet written (approximate)."""
+        return self._queue.qsize()
+
+    def flush(self) -> int:
+        """Write everything queued so far and roll up closed buckets; return rows written."""
+        buckets: dict[tuple[str, str, int], list] = {}
+        while True:
+            try:
+                camera, zone, ts, stock, missing, blocked = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            key = (camera, zone, int(ts))
+            if ts > self._latest.get(camera, float("-inf")):
+                self._latest[camera] = ts
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = [0, 0, 0.0, None, None, 0.0, None]
+            agg[0] += 1
+            if blocked or stock is None:
+                agg[1] += 1
+                continue
+            missing = missing or 0
+            agg[2] += stock
+            agg[3] = stock if agg[3] is None else min(agg[3], stock)
+            agg[4] = stock if agg[4] is None else max(agg[4], stock)
+            agg[5] += missing
+            agg[6] = missing if agg[6] is None else max(agg[6], missing)
+
+        with self._db_lock:
+            if buckets:
+                rows = [(cam, zone, ts, *agg) for (cam, zone, ts), agg in buckets.items()]
+                with self._conn:
+                    self._conn.executemany(UPSERT.format(table="samples_raw"), rows)
+            for camera, latest in self._latest.items():
+                self._rollup(camera, latest)
+            now = time.monotonic()
+            if now - self._last_retention >= RETENTION_CHECK_INTERVAL_SECONDS:
+                for camera, latest in self._latest.items():
+                    self._apply_retention(camera, latest)
+                self._last_retention = now
+        return len(buckets)
+
+    def _rollup(self, camera: str, now: float) -> None:
+        for (source, _), (target, bucket) in zip(TABLES, TABLES[1:]):
+            closed_until = int((now - ROLLUP_GRACE_SECONDS) // bucket) * bucket
+            row = self._conn.execute(
+                "SELECT watermark FROM rollup_state WHERE target = ? AND camera = ?", (target, camera)
+            ).fetchone()
+            if row is None:
+                first = self._conn.execute(f"SELECT MIN(ts) FROM {source} WHERE camera = ?", (camera,)).fetchone()[0]
+                if first is None:
+                    continue
+                watermark = (first // bucket) * bucket
+            else:
+                watermark = row[0]
+            if watermark >= closed_until:
+                continue
+            with self._conn:
+                self._conn.execute(
+                    ROLLUP.format(target=target, source=source, bucket=bucket), (camera, watermark, closed_until)
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rollup_state (target, camera, watermark) VALUES (?, ?, ?)",
+                    (target, camera, closed_until),
+                )
+
+    def _apply_retention(self, camera: str, now: float) -> None:
+        with self._conn:
+            for table, _ in TABLES:
+                keep = self.retention.for_table(table)
+                if keep is not None:
+                    self._conn.execute(f"DELETE FROM {table} WHERE camera = ? AND ts < ?", (camera, int(now - keep)))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as exc:
+                print(f"[history] Flush failed: {exc}")
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=self.flush_interval * 2)
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+    # ------------------------------------------------------------------- read
+    def query(self, *args, **kwargs) -> list[dict]:
+        with self._db_lock:
+            return query_range(self._conn, *args, **kwargs)
+
+
+def pick_table(start: float, end: float, resolution: str = "auto") -> str:
+    if resolution != "auto":
+        return {"raw": "samples_raw", "minute": "samples_1m", "hour": "samples_1h"}[resolution]
+    span = end - start
+    if span <= 2 * 3600:
+        return "samples_raw"
+    if span <= 7 * 86400:
+        return "samples_1m"
+    return "samples_1h"
+
+
+def query_range(
+    conn: sqlite3.Connection,
+    camera: str,
+    zone: str | None,
+    start: float,
+    end: float,
+    resolution: str = "auto",
+) -> list[dict]:
+    """Return samples for ``camera`` (and ``zone`` if given) with ``start <= ts < end``.
+
+    Uses the primary-key index ``(camera, zone, ts)``; ``resolution='auto'``
+    picks raw seconds for spans up to 2 h, minutes up to a week, hours beyond.
+    """
+    table = pick_table(start, end, resolution)
+    sql = (
+        f"SELECT zone, ts, n, n_blocked, stock_sum, stock_min, stock_max, missing_sum, missing_max "
+        f"FROM {table} WHERE camera = ?"
+    )
+    params: list = [camera]
+    if zone is not None:
+        sql += " AND zone = ?"
+        params.append(zone)
+    sql += " AND ts >= ? AND ts < ? ORDER BY zone, ts"
+    params += [int(start), int(end)]
+
+    results = []
+    for zone_id, ts, n, n_blocked, stock_sum, stock_min, stock_max, missing_sum, missing_max in conn.execute(sql, params):
+        valid = n - n_blocked
+        results.append({
+            "zone": zone_id,
+            "ts": ts,
+            "stock": stock_sum / valid if valid else None,
+            "stock_min": stock_min,
+            "stock_max": stock_max,
+            "missing": missing_sum / valid if valid else None,
+            "missing_max": missing_max,
+            "blocked_ratio": n_blocked / n if n else 0.0,
+        })
+    return results
+
+
+def parse_duration(text: str) -> float:
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Query zone stock history")
+    parser.add_argument("--db", type=str, default=str(DEFAULT_DB_PATH))
+    parser.add_argument("--camera", type=str, required=True)
+    parser.add_argument("--zone", type=str)
+    parser.add_argument("--since", type=str, default="1h", help="look-back window, e.g. 90s, 30m, 12h, 7d")
+    parser.add_argument("--resolution", choices=["auto", "raw", "minute", "hour"], default="auto")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    end = time.time()
+    start = end - parse_duration(args.since)
+    started = time.perf_counter()
+    rows = query_range(conn, args.camera, args.zone, start, end, args.resolution)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for row in rows:
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["ts"]))
+        stock = "-" if row["stock"] is None else f"{row['stock']:.1f}"
+        missing = "-" if row["missing"] is None else f"{row['missing']:.1f}"
+        print(f"{stamp}  {row['zone']:<10} stock={stock:>5} missing={missing:>5} blocked={row['blocked_ratio']:.0%}")
+    print(f"[history] {len(rows)} rows from {pick_table(start, end, args.resolution)} in {elapsed_ms:.1f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
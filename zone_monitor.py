@@ -1,13 +1,27 @@
 import cv2
-import json
 import argparse
+import json
 import sys
 from pathlib import Path
 import numpy as np
 import time
 from collections import deque  # 新增：用來記錄歷史數據
-from ultralytics import YOLO
-import paho.mqtt.client as mqtt
+from concurrent.futures import ThreadPoolExecutor
+from cascade import COARSE_SCALE, DetectionCascade, merge_crops
+from change_gate import ZoneChangeGate, crop_boxes, crop_detections
+from detection_log import DetectionRecorder, ReplayCapture, ReplayDetector
+from detector_backends import BACKENDS, load_detector, warmup
+from evidence import FORMATS as EVIDENCE_FORMATS, EvidenceWriter
+from frame_bus import BUS_PREFIX, open_capture
+from latest_frame import LatestFrameCapture, is_live_source
+from live_view import LiveViewServer
+from metrics import Counter, Gauge, Histogram, start_metrics_server
+from qos_controller import RENDER_FULL, RENDER_NONE, QosController
+from restock_alerts import RestockAlertEngine
+from startup import StartupTimeline
+from width_priors import WidthPriors, default_path as default_width_priors_path
+from zone_config import ConfigWatcher, ZoneConfigError, check_resolution, zone_membership
+from zone_history import ZoneHistoryStore
 
 # ==========================================
 # 參數設定
@@ -20,21 +34,41 @@ HISTORY_LEN = 30        # 參考過去多少幀的數據 (30幀約等於1秒)
 DROP_RATIO = 0.6        # 驟降比例 (當前數量 < 平均數量 * 0.6 視為被遮擋)
 # ----------------------------------
 
+# --- 變動偵測 (Motion Gate) 設定 ---
+MAX_CROP_ZONES = 3          # 變動區域不超過此數量時只推論裁切畫面，否則整張推論
+GATE_REPORT_INTERVAL = 300  # 每隔幾幀輸出一次略過比例
+# ----------------------------------
+
+# --- 監控指標 (Prometheus 格式，--metrics-port 啟用) ---
+FRAMES_TOTAL = Counter("shelf_frames_total", "Frames processed")
+FRAMES_SKIPPED = Counter("shelf_frames_skipped_total", "Frames where inference was skipped (motion gate or QoS frame stride)")
+INFERENCE_SECONDS = Histogram("shelf_inference_seconds", "Detector latency per frame", ("mode",))
+FRAME_SECONDS = Histogram("shelf_frame_seconds", "End-to-end processing time per frame")
+ZONE_STOCK = Gauge("shelf_zone_stock", "Detected items per zone", ("zone",))
+ZONE_MISSING = Gauge("shelf_zone_missing", "Missing slots per zone", ("zone",))
+ZONES_BLOCKED = Gauge("shelf_zones_blocked", "Zones currently occluded")
+RESTOCK_ALERTS = Gauge("shelf_restock_alerts", "Zones with an active restock alert")
+FRAME_AGE = Histogram("shelf_frame_age_seconds", "Capture-to-inference age of live frames (--latest-frame)")
+HISTORY_QUEUE = Gauge("shelf_history_queue_depth", "Samples waiting for the history writer")
+MQTT_PUBLISHES = Counter("shelf_mqtt_publish_total", "MQTT publish attempts", ("result",))
+# ----------------------------------
+
 # MQTT 設定
 MQTT_BROKER = "broker.emqx.io"
 MQTT_PORT = 1883
 MQTT_TOPIC = "smart_retail/amber/shelf"
+PUBLISH_INTERVAL = 1.0  # 每隔幾秒發布一次區域狀態 (補貨提醒改變時立即發布)
 
 # ==========================================
 
 def load_config(config_path):
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            print(f"✅ 成功載入設定檔: {config_path}")
-            return json.load(f)
-    except Exception as e:
+        watcher = ConfigWatcher(config_path)
+    except ZoneConfigError as e:
         print(f"⚠️ 無法讀取設定檔: {e}，請確認是否已建立 config.json")
         sys.exit(1)
+    print(f"✅ 成功載入設定檔: {config_path} ({len(watcher.current)} 個區域)")
+    return watcher
 
 def draw_dashed_rect(img, pt1, pt2, color, thickness=2, style='dotted'):
     points = [pt1, (pt2[0], pt1[1]), pt2, (pt1[0], pt2[1])]
@@ -43,16 +77,22 @@ def draw_dashed_rect(img, pt1, pt2, color, thickness=2, style='dotted'):
         p2 = points[(i+1)%4]
         cv2.line(img, p1, p2, color, thickness)
 
-def detect_gaps_in_zone(boxes, zone_coords):
+def detect_gaps_in_zone(boxes, zone_coords, avg_width=None):
+    """avg_width: 單一商品寬度 (來自 width_priors)，未提供時用本幀框的平均寬度。"""
     zx1, zy1, zx2, zy2 = zone_coords
     
     # 如果 boxes 是空的，由主程式決定是否回傳空，這裡單純處理邏輯
     if len(boxes) < 1:
-        return [(zx1, zy1, zx2, zy2)], 0
+        if not avg_width:
+            return [(zx1, zy1, zx2, zy2)], 0
+        # 已知商品寬度：整個區域換算成缺貨格數
+        missing_count = max(int((zx2 - zx1) // avg_width), 1)
+        slot = (zx2 - zx1) / missing_count
+        return [(int(zx1 + i * slot), zy1, int(zx1 + (i + 1) * slot), zy2) for i in range(missing_count)], avg_width
 
     sorted_boxes = sorted(boxes, key=lambda b: b[0])
-    widths = [b[2] - b[0] for b in sorted_boxes]
-    avg_width = float(np.mean(widths))
+    if not avg_width:
+        avg_width = float(np.mean([b[2] - b[0] for b in sorted_boxes]))
     
     gaps = []
 
@@ -93,15 +133,113 @@ def detect_gaps_in_zone(boxes, zone_coords):
 
     return gaps, avg_width
 
-def run_monitor(args):
-    config = load_config(args.config)
-    zones = config.get('zones', [])
-    
-    print(f"🚀 載入模型: {args.weights}")
-    model = YOLO(args.weights)
-    
-    # 建立每個區域的歷史紀錄器 { 'zone_id': deque([10, 10, 9...]) }
-    zone_histories = {zone['id']: deque(maxlen=HISTORY_LEN) for zone in zones}
+def analyze_zone(zone_boxes, zone_coords, history, priors=None, key=None):
+    """單一區域的現貨/缺貨判斷 (含防遮擋機制)，回傳可重複使用的結果。
+
+    priors: WidthPriors，依區域 key 累積商品寬度，稀疏或全空的區域也能換算缺貨格數。
+    """
+    current_count = len(zone_boxes)
+
+    # =========================================================
+    # 🔥 新增：防遮擋機制 (Anti-Occlusion Logic)
+    # =========================================================
+    # 計算歷史平均 (避免除以零)
+    avg_count = sum(history) / len(history) if len(history) > 0 else current_count
+
+    # 判斷是否被遮擋：
+    # 條件1: 歷史數據要足夠 (至少累積 10 幀，避免剛開機就誤判)
+    # 條件2: 當前數量 < 平均數量 * 0.6 (驟降 40% 以上)
+    is_blocked = False
+    if len(history) > 10 and current_count < avg_count * DROP_RATIO:
+        is_blocked = True
+
+    # 更新歷史數據 (如果被遮擋，就不要把這個異常低的數字寫入歷史，以免拉低平均)
+    if not is_blocked:
+        history.append(current_count)
+    # =========================================================
+
+    result = {"boxes": zone_boxes, "stock": current_count, "blocked": is_blocked, "gaps": [], "missing": 0}
+    if not is_blocked:
+        # ✅ 狀態：正常 (執行缺貨偵測)
+        avg_width = None
+        if priors is not None:
+            # 被遮擋的幀不會走到這裡，寬度先驗只從正常畫面學習
+            avg_width = priors.estimate(key, [b[2] - b[0] for b in zone_boxes], zone_coords[2] - zone_coords[0])
+        gaps, _ = detect_gaps_in_zone(zone_boxes, list(zone_coords), avg_width)
+        result["gaps"] = gaps
+        result["missing"] = len(gaps)
+    return result
+
+def draw_zone_result(frame, p_name, zone_coords, result, render=RENDER_FULL):
+    if render == RENDER_NONE:
+        return
+    zx1, zy1, zx2, zy2 = zone_coords
+
+    # 畫出區域框 (黃色)
+    cv2.rectangle(frame, (zx1, zy1), (zx2, zy2), (0, 255, 255), 1)
+    if render == RENDER_FULL:
+        for x1, y1, x2, y2 in result["boxes"]:
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+
+    if result["blocked"]:
+        # ⚠️ 狀態：被遮擋
+        # 顯示黃色警告，不計算缺貨，不畫紅框
+        warning_text = "VIEW BLOCKED"
+        text_size, _ = cv2.getTextSize(warning_text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
+        # 在區域中央顯示警告
+        center_x_zone = (zx1 + zx2) // 2 - text_size[0] // 2
+        center_y_zone = (zy1 + zy2) // 2
+
+        cv2.rectangle(frame, (center_x_zone-5, center_y_zone-25), 
+                     (center_x_zone + text_size[0]+5, center_y_zone+5), (0, 255, 255), -1)
+        cv2.putText(frame, warning_text, (center_x_zone, center_y_zone), 
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        return
+
+    for gx1, gy1, gx2, gy2 in result["gaps"]:
+        draw_dashed_rect(frame, (gx1, gy1), (gx2, gy2), (0, 0, 255), 2)
+        cv2.putText(frame, "EMPTY", (gx1, gy1+20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
+
+    info_text = f"{p_name}: {result['stock']}"
+    cv2.putText(frame, info_text, (zx1, zy1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+
+def zone_record(frame_idx, ts, zone_ids, zone_results):
+    """單幀的區域結果 (寫入 --results 的 JSONL，每行一幀)。"""
+    return {
+        "frame": frame_idx,
+        "ts": round(ts, 3),
+        "zones": {
+            zid: {
+                "stock": zone_results[zid]["stock"],
+                "missing": zone_results[zid]["missing"],
+                "blocked": zone_results[zid]["blocked"],
+            }
+            for zid in zone_ids
+        },
+    }
+
+def detect_scaled(model, frame, scale):
+    """縮小畫面推論 (QoS 降級)，再把座標換回原始解析度。"""
+    if scale >= 1.0:
+        return model(frame)
+    small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    dets = model(small)
+    if len(dets):
+        dets = dets.copy()
+        dets[:, :4] /= scale
+    return dets
+
+def detect_in_zones(model, frame, zone_coords, zone_indices):
+    """只對變動區域的裁切畫面推論，並把座標換回整張畫面。
+
+    相鄰區域的裁切範圍會重疊：先合併重疊的裁切，每個商品只保留負責其所在區域的那一次偵測，避免重複計數。
+    """
+    coords = zone_coords[zone_indices]
+    return crop_detections(model, frame, coords, merge_crops(crop_boxes(coords, frame.shape)))
+
+def connect_mqtt():
+    # paho 延遲載入：只有即時監控需要，離線/平行處理的 worker 不必付出匯入成本
+    import paho.mqtt.client as mqtt
 
     client = mqtt.Client()
     try:
@@ -110,121 +248,436 @@ def run_monitor(args):
         print("📡 MQTT 連線成功")
     except:
         print("⚠️ MQTT 連線失敗 (可忽略)")
+    return client
+
+def publish_state(client, payload):
+    from paho.mqtt.client import MQTT_ERR_SUCCESS
+
+    result = client.publish(MQTT_TOPIC, json.dumps(payload, ensure_ascii=False), qos=1)
+    ok = result.rc == MQTT_ERR_SUCCESS
+    MQTT_PUBLISHES.labels("success" if ok else "failure").inc()
+    return ok
+
+def run_monitor(args):
+    timeline = StartupTimeline()
+    if getattr(args, "metrics_port", None):
+        start_metrics_server(args.metrics_port)
+        print(f"📈 監控指標: http://0.0.0.0:{args.metrics_port}/metrics")
+    watcher = load_config(args.config)
+    timeline.mark("config")
+
+    # 冷啟動：模型載入與 MQTT 連線在背景同時進行，主執行緒先開啟影像來源
+    replay = getattr(args, "replay", None)
+    backend = getattr(args, "backend", "auto")
+    startup_pool = ThreadPoolExecutor(max_workers=2)
+    mqtt_future = startup_pool.submit(connect_mqtt)
 
     source = int(args.source) if args.source.isdigit() else args.source
-    cap = cv2.VideoCapture(source)
+    if replay:
+        # 重播偵測紀錄：不需要權重，畫面來自原始影片 (--source 為檔案時) 或空白畫布
+        print(f"⏯️ 重播偵測紀錄: {replay}")
+        model = ReplayDetector(replay)
+        cap = ReplayCapture(model.log, video=source if isinstance(source, str) else None,
+                            realtime=getattr(args, "realtime", False))
+        meta = model.log.metadata
+        if meta.get("motion_gate") or meta.get("qos"):
+            print("ℹ️ 紀錄時啟用了變動偵測 / 自動畫質：依紀錄的逐幀區域遮罩重播")
+        if meta.get("zones") and meta["zones"] != list(watcher.current.ids):
+            print("⚠️ 紀錄時的區域與目前設定檔不同，逐幀區域遮罩可能對不上")
+        source = replay
+        timeline.mark("capture")
+    else:
+        print(f"🚀 載入模型: {args.weights} (backend={backend})")
+        model_future = startup_pool.submit(load_detector, args.weights, backend=backend)
+        # bus:<name> 讀取 frame_bus.py 解碼好的共享記憶體畫面，多個程式共用一次解碼
+        if getattr(args, "latest_frame", False) and is_live_source(source):
+            # 背景執行緒持續讀取，推論永遠拿最新的一幀；斷線時自動重連
+            cap = LatestFrameCapture(source, tag="monitor")
+            if not cap.connected:
+                print(f"⚠️ 無法開啟影像來源 {args.source}，背景持續重試連線")
+        else:
+            if getattr(args, "latest_frame", False):
+                print("ℹ️ --latest-frame 只用於攝影機 / 網路串流，影片檔與 bus: 來源照常讀取")
+            cap = open_capture(source)
+        timeline.mark("capture")
+        model = model_future.result()
+    timeline.mark("model")
+
+    # 以串流解析度跑幾張假畫面，避免第一幀承擔推論圖初始化的延遲
+    stream_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or watcher.current.resolution[0]
+    stream_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or watcher.current.resolution[1]
+    warmup(model, stream_h, stream_w)
+    timeline.mark("warmup")
+
+    # 自動畫質：依實測延遲調整縮放 / imgsz / 跳幀 / 繪圖，維持目標 fps 或延遲預算
+    qos = None
+    if getattr(args, "target_fps", None) or getattr(args, "latency_budget_ms", None):
+        if replay:
+            print("⚠️ 重播模式不支援自動畫質，已停用 --target-fps / --latency-budget-ms")
+        else:
+            qos = QosController(target_fps=args.target_fps, latency_budget_ms=args.latency_budget_ms)
+            qos.apply(model)
+            print(f"🎚️ 自動畫質: 每幀預算 {qos.budget * 1000:.1f} ms")
+
+    # 兩階段推論：先低解析度整張，只有不確定的區域再用原始解析度裁切推論
+    cascade = None
+    if getattr(args, "cascade", False):
+        if replay:
+            print("⚠️ 重播模式不支援兩階段推論，已停用 --cascade")
+        elif qos:
+            print("⚠️ 自動畫質已控制推論解析度，已停用 --cascade")
+        else:
+            cascade = DetectionCascade(coarse_scale=args.cascade_scale)
+            print(f"🔍 兩階段推論: 粗略縮放 {cascade.coarse_scale}，不確定區域以原始解析度重新推論")
+
+    client = mqtt_future.result()
+    timeline.mark("mqtt")
+    startup_pool.shutdown(wait=False)
+
+    # 建立每個區域的歷史紀錄器 { 'zone_id': deque([10, 10, 9...]) }
+    # 設定檔熱更新時保留既有區域的歷史，新區域才重新建立
+    zone_histories = {zid: deque(maxlen=HISTORY_LEN) for zid in watcher.current.ids}
+
+    # 每個區域的商品寬度先驗 (EWMA)，--width-priors 時存在 config.json 旁邊，重啟後沿用
+    width_priors_path = getattr(args, "width_priors", None)
+    if width_priors_path:
+        if width_priors_path == "auto":
+            width_priors_path = default_width_priors_path(args.config)
+        width_priors = WidthPriors.load(width_priors_path)
+        print(f"📏 商品寬度先驗: {width_priors_path} ({width_priors.summary()})")
+    else:
+        width_priors = WidthPriors()
+
+    # 畫面變動偵測：畫面靜止時沿用上一次的區域結果，不做推論
+    gate = ZoneChangeGate() if getattr(args, "motion_gate", False) else None
+    if gate and replay:
+        print("⚠️ 重播模式不支援變動偵測，已停用 --motion-gate")
+        gate = None
+    zone_results = {}
+
+    # 歷史數據 (背景執行緒批次寫入，不影響推論迴圈)
+    history_store = None
+    on_bus = isinstance(source, str) and source.startswith(BUS_PREFIX)
+    live_source = is_live_source(source) or on_bus
+    latest = isinstance(cap, LatestFrameCapture)
+    camera_id = getattr(args, "camera_id", None) or (
+        f"cam{source}" if isinstance(source, int) else source[len(BUS_PREFIX):] if on_bus else Path(source).stem)
+    if getattr(args, "history_db", None):
+        history_store = ZoneHistoryStore(args.history_db)
+        HISTORY_QUEUE.set_function(history_store.pending)
+        print(f"🗄️ 歷史數據寫入: {args.history_db} (camera={camera_id})")
+
+    # 補貨提醒：遲滯 + 最短持續時間，只在狀態改變時輸出
+    # 只依缺貨格數觸發：區域內的商品數量差異很大，沒有共用的「庫存偏低」門檻
+    alerts = RestockAlertEngine(raise_stock=None, clear_stock=None)
+    RESTOCK_ALERTS.set_function(alerts.__len__)
+    zone_names = {}
 
     video_writer = None
     output_path = Path(args.output) if getattr(args, "output", None) else None
     if output_path:
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
+    results_file = None
+    if getattr(args, "results", None):
+        Path(args.results).parent.mkdir(parents=True, exist_ok=True)
+        results_file = open(args.results, "w", encoding="utf-8")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    # 偵測紀錄：每幀的 boxes.data 寫入可重播的二進位檔
+    recorder = None
+    if getattr(args, "record_detections", None):
+        recorder = DetectionRecorder(
+            args.record_detections, stream_w, stream_h, fps,
+            metadata={"source": str(source), "weights": str(args.weights), "backend": model.backend,
+                      "names": model.names, "zones": list(watcher.current.ids),
+                      "motion_gate": gate is not None, "qos": qos is not None},
+        )
+        print(f"⏺️ 偵測紀錄寫入: {args.record_detections}")
+    headless = getattr(args, "headless", False)
+
+    # 遠端即時畫面：每個預覽幀只編碼一次 JPEG，所有瀏覽器共用，沒人觀看時不編碼
+    live = None
+    if getattr(args, "live_port", None):
+        live = LiveViewServer(args.live_port, title=f"Smart Gap Monitor - {camera_id}")
+        print(f"📺 即時畫面: http://0.0.0.0:{args.live_port}/")
+
+    # 缺貨證據：區域狀態改變時只存該區域的裁切圖 + JSON，取代整段錄影
+    evidence = None
+    if getattr(args, "evidence", None):
+        evidence = EvidenceWriter(args.evidence, camera_id, fmt=args.evidence_format,
+                                  min_interval=args.evidence_interval)
+        print(f"📸 缺貨證據寫入: {evidence.out_dir} ({args.evidence_format}，每區至少間隔 {args.evidence_interval:.0f}s)")
+
+    checked_version = 0
+    last_publish_ts = None
+    publish_failed = False
+    infer_time = 0.0
+    frame_idx = -1
+    loop_started = time.perf_counter()
+    age_total = 0.0
+
     while True:
         ret, frame = cap.read()
         if not ret: break
+        frame_idx += 1
+        frame_started = time.perf_counter()
+        if latest:
+            age = cap.age()
+            age_total += age
+            FRAME_AGE.observe(age)
+            if frame_idx % GATE_REPORT_INTERVAL == GATE_REPORT_INTERVAL - 1:
+                report_latest_stats(cap, age_total / (frame_idx + 1))
+
+        # 只在幀與幀之間切換設定，確保單一幀內使用同一份區域
+        if watcher.poll():
+            zone_histories = {
+                zid: zone_histories.get(zid, deque(maxlen=HISTORY_LEN)) for zid in watcher.current.ids
+            }
+            zone_results = {}
+            if gate:
+                gate.reset()
+            ZONE_STOCK.clear()
+            ZONE_MISSING.clear()
+        config = watcher.current
+        height, width = frame.shape[:2]
+        if checked_version != watcher.version:
+            warning = check_resolution(config, width, height)
+            if warning:
+                print(f"⚠️ {warning}")
+            checked_version = watcher.version
+        zone_coords = config.scaled_coords(width, height)
 
-        results = model(frame, verbose=False)
-        detections = results[0].boxes.data.tolist()
-
-        mqtt_payload = {"total_gaps": 0, "details": {}}
-
-        for zone in zones:
-            zid = zone['id']
-            p_name = zone['product']
-            zx1, zy1, zx2, zy2 = zone['coords']
-            
-            # 畫出區域框 (黃色)
-            cv2.rectangle(frame, (zx1, zy1), (zx2, zy2), (0, 255, 255), 1)
-
-            # 3.1 找出區域內的物體
-            zone_boxes = []
-            for det in detections:
-                x1, y1, x2, y2, conf, cls = det
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
-                if zx1 < center_x < zx2 and zy1 < center_y < zy2:
-                    zone_boxes.append([x1, y1, x2, y2])
-                    cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-
-            current_count = len(zone_boxes)
-            
-            # =========================================================
-            # 🔥 新增：防遮擋機制 (Anti-Occlusion Logic)
-            # =========================================================
-            history = zone_histories[zid]
-            
-            # 計算歷史平均 (避免除以零)
-            avg_count = sum(history) / len(history) if len(history) > 0 else current_count
-            
-            # 判斷是否被遮擋：
-            # 條件1: 歷史數據要足夠 (至少累積 10 幀，避免剛開機就誤判)
-            # 條件2: 當前數量 < 平均數量 * 0.6 (驟降 40% 以上)
-            is_blocked = False
-            if len(history) > 10 and current_count < avg_count * DROP_RATIO:
-                is_blocked = True
-            
-            # 更新歷史數據 (如果被遮擋，就不要把這個異常低的數字寫入歷史，以免拉低平均)
-            if not is_blocked:
-                history.append(current_count)
-            # =========================================================
-
-            if is_blocked:
-                # ⚠️ 狀態：被遮擋
-                # 顯示黃色警告，不計算缺貨，不畫紅框
-                warning_text = "VIEW BLOCKED"
-                text_size, _ = cv2.getTextSize(warning_text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)
-                # 在區域中央顯示警告
-                center_x_zone = (zx1 + zx2) // 2 - text_size[0] // 2
-                center_y_zone = (zy1 + zy2) // 2
-                
-                cv2.rectangle(frame, (center_x_zone-5, center_y_zone-25), 
-                             (center_x_zone + text_size[0]+5, center_y_zone+5), (0, 255, 255), -1)
-                cv2.putText(frame, warning_text, (center_x_zone, center_y_zone), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-                
+        # 剛啟動或設定檔更新後還沒有區域結果可沿用：這一幀一定要推論，不能跳過
+        skipped_by_qos = qos is not None and bool(zone_results) and not qos.should_process(frame_idx)
+        if replay:
+            # 重播：依紀錄當時實際分析的區域 (變動偵測 / 跳幀)，結果才與原始執行一致
+            recorded = cap.zones(len(config))
+            changed_idx = np.arange(len(config)) if recorded is None else np.flatnonzero(recorded)
+        elif skipped_by_qos:
+            changed_idx = np.empty(0, dtype=np.int64)  # 降級跳幀：沿用上一次的區域結果
+        elif gate:
+            changed = gate.changed_zones(frame, zone_coords)
+            changed_idx = np.flatnonzero(changed)
+        else:
+            changed_idx = np.arange(len(config))
+
+        started = time.perf_counter()
+        if replay:
+            detections = model(frame)  # 每幀一筆紀錄，略過的幀也要讀掉
+            if len(changed_idx) == 0:
+                FRAMES_SKIPPED.inc()
+        elif len(changed_idx) == 0:
+            detections = np.empty((0, 6), dtype=np.float32)
+            FRAMES_SKIPPED.inc()
+        elif gate and len(changed_idx) <= MAX_CROP_ZONES and len(changed_idx) < len(config):
+            detections = detect_in_zones(model, frame, zone_coords, changed_idx)
+            INFERENCE_SECONDS.labels("crops").observe(time.perf_counter() - started)
+        elif cascade:
+            previous_stock = [
+                zone_results[zid]["stock"] if zid in zone_results and not zone_results[zid]["blocked"] else -1
+                for zid in config.ids
+            ]
+            histories = [zone_histories[zid] for zid in config.ids]
+            detections = cascade(model, frame, zone_coords, histories, previous_stock)
+            INFERENCE_SECONDS.labels("cascade").observe(time.perf_counter() - started)
+        else:
+            detections = detect_scaled(model, frame, qos.level.scale) if qos else model(frame)
+            INFERENCE_SECONDS.labels("full").observe(time.perf_counter() - started)
+        infer_time += time.perf_counter() - started
+        if gate and len(changed_idx):
+            gate.mark_inferred(changed_idx)
+        membership = zone_membership(detections, zone_coords)
+        # 本幀要重新分析的區域：有變動的，加上還沒有結果的 (剛啟動 / 設定檔更新)
+        analyzed = np.zeros(len(config), dtype=bool)
+        analyzed[changed_idx] = True
+        analyzed |= np.array([zid not in zone_results for zid in config.ids], dtype=bool)
+
+        # 影片檔用影片時間，攝影機用實際時間，提醒的持續時間才不受處理速度影響
+        if replay:
+            frame_ts = float(cap.log.timestamps[cap.position - 1])
+        else:
+            # bus / 最新幀模式記錄了實際擷取時間
+            frame_ts = (getattr(cap, "last_ts", None) or time.time()) if live_source else frame_idx / fps
+        if recorder:
+            recorder.append(frame_idx, frame_ts, detections, zones=analyzed)
+
+        mqtt_payload = {"device_id": camera_id, "ts": round(frame_ts, 3), "total_gaps": 0, "details": {}}
+        alert_changed = False
+
+        zone_rects = [tuple(int(v) for v in zone_coords[zi]) for zi in range(len(config))]
+        for zi, (zid, p_name) in enumerate(zip(config.ids, config.names)):
+            coords = zone_rects[zi]
+            if analyzed[zi]:
+                # 3.1 找出區域內的物體
+                zone_boxes = detections[membership[:, zi], :4].tolist()
+                zone_results[zid] = analyze_zone(zone_boxes, coords, zone_histories[zid], width_priors, zid)
+            # 證據圖要在任何區域的標示畫上去之前裁切，相鄰區域的框線才不會出現在圖裡
+            if evidence:
+                evidence.observe(zid, frame, coords, zone_results[zid], frame_idx, frame_ts, name=p_name)
+
+        blocked_count = 0
+        for zi, (zid, p_name) in enumerate(zip(config.ids, config.names)):
+            coords = zone_rects[zi]
+            result = zone_results[zid]
+            draw_zone_result(frame, p_name, coords, result, qos.level.render if qos else RENDER_FULL)
+
+            if result["blocked"]:
                 # MQTT 狀態傳送 Blocked
+                blocked_count += 1
                 mqtt_payload["details"][p_name] = {"status": "blocked"}
-
+                if history_store:
+                    history_store.record(camera_id, zid, None, None, blocked=True, ts=frame_ts)
             else:
-                # ✅ 狀態：正常 (執行缺貨偵測)
-                gaps, avg_w = detect_gaps_in_zone(zone_boxes, [zx1, zy1, zx2, zy2])
-                
-                for gx1, gy1, gx2, gy2 in gaps:
-                    draw_dashed_rect(frame, (gx1, gy1), (gx2, gy2), (0, 0, 255), 2)
-                    cv2.putText(frame, "EMPTY", (gx1, gy1+20), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 255), 1)
-
-                stock_count = current_count
-                gap_count = len(gaps)
-                mqtt_payload["details"][p_name] = {"stock": stock_count, "missing": gap_count}
-                mqtt_payload["total_gaps"] += gap_count
-                
-                info_text = f"{p_name}: {stock_count}"
-                cv2.putText(frame, info_text, (zx1, zy1-5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+                mqtt_payload["details"][p_name] = {"stock": result["stock"], "missing": result["missing"]}
+                mqtt_payload["total_gaps"] += result["missing"]
+                ZONE_STOCK.labels(zid).set(result["stock"])
+                ZONE_MISSING.labels(zid).set(result["missing"])
+                if history_store:
+                    history_store.record(camera_id, zid, result["stock"], result["missing"], ts=frame_ts)
+
+            zone_names[zid] = p_name
+            event = alerts.update(zid, result["stock"], result["missing"], frame_ts, blocked=result["blocked"])
+            if event:
+                report_alert(event, p_name)
+                alert_changed = True
 
+        width_priors.maybe_save()
+        # 依畫面時間節流：重播 / 影片檔發布的順序與即時執行相同
+        if last_publish_ts is None or alert_changed or frame_ts - last_publish_ts >= PUBLISH_INTERVAL:
+            if len(alerts):
+                mqtt_payload["restock_queue"] = [
+                    {"zone": zone_names.get(item.key, item.key), "missing": item.missing}
+                    for item in alerts.restock_queue()
+                ]
+            ok = publish_state(client, mqtt_payload)
+            if not ok and not publish_failed:
+                print("⚠️ MQTT 發布失敗 (未連線？)，稍後自動重試")
+            publish_failed = not ok
+            last_publish_ts = frame_ts
+
+        ZONES_BLOCKED.set(blocked_count)
+        FRAMES_TOTAL.inc()
+        frame_seconds = time.perf_counter() - frame_started
+        FRAME_SECONDS.observe(frame_seconds)
+        if qos and not skipped_by_qos and qos.observe(frame_seconds, frame_idx):
+            qos.apply(model)
+
+        if frame_idx == 0:
+            timeline.mark("first frame")
+            timeline.report()
+
+        if results_file:
+            # 與提醒 / 歷史相同的畫面時間：攝影機與 --latest-frame 會掉幀，不能用幀號換算
+            record = zone_record(frame_idx, frame_ts, config.ids, zone_results)
+            results_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if gate and not skipped_by_qos and gate.frames % GATE_REPORT_INTERVAL == 0:
+            report_gate_stats(gate, infer_time)
+        if cascade and frame_idx % GATE_REPORT_INTERVAL == GATE_REPORT_INTERVAL - 1:
+            print(f"🔍 兩階段推論: {cascade.summary()}")
 
         if output_path and video_writer is None:
-            fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
             height, width = frame.shape[:2]
             fourcc = cv2.VideoWriter_fourcc(*"mp4v")
             video_writer = cv2.VideoWriter(str(output_path), fourcc, fps, (width, height))
 
+        if live:
+            live.publish(frame)
+
         if video_writer is not None:
             video_writer.write(frame)
 
+        if headless:
+            continue
         cv2.imshow('Smart Gap Monitor', frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
     cap.release()
+    if live:
+        live.close()
     if video_writer is not None:
         video_writer.release()
-    cv2.destroyAllWindows()
+    if results_file:
+        results_file.close()
+    if recorder:
+        recorder.close()
+        print(f"⏺️ 已記錄 {recorder.frames} 幀偵測結果")
+    if history_store:
+        history_store.close()
+    if width_priors.path and width_priors.dirty:
+        width_priors.save()
+        print(f"📏 已儲存 {width_priors.summary()}: {width_priors.path}")
+    if evidence:
+        evidence.close()
+        stats = evidence.stats()
+        print(f"📸 已儲存 {stats['saved']} 張缺貨證據 ({stats['bytes'] / 1024:.0f} KiB)，"
+              f"延後 {stats['deferred']} 次，佇列滿丟棄 {stats['dropped']} 張")
+    if gate:
+        report_gate_stats(gate, infer_time)
+    if cascade:
+        print(f"🔍 兩階段推論: {cascade.summary()}")
+    if latest:
+        report_latest_stats(cap, age_total / max(frame_idx + 1, 1))
+    if qos:
+        print(f"🎚️ 自動畫質: {qos.summary()}")
+    if replay:
+        print(f"⏯️ 重播 {frame_idx + 1} 幀，平均 {(frame_idx + 1) / max(time.perf_counter() - loop_started, 1e-9):.0f} fps")
+    if not headless:
+        cv2.destroyAllWindows()
+
+def report_alert(event, p_name):
+    if event.kind == "raised":
+        print(f"🔔 需要補貨: {p_name} 缺 {event.missing} 格 (現貨 {event.stock})")
+    else:
+        print(f"✅ 已補貨: {p_name} (現貨 {event.stock})")
+
+def report_latest_stats(cap, mean_age):
+    print(f"📷 最新幀模式: 擷取 {cap.captured} 幀，推論 {cap.delivered} 幀 (丟棄 {cap.dropped})，"
+          f"平均畫面延遲 {mean_age * 1000:.0f} ms，重新連線 {cap.reconnects} 次")
+
+def report_gate_stats(gate, infer_time):
+    stats = gate.stats()
+    print(f"🧊 變動偵測: {stats['frames']} 幀，略過整幀 {stats['frames_skipped_pct']:.1f}%，"
+          f"略過區域 {stats['zones_skipped_pct']:.1f}%，推論累計 {infer_time:.1f}s")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--config', type=str, default='config.json')
     parser.add_argument('--weights', type=str, default='best.pt')
-    parser.add_argument('--source', type=str, default='0')
+    parser.add_argument('--backend', type=str, default='auto', choices=BACKENDS,
+                        help='推論後端 (auto 依權重副檔名判斷: .pt / .onnx / OpenVINO)')
+    parser.add_argument('--source', type=str, default='0', help='攝影機編號、影片檔、串流網址，或 bus:<名稱> (frame_bus.py 共享畫面)')
     parser.add_argument('--output', type=str, help='輸出影片路徑')
+    parser.add_argument('--motion-gate', action='store_true', help='畫面無變動的區域沿用上一次結果，略過推論')
+    parser.add_argument('--history-db', type=str, help='區域歷史數據庫路徑 (SQLite)，例如 history/zone_history.db')
+    parser.add_argument('--camera-id', type=str, help='寫入歷史數據時使用的攝影機 ID (預設依來源命名)')
+    parser.add_argument('--results', type=str, help='逐幀區域結果輸出路徑 (JSONL)')
+    parser.add_argument('--metrics-port', type=int, help='開啟 Prometheus 監控指標 HTTP 端點的埠號，例如 9108')
+    parser.add_argument('--record-detections', type=str, help='將每幀偵測結果寫入可重播的紀錄檔 (.detlog)')
+    parser.add_argument('--replay', type=str, help='重播 .detlog 偵測紀錄取代模型推論 (--source 可指定原始影片)')
+    parser.add_argument('--realtime', action='store_true', help='重播時依紀錄時間戳記的速度播放 (預設全速)')
+    parser.add_argument('--evidence', type=str, help='區域缺貨狀態改變時儲存裁切證據圖的資料夾，例如 evidence/')
+    parser.add_argument('--evidence-format', type=str, default='jpg', choices=EVIDENCE_FORMATS, help='證據圖格式')
+    parser.add_argument('--evidence-interval', type=float, default=30.0, help='同一區域兩張證據圖的最短間隔 (秒)')
+    parser.add_argument('--target-fps', type=float, help='自動調整畫質以維持的目標 fps (縮放、imgsz、跳幀、繪圖)')
+    parser.add_argument('--latency-budget-ms', type=float, help='自動調整畫質以維持的每幀延遲預算 (毫秒)')
+    parser.add_argument('--latest-frame', action='store_true',
+                        help='攝影機 / 串流來源：背景持續讀取，只推論最新一幀，斷線自動重連')
+    parser.add_argument('--cascade', action='store_true',
+                        help='兩階段推論：低解析度整張畫面，只對不確定的區域以原始解析度裁切重新推論')
+    parser.add_argument('--cascade-scale', type=float, default=COARSE_SCALE, help='兩階段推論第一階段的縮放比例')
+    parser.add_argument('--width-priors', nargs='?', const='auto',
+                        help='保存每個區域學到的商品寬度 (預設 config.json 旁的 config.widths.json)，重啟後沿用')
+    parser.add_argument('--live-port', type=int, help='開啟 MJPEG 即時畫面 HTTP 伺服器的埠號，例如 8090')
+    parser.add_argument('--headless', action='store_true', help='不開啟顯示視窗 (伺服器 / 效能測試)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='離線影片分段平行處理的行程數 (>1 時啟用，需為影片檔)')
     args = parser.parse_args()
-    run_monitor(args)
\ No newline at end of file
+    # 重播本身已不需推論，不分段平行處理
+    if args.workers > 1 and not args.replay and not args.source.isdigit() and not args.source.startswith(BUS_PREFIX):
+        from parallel_monitor import run_parallel
+        run_parallel(args)
+    else:
+        run_monitor(args)
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""Propose config.json row zones from detections aggregated over sampled frames."""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from detector_backends import load_detector
+from row_clustering import auto_threshold, box_centers, split_by_gaps
+from zone_config import build_config, save_zone_config
+from zone_creator import iter_keyframes
+
+MODEL_PATH = Path("models/best.pt")
+OUTPUT_PATH = Path("config.json")
+SAMPLE_FRAMES = 30
+CONFIDENCE_THRESHOLD = 0.3
+ROW_THRESHOLD_RATIO = 0.5   # row split distance as a fraction of median box height
+MIN_ROW_SUPPORT = 0.3       # a row must average this many boxes per sampled frame
+EDGE_PERCENTILE = 2.0       # trims stray boxes when measuring a row's extent
+ZONE_PADDING_RATIO = 0.25   # padding around a row as a fraction of median box width
+SPLIT_GAP_FACTOR = 0.0      # > 0 splits rows at empty spans wider than factor * box width
+
+
+def collect_detections(
+    model,
+    source: int | str,
+    samples: int,
+    conf: float,
+) -> tuple[np.ndarray, tuple[int, int], int]:
+    """Run the detector over sampled frames and stack all boxes into one ``(N, 6)`` array."""
+    chunks: list[np.ndarray] = []
+    resolution = (0, 0)
+    frames = 0
+    for frame in iter_keyframes(source, samples):
+        height, width = frame.shape[:2]
+        resolution = (width, height)
+        chunks.append(model(frame, conf=conf))
+        frames += 1
+    if not chunks:
+        return np.empty((0, 6), dtype=np.float32), resolution, 0
+    return np.concatenate(chunks), resolution, frames
+
+
+def propose_zones(
+    detections: np.ndarray,
+    resolution: tuple[int, int],
+    frame_count: int,
+    y_threshold: float | None = None,
+    min_support: float = MIN_ROW_SUPPORT,
+    split_gap_factor: float = SPLIT_GAP_FACTOR,
+) -> list[dict]:
+    """Cluster box centers into rows and return zones in the config.json schema.
+
+    Rows are found by splitting sorted center-y values at gaps wider than
+    ``y_threshold``, the vectorized equivalent of ``inference_yolo10.cluster_rows``;
+    rows supported by fewer than ``min_support`` boxes per frame are dropped as noise.
+    """
+    if len(detections) == 0 or frame_count <= 0:
+        return []
+
+    boxes = np.asarray(detections, dtype=np.float64)
+    width, height = resolution
+    if y_threshold is None:
+        y_threshold = auto_threshold(boxes, ROW_THRESHOLD_RATIO)
+    center_x, center_y = box_centers(boxes)
+    row_labels = split_by_gaps(center_y, y_threshold)
+    counts = np.bincount(row_labels)
+    keep = np.flatnonzero(counts >= min_support * frame_count)
+
+    box_widths = boxes[:, 2] - boxes[:, 0]
+    low, high = EDGE_PERCENTILE, 100.0 - EDGE_PERCENTILE
+    extents: list[list[float]] = []
+    for label in keep:
+        in_row = row_labels == label
+        row_boxes = boxes[in_row]
+        median_width = float(np.median(box_widths[in_row]))
+        pad = median_width * ZONE_PADDING_RATIO
+        segments = [row_boxes]
+        if split_gap_factor > 0:
+            # Adjacent centers farther apart than (1 + factor) widths leave an empty span of > factor widths
+            seg_labels = split_by_gaps(center_x[in_row], (1.0 + split_gap_factor) * median_width)
+            segments = [row_boxes[seg_labels == s] for s in range(seg_labels.max() + 1)]
+        for seg in segments:
+            if len(seg) < min_support * frame_count:
+                continue
+            extents.append([
+                np.percentile(seg[:, 0], low) - pad,
+                np.percentile(seg[:, 1], low) - pad,
+                np.percentile(seg[:, 2], high) + pad,
+                np.percentile(seg[:, 3], high) + pad,
+            ])
+    if not extents:
+        return []
+
+    # Labels increase with y (rows) and x (segments), so zones come out top-to-bottom, left-to-right
+    coords = np.array(extents)
+    _trim_vertical_overlaps(coords)
+    coords[:, [0, 2]] = np.clip(coords[:, [0, 2]], 0, width)
+    coords[:, [1, 3]] = np.clip(coords[:, [1, 3]], 0, height)
+    coords = np.round(coords).astype(int)
+    coords = coords[(coords[:, 2] > coords[:, 0]) & (coords[:, 3] > coords[:, 1])]
+
+    zones = []
+    for index, (x1, y1, x2, y2) in enumerate(coords, start=1):
+        zones.append({
+            "id": f"zone_{index}",
+            "product": f"Row_{index}",
+            "coords": [int(x1), int(y1), int(x2), int(y2)],
+        })
+    return zones
+
+
+def _trim_vertical_overlaps(coords: np.ndarray) -> None:
+    """Split the padding between vertically overlapping zones at their midpoint (in place)."""
+    for i in range(len(coords)):
+        for j in range(i + 1, len(coords)):
+            a, b = coords[i], coords[j]
+            x_overlap = min(a[2], b[2]) > max(a[0], b[0])
+            if not x_overlap or a[3] <= b[1] or b[3] <= a[1]:
+                continue
+            upper, lower = (a, b) if a[1] + a[3] <= b[1] + b[3] else (b, a)
+            mid = (upper[3] + lower[1]) / 2
+            upper[3] = min(upper[3], mid)
+            lower[1] = max(lower[1], mid)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=str, default="0")
+    parser.add_argument("--weights", type=str, default=str(MODEL_PATH))
+    parser.add_argument("--samples", type=int, default=SAMPLE_FRAMES, help="number of frames to sample")
+    parser.add_argument("--conf", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--y-threshold", type=float, help="row split distance in px (default: auto)")
+    parser.add_argument("--min-support", type=float, default=MIN_ROW_SUPPORT)
+    parser.add_argument("--split-gap", type=float, default=SPLIT_GAP_FACTOR,
+                        help="split rows at empty spans wider than this many box widths")
+    parser.add_argument("--output", type=str, default=str(OUTPUT_PATH))
+    parser.add_argument("--dry-run", action="store_true", help="print the proposal without writing it")
+    args = parser.parse_args()
+
+    source: int | str = int(args.source) if args.source.isdigit() else args.source
+    print(f"[proposer] Loading weights from {args.weights}")
+    model = load_detector(args.weights)
+
+    started = time.perf_counter()
+    detections, resolution, frame_count = collect_detections(model, source, args.samples, args.conf)
+    if frame_count == 0:
+        print(f"[proposer] Unable to read frames from {source}")
+        sys.exit(1)
+    detect_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    zones = propose_zones(
+        detections, resolution, frame_count,
+        y_threshold=args.y_threshold,
+        min_support=args.min_support,
+        split_gap_factor=args.split_gap,
+    )
+    cluster_time = time.perf_counter() - started
+    print(
+        f"[proposer] {len(detections)} boxes from {frame_count} frames -> {len(zones)} zones "
+        f"(detect {detect_time:.1f}s, cluster {cluster_time * 1000:.1f}ms)"
+    )
+    if not zones:
+        print("[proposer] No rows found; try more samples or a lower --min-support")
+        sys.exit(1)
+
+    config = build_config(zones, resolution)
+    for zone in config.zone_dicts():
+        print(f"  {zone['id']:<8} {zone['product']:<8} {zone['coords']}")
+    if args.dry_run:
+        return
+    path = save_zone_config(config, args.output)
+    print(f"[proposer] Wrote {path}; rename products or fine-tune with zone_creator.py --append")
+
+
+if __name__ == "__main__":
+    main()